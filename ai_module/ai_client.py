@@ -22,7 +22,8 @@ def generate_title(messages, client=None):
                         {"role": "user", "content": f"Generate a short, descriptive title for this conversation:\n{context}"}
                     ],
                     temperature=0.3,
-                    max_tokens=20
+                    max_tokens=20,
+                    phase="title"
                 )
 
                 if completion and completion.choices and completion.choices[0].message.content:
@@ -48,9 +49,9 @@ def generate_title(messages, client=None):
         return f"Chat on {timestamp_str}"
 
 def get_openai_client(api_key, base_url="https://openrouter.ai/api/v1"):
-    if not api_key:
-        return None
-    return OpenAI(api_key=api_key, base_url=base_url)
+    # Use the shared gateway client so these calls get retries and failover too
+    from llm.client import get_openai_client as get_gateway_client
+    return get_gateway_client(api_key, base_url)
 
 def run_planner(client, user_query: str, planner_model: str) -> list:
     """Generates the initial plan using the Planner LLM. Always returns a list."""
@@ -119,7 +120,8 @@ Output *only* the JSON list, nothing else before or after.
                 {"role": "user", "content": user_query}
             ],
             temperature=0.2,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            phase="planner"
         )
         response_content = completion.choices[0].message.content
         if response_content.strip().startswith("```json"):
@@ -194,7 +196,8 @@ Provide *only* the JSON object as your response.
                 {"role": "user", "content": f"Execute step: {step_desc}"}
             ],
             temperature=0.0,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            phase="executor"
         )
         if not completion or not completion.choices or len(completion.choices) == 0:
             return "Executor Error: LLM API call returned no valid choices.", "Error", "Invalid LLM response."
@@ -219,14 +222,7 @@ Provide *only* the JSON object as your response.
 
         try:
             if action['tool'] != "None":
-                tool_args = action['args'].copy()
-                tool_args.pop('reasoning', None)
-                if action['tool'] not in TOOLS:
-                    raise ValueError(f"Tool '{action['tool']}' not registered.")
-                tool_func = TOOLS[action['tool']]
-                if not isinstance(tool_args, dict):
-                    raise TypeError("Tool arguments must be a dict.")
-                observation = tool_func(**tool_args)
+                observation = TOOLS.call(action['tool'], action['args'])
             else:
                 observation = action['args'].get('comment', 'No action required')
         except Exception as e:
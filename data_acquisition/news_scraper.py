@@ -2,11 +2,12 @@ import requests
 from bs4 import BeautifulSoup
 from typing import List, Dict, Optional, Set
 import json
-import time
 import random
 import re
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from utils.deadline import io_timeout, sleep as deadline_sleep, DeadlineExceeded, Cancelled
+
+# Responses worth retrying (rate limits and transient server errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 class WebScraper:
     def __init__(self,
@@ -28,20 +29,26 @@ class WebScraper:
         self._setup_session()
 
     def _setup_session(self) -> None:
-        """Set up a requests session with retry configuration."""
+        """Set up a requests session (retries are done in _get so they honor the step deadline)."""
         self.session = requests.Session()
-        retries = Retry(
-            total=self.retry_attempts,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504]
-        )
-        self.session.mount('https://', HTTPAdapter(max_retries=retries))
+
+    def _get(self, url: str) -> requests.Response:
+        """GET with retries and exponential backoff (1, 2, 4 s), bounded by the current step deadline."""
+        for attempt in range(self.retry_attempts + 1):
+            try:
+                response = self.session.get(url, headers=self.headers, timeout=io_timeout(self.timeout))
+                if response.status_code not in RETRY_STATUSES or attempt == self.retry_attempts:
+                    return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.retry_attempts:
+                    raise
+            deadline_sleep(2 ** attempt)
 
     def scrape_content(self, url: str) -> str:
         """Scrapes the text content of a given URL with retries and proper error handling."""
         try:
-            time.sleep(random.uniform(*self.delay_range))  # Polite delay between requests
-            response = self.session.get(url, headers=self.headers, timeout=self.timeout)
+            deadline_sleep(random.uniform(*self.delay_range))  # Polite delay between requests
+            response = self._get(url)
             response.raise_for_status()
 
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -62,7 +69,7 @@ class WebScraper:
             processed_text = self._process_latex_and_dollars(text)
 
             return processed_text[:self.max_content_length]
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, DeadlineExceeded, Cancelled) as e:
             return f"Error scraping {url}: {str(e)}"
         except Exception as e:
             return f"Unexpected error while scraping {url}: {str(e)}"
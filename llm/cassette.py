@@ -0,0 +1,138 @@
+"""
+Record/replay cassettes for LLM calls in the ReAct application.
+With LLM_RECORD_CASSETTE set to a file path, every successful LLM call made through
+the gateway is appended to that file as one JSON line (request, response text,
+usage and latency). llm/mock_server.py serves a cassette back as an
+OpenAI-compatible API, so the planner/executor/summarizer pipeline can be
+benchmarked offline and reproducibly by pointing the base URL at it.
+
+Exchanges are keyed by the model and a hash of the messages and the parameters that
+change the answer. Before hashing, dates, times and the planner's observed tool
+latencies are masked, whitespace is collapsed and provider-specific content parts
+(cache_control markers) are flattened, so a cassette recorded yesterday against
+OpenRouter still matches today's prompts sent to the mock server.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+# Parameters besides model and messages that are part of the key
+KEY_PARAMS = ("temperature", "top_p", "max_tokens", "response_format", "tools", "tool_choice")
+
+# Dates and times that change between runs (planner prompts include today's date)
+_VOLATILE_PATTERN = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?\b"
+    r"|\b\d{1,2}:\d{2}(?::\d{2})?\b")
+
+# The planner's tool cost paragraph (llm/plan_analyzer.summarize_costs_for_planner): rolling
+# averages that change after every tool call, and absent until there is any history
+_COST_SUMMARY_PATTERN = re.compile(r"Observed average tool latency \(cheapest first\):(?:.|\n(?!\n))*")
+
+def _mask(value):
+    """Mask dates, times and tool latencies inside strings, recursively."""
+    if isinstance(value, str):
+        value = _COST_SUMMARY_PATTERN.sub("", value)
+        return " ".join(_VOLATILE_PATTERN.sub("<t>", value).split())
+    if isinstance(value, list):
+        return [_mask(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _mask(v) for k, v in value.items()}
+    return value
+
+def _flatten_content(content):
+    """Message content without provider-specific markup: text parts joined, cache_control dropped."""
+    if not isinstance(content, list):
+        return content
+    if all(isinstance(part, dict) and part.get("type") == "text" for part in content):
+        return "".join(part.get("text") or "" for part in content)
+    return [{k: v for k, v in part.items() if k != "cache_control"} if isinstance(part, dict) else part
+            for part in content]
+
+def cassette_key(request: Dict) -> str:
+    """Key of a chat completion request: model plus a hash of the messages and parameters."""
+    messages = [dict(message, content=_flatten_content(message.get("content"))) if isinstance(message, dict) else message
+                for message in request.get("messages") or []]
+    payload = {
+        "messages": _mask(messages),
+        "params": {name: request.get(name) for name in KEY_PARAMS if request.get(name) is not None},
+    }
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{request.get('model')}:{digest[:32]}"
+
+def recording_path() -> Optional[str]:
+    """The cassette being recorded, from LLM_RECORD_CASSETTE (read per call, after .env is loaded)."""
+    return os.getenv("LLM_RECORD_CASSETTE") or None
+
+_write_lock = threading.Lock()
+
+def record_exchange(request: Dict, content, finish_reason=None, usage=None, response=None,
+                    latency=None, ttft=None, served_model=None) -> None:
+    """Append one request/response pair to the cassette being recorded (no-op when not recording).
+
+    Args:
+        request: The create() arguments (model, messages, temperature, ...)
+        content: The response text
+        finish_reason: The finish reason of the first choice
+        usage: Token usage as a dict
+        response: The full completion as a dict, when available (non-streaming calls)
+        latency: Seconds until the full response
+        ttft: Seconds until the first streamed token
+        served_model: The model that answered, if a fallback did
+    """
+    path = recording_path()
+    if not path:
+        return
+    entry = {
+        "key": cassette_key(request),
+        "model": request.get("model"),
+        "served_model": served_model or request.get("model"),
+        "request": {k: v for k, v in request.items() if k in ("model", "messages") + KEY_PARAMS},
+        "content": content,
+        "finish_reason": finish_reason or "stop",
+        "usage": usage,
+        "response": response,
+        "latency": round(latency, 3) if latency is not None else None,
+        "ttft": round(ttft, 3) if ttft is not None else None,
+        "recorded_at": time.time(),
+    }
+    with _write_lock:
+        try:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except (IOError, OSError, TypeError) as e:
+            print(f"Error recording LLM cassette: {e}")
+
+def record_completion(request: Dict, completion, latency=None, served_model=None) -> None:
+    """Record a non-streaming completion object."""
+    if not recording_path():
+        return
+    choice = completion.choices[0]
+    message = choice.message
+    usage = getattr(completion, "usage", None)
+    response = completion.model_dump() if hasattr(completion, "model_dump") else None
+    record_exchange(request, message.content, choice.finish_reason,
+                    usage.model_dump() if hasattr(usage, "model_dump") else None,
+                    response, latency=latency, served_model=served_model)
+
+def load_cassette(paths) -> Dict[str, List[Dict]]:
+    """Load one or more cassette files into {key: [entries in recording order]}."""
+    exchanges = {}
+    for path in [paths] if isinstance(paths, str) else paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                # Re-key from the stored request so cassettes follow changes to the key normalization
+                key = cassette_key(entry["request"]) if entry.get("request") else entry.get("key")
+                if key:
+                    exchanges.setdefault(key, []).append(entry)
+    return exchanges
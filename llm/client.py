@@ -1,13 +1,74 @@
 """
 LLM client initialization for the ReAct application.
+Clients are cached per (api_key, base_url) for the whole process, so every rerun and
+every session reuses the same HTTP connection pool instead of repeating TLS handshakes.
+Callers get the client wrapped in the LLM gateway.
 """
+import os
+import httpx
+import streamlit as st
 from openai import OpenAI
+from llm.gateway import LLMGateway
+
+def _env_number(name, default):
+    """Read a numeric setting from the environment."""
+    try:
+        return type(default)(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+# Timeouts (seconds) and pool limits; each can be overridden through the environment / .env
+HTTP_DEFAULTS = {
+    "LLM_CONNECT_TIMEOUT": 10.0,
+    "LLM_READ_TIMEOUT": 120.0,
+    "LLM_WRITE_TIMEOUT": 30.0,
+    "LLM_POOL_TIMEOUT": 10.0,
+    "LLM_MAX_CONNECTIONS": 20,
+    "LLM_MAX_KEEPALIVE_CONNECTIONS": 10,
+    "LLM_KEEPALIVE_EXPIRY": 60.0,
+}
+
+def http2_available():
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def build_http_client():
+    """Create the pooled keep-alive HTTP client used by the LLM clients.
+
+    Settings are read when the client is built (after .env has been loaded).
+    """
+    settings = {name: _env_number(name, default) for name, default in HTTP_DEFAULTS.items()}
+    return httpx.Client(
+        http2=http2_available(),
+        timeout=httpx.Timeout(connect=settings["LLM_CONNECT_TIMEOUT"], read=settings["LLM_READ_TIMEOUT"],
+                              write=settings["LLM_WRITE_TIMEOUT"], pool=settings["LLM_POOL_TIMEOUT"]),
+        limits=httpx.Limits(max_connections=settings["LLM_MAX_CONNECTIONS"],
+                            max_keepalive_connections=settings["LLM_MAX_KEEPALIVE_CONNECTIONS"],
+                            keepalive_expiry=settings["LLM_KEEPALIVE_EXPIRY"]),
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_raw_client(api_key, base_url):
+    """One OpenAI client per (api_key, base_url), shared by all sessions of the process.
+
+    Retries are left to the LLM gateway, so the SDK's own retries are disabled.
+    """
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=build_http_client(), max_retries=0)
+
+@st.cache_resource(show_spinner=False)
+def _cached_gateway(api_key, base_url):
+    return LLMGateway(get_raw_client(api_key, base_url))
 
 def get_openai_client(api_key, base_url="https://openrouter.ai/api/v1"):
-    """Initialize an OpenAI client with the given API key and base URL.
+    """Return the shared client for the given API key and base URL.
 
+    The client is wrapped in the LLM gateway (retries, circuit breaker, fallbacks).
     The default base URL is for OpenRouter, but any compatible API endpoint can be used.
     """
     if not api_key:
         return None
-    return OpenAI(api_key=api_key, base_url=base_url)
+    return _cached_gateway(api_key, base_url)
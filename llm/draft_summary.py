@@ -0,0 +1,112 @@
+"""
+Running draft summary for the ReAct application.
+While the plan executes, each completed step's result is folded into a draft answer
+in a background thread using the cheap condenser model. The final summarizer call
+then only polishes the draft, and the draft doubles as a partial answer if the plan
+is aborted.
+"""
+import threading
+import concurrent.futures
+import streamlit as st
+from llm.plan_adjuster import truncate_text
+from llm.telemetry import in_current_scope
+
+# Largest step result sent to a draft update; larger results are also given to the final call in full
+MAX_DELTA_CHARS = 8000
+# How long the final response waits for pending draft updates
+DRAFT_WAIT_SECONDS = 8.0
+
+DRAFT_PROMPT = """You maintain a running draft answer to the user's query while a research plan executes.
+The user asked: "{user_query}"
+
+You receive the current draft and the result of one newly completed step. Rewrite the draft so it
+incorporates the new information: keep what is still relevant, add new facts, figures and insights,
+and resolve contradictions. Keep every URL or file name next to the facts it supports so sources
+can be cited later. Respond with the complete updated draft only."""
+
+class DraftSummary:
+    """A draft answer updated asynchronously, one step result at a time."""
+
+    def __init__(self, client, model, user_query):
+        self.client = client
+        self.model = model
+        self.user_query = user_query
+        self.text = ""
+        self.incorporated = set()  # ids of steps fully reflected in the draft
+        self._lock = threading.Lock()
+        # A single worker applies updates in step order
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="draft-summary")
+        self._futures = []
+
+    def add_step(self, step):
+        """Queue a completed step for incorporation into the draft (non-blocking)."""
+        result = str(step["result"])
+        snapshot = (step["step_id"], step["description"], truncate_text(result, MAX_DELTA_CHARS),
+                    len(result) <= MAX_DELTA_CHARS)
+        self._futures.append(self._executor.submit(in_current_scope(self._update), *snapshot))
+
+    def _update(self, step_id, description, result, complete):
+        """Fold one step result into the draft (runs in the worker thread, no st.* calls)."""
+        with self._lock:
+            draft = self.text
+        try:
+            completion = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": DRAFT_PROMPT.format(user_query=self.user_query)},
+                    {"role": "user", "content": f"Current draft:\n{draft or '(empty)'}\n\n"
+                                                f"New result from step {step_id} ({description}):\n{result}"}
+                ],
+                temperature=0.2,
+                phase="draft"
+            )
+            updated = completion.choices[0].message.content if completion and completion.choices else None
+        except Exception as e:
+            print(f"Error updating draft summary: {e}")
+            return
+        if updated:
+            with self._lock:
+                self.text = updated
+                if complete:
+                    self.incorporated.add(step_id)
+
+    def wait(self, timeout: float) -> bool:
+        """Wait for queued updates; returns True if all of them finished."""
+        _, pending = concurrent.futures.wait(self._futures, timeout=timeout)
+        return not pending
+
+    def snapshot(self):
+        """Return (draft text, ids of incorporated steps)."""
+        with self._lock:
+            return self.text, set(self.incorporated)
+
+    def close(self):
+        """Stop the worker without waiting for queued updates."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def start_draft_summary(client, user_query):
+    """Start a new draft for the query, replacing any previous one."""
+    previous = st.session_state.get("draft_summary")
+    if previous:
+        previous.close()
+    model = st.session_state.get("condenser_model") or st.session_state.summarizer_model
+    st.session_state.draft_summary = DraftSummary(client, model, user_query)
+
+def record_step_for_draft(step):
+    """Queue a completed step for the current draft, if one is running."""
+    draft = st.session_state.get("draft_summary")
+    if draft and step["result"]:
+        draft.add_step(step)
+
+def get_draft(user_query, timeout: float = DRAFT_WAIT_SECONDS):
+    """Return (draft text, incorporated step ids) for the query, or None if there is no draft.
+
+    Waits up to timeout seconds for pending updates; steps not yet incorporated
+    are simply left for the final call.
+    """
+    draft = st.session_state.get("draft_summary")
+    if not draft or draft.user_query != user_query:
+        return None
+    draft.wait(timeout)
+    text, incorporated = draft.snapshot()
+    return (text, incorporated) if text else None
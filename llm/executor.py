@@ -2,56 +2,32 @@
 Execution functions for the ReAct application.
 """
 import json
+import time
 import traceback
 import streamlit as st
-from tools import TOOLS
+from tools import TOOLS, ToolArgumentError
 from utils.status import log_debug
 from processing.file_listing_handler import process_file_listing_response
-
-def run_executor_step(client, step: dict, context: dict, executor_model: str) -> tuple[str, str, str]:
-    """Executes a single step using the Executor LLM and tools (simulates ReAct)."""
-    if not client:
-        return "Error: API Client not initialized.", "Error", "Cannot run Executor (API key missing?)."
-
-    step_desc = step['description']
-    tool_suggestion = step['tool_suggestion']
-
-    # Check if we're using a specific component from MCP
-    current_component = context.get('current_component', None)
-    component_capabilities = context.get('component_capabilities', None)
-
-    # Filter available tools if component has restricted capabilities
-    available_tools = list(TOOLS.keys())
-    if component_capabilities is not None:
-        available_tools = component_capabilities
-
-    # Customize prompt based on component
-    if current_component:
-        agent_description = f"You are a specialized {current_component} agent. Your goal is to perform the action described in the current step."
-    else:
-        agent_description = "You are an execution agent. Your goal is to perform the action described in the current step."
-
-    # --- Reason Phase ---
-    reasoning_prompt = f"""{agent_description}
-Current Step: "{step_desc}"
-Suggested Tool: {tool_suggestion}
-Available Tools: {available_tools}
-Context from previous steps: {json.dumps(context, indent=2)}
+from llm.prompt_builder import tools_key, render_static_prefix, build_messages, client_base_url
+from tools.tool_docs import get_tool_summaries, get_suggested_tool_spec
+from storage.perf_stats import get_perf_stats
+from storage.tool_cache import cached_tool_call
+from storage.query_cache import describe_age
+from utils.deadline import run_with_deadline, remaining, DeadlineExceeded, Cancelled
+
+# Observation of a step whose tool call was cancelled (skip, reset or new query); ui/chat.py marks it Skipped
+CANCELLED_OBSERVATION = "Error: tool execution cancelled by the user"
+from llm.json_repair import parse_llm_json, extract_action, reask_messages, JSONRepairError
+
+# Static part of the executor prompt, rendered once per component and tool set.
+EXECUTOR_STATIC_TEMPLATE = """{agent_description}
+Available Tools:
+{tool_summaries}
+The user message contains the current step, the suggested tool's full specification and the context from previous steps.
 
 1.  **Reason:** Analyze the step description and context. Decide which tool is *best* suited to accomplish this step. If a tool is needed, determine the *exact* arguments required, drawing information from the context if necessary. Pay close attention to the parameter names expected by each tool.
 
-   **REQUIRED PARAMETERS FOR TOOLS:**
-   - `web_search` requires a `query` parameter (string)
-   - `web_scrape` requires a `url` parameter (string)
-   - `get_stock_data` requires a `symbol` parameter (string)
-   - `read_file` requires a `filename` parameter (string)
-   - `write_file` requires `filename` (string) and `content` (string) parameters, with optional `append` (boolean)
-   - `list_files` has an optional `directory` parameter (string)
-   - `delete_file` requires a `filename` parameter (string)
-   - `execute_python` requires a `code` parameter (string)
-   - `memory_get` requires a `key` parameter (string) - NOT `memory_key`
-   - `memory_set` requires `key` (string) and `value` (string) parameters
-   - `memory_list` takes no parameters
+   The full specification of the suggested tool is given in the user message; use its exact parameter names.
 
    **IMPORTANT FOR FILE OPERATIONS:**
    - When the user wants to ADD, APPEND, or UPDATE content in an existing file, use `write_file` with `append=true`
@@ -65,6 +41,10 @@ Context from previous steps: {json.dumps(context, indent=2)}
    - After scraping a URL, store the content in memory with a descriptive key like "scraped_[domain]" for future reference
    - When answering questions about previously scraped content, use `memory_get` to retrieve the stored content
 
+   **IMPORTANT FOR LIVE DATA:**
+   - Results of web, scraping and stock tools may come from a short-lived cache
+   - Add `"fresh": true` to the args only when the step needs data newer than that (e.g. "right now", "at this moment")
+
    If no tool is needed (e.g., summarizing context), decide on the action.
 2.  **Action Format:** Respond with a JSON object containing the chosen tool and its arguments. The format *must* be:
     `{{"tool": "tool_name", "args": {{"arg_name1": "value1", "arg_name2": "value2", "reasoning": "Your detailed reasoning here"}}}}`
@@ -76,6 +56,53 @@ Context from previous steps: {json.dumps(context, indent=2)}
 
 Provide *only* the JSON object as your response.
 """
+
+def _parse_action(content):
+    """Leniently parse an executor response into an action dict, or None if nothing can be salvaged."""
+    try:
+        return extract_action(parse_llm_json(content))
+    except JSONRepairError as e:
+        log_debug(f"Executor JSON repair failed: {e}")
+        return None
+
+def run_executor_step(client, step: dict, context: dict, executor_model: str) -> tuple[str, str, str]:
+    """Executes a single step using the Executor LLM and tools (simulates ReAct)."""
+    if not client:
+        return "Error: API Client not initialized.", "Error", "Cannot run Executor (API key missing?)."
+
+    step_desc = step['description']
+    tool_suggestion = step['tool_suggestion']
+
+    # Check if we're using a specific component from MCP
+    current_component = context.get('current_component', None)
+    component_capabilities = context.get('component_capabilities', None)
+
+    # Filter available tools if component has restricted capabilities
+    available_tools = list(TOOLS.keys())
+    if component_capabilities is not None:
+        available_tools = component_capabilities
+
+    # Customize prompt based on component
+    if current_component:
+        agent_description = f"You are a specialized {current_component} agent. Your goal is to perform the action described in the current step."
+    else:
+        agent_description = "You are an execution agent. Your goal is to perform the action described in the current step."
+
+    # --- Reason Phase ---
+    # Static instructions are rendered once per component/tool set; the step and context go last
+    reasoning_prompt = render_static_prefix(EXECUTOR_STATIC_TEMPLATE, agent_description=agent_description,
+                                            tool_summaries=get_tool_summaries(tools_key(available_tools)))
+    suggested_spec = get_suggested_tool_spec(tool_suggestion)
+    volatile_sections = [
+        f'Current Step: "{step_desc}"',
+        f"Suggested Tool: {tool_suggestion}",
+        f"Suggested Tool Specification:\n{suggested_spec}" if suggested_spec else "",
+        f"Previous attempt failed: {step.get('retry_note')}" if step.get("retry_note") else "",
+        f"Context from previous steps: {json.dumps(context, indent=2)}"
+    ]
+    messages = build_messages(reasoning_prompt, volatile_sections, f"Execute step: {step_desc}",
+                              client_base_url(client))
+
     reasoning = "Reasoning not initiated."
     action_json_str = ""
     action_str = "Error" # Default action string
@@ -87,12 +114,11 @@ Provide *only* the JSON object as your response.
         log_debug(f"Attempting LLM call for step: {step_desc}") # Debug output
         completion = client.chat.completions.create(
             model=executor_model,
-            messages=[
-                {"role": "system", "content": reasoning_prompt},
-                {"role": "user", "content": f"Execute step: {step_desc}"}
-            ],
+            messages=messages,
             temperature=0.0,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            hedge=st.session_state.get("hedge_llm_calls", False),
+            phase="executor"
         )
         log_debug(f"LLM call completed. Completion object: {completion}") # Debug output
 
@@ -137,9 +163,25 @@ Provide *only* the JSON object as your response.
         # before generating the action JSON, so we'll consider the content as containing
         # the reasoning implicitly
 
-        # Parse action JSON
+        # Parse action JSON (tolerating fences, trailing text, truncation and single quotes)
         try:
-            action = json.loads(action_json_str)
+            action = _parse_action(action_json_str)
+            if action is None:
+                # Last resort: ask the model once more for a clean action object
+                log_debug("Executor response could not be salvaged. Re-asking the model for valid JSON.")
+                retry_completion = client.chat.completions.create(
+                    model=executor_model,
+                    messages=reask_messages(messages, action_json_str, 'the JSON action object {"tool": ..., "args": {...}}'),
+                    temperature=0.0,
+                    response_format={"type": "json_object"},
+                    hedge=st.session_state.get("hedge_llm_calls", False),
+                    phase="executor"
+                )
+                if retry_completion and retry_completion.choices and retry_completion.choices[0].message:
+                    action_json_str = retry_completion.choices[0].message.content
+                action = _parse_action(action_json_str)
+            if action is None:
+                raise JSONRepairError("No action object could be recovered from the response")
 
             # Validate the action JSON structure
             if not isinstance(action, dict):
@@ -174,7 +216,7 @@ Provide *only* the JSON object as your response.
                     reasoning = extracted_reasoning
                 else:
                     reasoning = f"Based on the step description, I need to use the {action['tool']} tool with the following parameters: {json.dumps(action_args, indent=2)}"
-        except json.JSONDecodeError as e:
+        except JSONRepairError as e:
             reasoning = f"Executor Error: Invalid JSON response from LLM: {e}"
             st.error(reasoning)
             st.error(f"Invalid JSON content: {action_json_str}")
@@ -188,19 +230,7 @@ Provide *only* the JSON object as your response.
         # --- Execute Tool ---
         try:
             if action['tool'] != "None":
-                # Remove the reasoning field from args before passing to the tool function
-                tool_args = action['args'].copy()
-                if 'reasoning' in tool_args:
-                    tool_args.pop('reasoning')
-                # Compatibility fix: remap 'memory_key' to 'key' if present for memory_get
-                if action['tool'] == "memory_get":
-                    if 'memory_key' in tool_args:
-                        tool_args['key'] = tool_args.pop('memory_key')
-                    # Ensure key parameter exists for memory_get
-                    if 'key' not in tool_args or not tool_args['key']:
-                        raise ValueError("memory_get requires a 'key' parameter")
-
-                log_debug(f"\n\nAttempting to execute: {action['tool']} with args {tool_args}")
+                log_debug(f"\n\nAttempting to execute: {action['tool']} with args {action['args']}")
 
                 # Check if the tool is allowed for the current component
                 component_capabilities = context.get('component_capabilities', None)
@@ -215,34 +245,38 @@ Provide *only* the JSON object as your response.
                     # Use a more user-friendly error message
                     raise ValueError(f"Tool '{action['tool']}' is not allowed for the current component")
 
-                if action['tool'] not in TOOLS:
-                    raise ValueError(f"Tool '{action['tool']}' not registered in TOOLS dictionary")
-
-                tool_func = TOOLS[action['tool']]
-
-                # Validate arguments are in keyword form
-                if not isinstance(tool_args, dict):
-                    raise TypeError(f"Tool arguments must be dictionary, got {type(tool_args).__name__}")
-
-                # Check for required arguments based on tool type
-                if action['tool'] == "memory_get" and ('key' not in tool_args or not tool_args['key']):
-                    raise ValueError("memory_get requires a 'key' parameter")
-                elif action['tool'] == "memory_set" and ('key' not in tool_args or 'value' not in tool_args):
-                    raise ValueError("memory_set requires both 'key' and 'value' parameters")
-                elif action['tool'] == "web_search" and ('query' not in tool_args or not tool_args['query']):
-                    raise ValueError("web_search requires a 'query' parameter")
-                elif action['tool'] == "kb_get" and not any(k in tool_args for k in ['entry_id', 'memory_key']):
-                    # For kb_get, check if there are any numeric keys that might be intended as entry_id
-                    numeric_keys = [k for k in tool_args.keys() if isinstance(k, (int, str)) and str(k).isdigit()]
-                    if numeric_keys:
-                        # If we have numeric keys, use the first one's value as entry_id
-                        first_key = numeric_keys[0]
-                        tool_args['entry_id'] = tool_args.pop(first_key)
-                    else:
-                        raise ValueError("kb_get requires either 'entry_id' or 'memory_key' parameter")
-
-                # Execute the tool
-                tool_result = tool_func(**tool_args)
+                # Map aliases, coerce types and check required arguments before any I/O
+                tool_args = TOOLS.bind(action['tool'], action['args'])
+
+                def run_tool():
+                    tool_started = time.time()
+                    result = TOOLS[action['tool']](**tool_args)
+                    get_perf_stats().record_tool(action['tool'], time.time() - tool_started)
+                    return result
+
+                # Execute the tool, or reuse a fresh enough result of the same call
+                use_cache = st.session_state.get("tool_result_cache", True)
+                fresh = str(action['args'].get('fresh', '')).lower() in ("true", "1", "yes")
+                bypass = fresh or st.session_state.get("bypass_tool_cache", False)
+
+                def execute():
+                    if use_cache:
+                        return cached_tool_call(action['tool'], tool_args, run_tool, bypass)
+                    return run_tool(), None
+
+                # The tool runs in a worker thread so a slow call can be abandoned when the
+                # step runs out of time or the user skips the step or resets the execution
+                progress = st.empty()
+
+                def show_progress(elapsed):
+                    left = remaining()
+                    budget = f" · {left:.0f}s left in this step" if left is not None else ""
+                    progress.caption(f"⏳ {action['tool']} running for {elapsed:.0f}s{budget}")
+
+                try:
+                    tool_result, cached_at = run_with_deadline(execute, on_wait=show_progress)
+                finally:
+                    progress.empty()
 
                 # Process file listing responses to make them more user-friendly
                 if action['tool'] == "list_files":
@@ -251,11 +285,28 @@ Provide *only* the JSON object as your response.
                 else:
                     observation = tool_result
 
-                st.success(f"Tool execution completed: {action['tool']}")
+                if cached_at is not None:
+                    st.success(f"Tool execution completed: {action['tool']} (cached result from {describe_age(cached_at)})")
+                else:
+                    st.success(f"Tool execution completed: {action['tool']}")
             else:
                 # For 'None' tool, we just need the comment as observation
                 # Make sure we don't include the reasoning field in the observation
                 observation = action['args'].get('comment', 'No action required')
+        except ToolArgumentError as e:
+            # The message names the expected signature, so a retry of the step can correct the call
+            reasoning = f"Tool argument error: {e}"
+            st.error(reasoning)
+            return reasoning, action_str, f"Tool call rejected: {e}"
+        except DeadlineExceeded as e:
+            # Worded as a timeout so the plan adjuster retries the step as a transient failure
+            reasoning = f"Tool execution error: {action['tool']} timed out"
+            st.error(reasoning)
+            return reasoning, action_str, f"Tool execution failed: {action['tool']} timed out - {e}"
+        except Cancelled:
+            reasoning = f"Tool execution cancelled: {action['tool']}"
+            st.warning(reasoning)
+            return reasoning, action_str, CANCELLED_OBSERVATION
         except Exception as e:
             reasoning = f"Tool execution error: {str(e)}"
             st.error(reasoning)
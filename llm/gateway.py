@@ -0,0 +1,473 @@
+"""
+LLM gateway for the ReAct application.
+Every chat completion goes through one place that retries transient errors with
+jittered backoff, keeps a circuit breaker per (base URL, model), fails over to
+configured fallback models or base URLs, and turns empty or content-filtered
+responses into retries or failovers instead of broken completions.
+
+Latency-critical callers (planner, executor) can pass hedge=True: if the request has
+not answered by the model's observed p90 latency, the same request is also sent to
+the secondary route (the first fallback, or the same model again) and the first
+usable response wins. Hedges are capped at a fraction of recent calls.
+
+Fallbacks are configured in model_config.json:
+
+    "fallbacks": {
+        "google/gemini-2.0-flash-exp:free": [{"model": "deepseek/deepseek-chat-v3-0324:free"}],
+        "*": [{"model": "gpt-4.1-mini", "base_url": "https://api.openai.com/v1", "api_key_env": "OPENAI_API_KEY"}]
+    }
+
+Entries under a model name apply to that model, entries under "*" to every model.
+"""
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import openai
+from config import model_config_section
+from utils.status import log_debug
+from storage.perf_stats import get_perf_stats
+from llm.telemetry import record_call, current_scope, estimate_prompt_tokens, CHARS_PER_TOKEN
+from llm.rate_limiter import get_limiter, call_priority
+from storage.llm_cache import (
+    is_cacheable, response_cache_key, lookup_response, store_response, env_enabled as response_cache_enabled
+)
+from llm.cassette import recording_path, record_exchange, record_completion
+from llm.retry_policy import classify_failure, backoff_delay, TRANSIENT
+from utils.deadline import check_deadline, io_timeout, in_current_deadline, sleep as deadline_sleep
+
+# Attempts per route (primary or fallback) for transient errors
+MAX_ATTEMPTS_PER_ROUTE = 3
+# Longest Retry-After honored (seconds)
+MAX_RETRY_AFTER = 30.0
+# Circuit breaker: consecutive transient failures before a route is skipped, and for how long
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30.0
+
+# Hedging: percentile of observed latency that triggers a hedge, samples needed before
+# hedging a model, the shortest hedge delay, and the share of recent calls that may be hedged
+HEDGE_PERCENTILE = 90
+HEDGE_MIN_SAMPLES = 10
+HEDGE_MIN_DELAY_SECONDS = 1.0
+HEDGE_MAX_FRACTION = float(os.getenv("LLM_HEDGE_MAX_FRACTION", "0.1"))
+HEDGE_WINDOW = 200
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+class LLMGatewayError(RuntimeError):
+    """Raised when no route produced a usable completion."""
+
+class EmptyResponseError(LLMGatewayError):
+    """The provider returned no choices or no content."""
+
+class ContentFilteredError(LLMGatewayError):
+    """The provider's content filter blocked the response."""
+
+# --- Circuit breaker ---
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open trial after the cooldown."""
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= BREAKER_COOLDOWN_SECONDS and not self.trial_in_flight:
+                self.trial_in_flight = True  # Half-open: let one request through
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= BREAKER_FAILURE_THRESHOLD:
+                self.opened_at = time.time()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def _breaker(base_url, model) -> CircuitBreaker:
+    with _breakers_lock:
+        return _breakers.setdefault((str(base_url), model), CircuitBreaker())
+
+def breaker_states() -> dict:
+    """Open circuit breakers by "base_url model", for diagnostics."""
+    with _breakers_lock:
+        return {f"{url} {model}": breaker.failures for (url, model), breaker in _breakers.items()
+                if breaker.opened_at is not None}
+
+# --- Fallback configuration ---
+
+def load_fallbacks() -> dict:
+    """The "fallbacks" section of the model configuration."""
+    return model_config_section("fallbacks")
+
+# --- Hedging budget ---
+
+class HedgeBudget:
+    """Caps hedged requests at HEDGE_MAX_FRACTION of the last HEDGE_WINDOW calls."""
+
+    def __init__(self):
+        self.calls = deque(maxlen=HEDGE_WINDOW)  # True for calls that sent a hedge
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self.calls.append(False)
+
+    def try_spend(self) -> bool:
+        """Mark the latest call as hedged if the budget allows it."""
+        with self._lock:
+            if not self.calls or sum(self.calls) + 1 > HEDGE_MAX_FRACTION * len(self.calls):
+                return False
+            self.calls[-1] = True
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.hedges_won += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": len(self.calls), "hedged": sum(self.calls), "hedges_won": self.hedges_won}
+
+hedge_budget = HedgeBudget()
+# Hedged calls run here so the caller can wait on whichever finishes first
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+def hedge_delay(model):
+    """Seconds to wait before hedging a call to model, or None without enough history."""
+    stats = get_perf_stats()
+    samples = stats.data["models"].get(model, {}).get("latency", [])
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return max(HEDGE_MIN_DELAY_SECONDS, stats.model_latency_percentile(model, HEDGE_PERCENTILE))
+
+def estimate_call_tokens(kwargs) -> int:
+    """Tokens a call is expected to use: estimated prompt plus max_tokens or the model's usual completion."""
+    completion_tokens = kwargs.get("max_tokens")
+    if not completion_tokens:
+        completion_tokens = get_perf_stats().model_tokens(kwargs.get("model"))[1]
+    return int(estimate_prompt_tokens(kwargs.get("messages")) + completion_tokens)
+
+# --- Error classification ---
+
+def is_retryable(error) -> bool:
+    """True for errors worth retrying on the same route."""
+    if isinstance(error, EmptyResponseError):
+        return True
+    if isinstance(error, ContentFilteredError):
+        return False
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError,
+                          openai.RateLimitError, openai.InternalServerError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return classify_failure(error) == TRANSIENT
+
+def _retry_after(error):
+    """Seconds requested by a Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return min(float(headers.get("retry-after")), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return None
+
+def check_completion(completion):
+    """Raise for completions the callers cannot use; return the completion otherwise."""
+    if completion is None or not getattr(completion, "choices", None):
+        raise EmptyResponseError("The model returned no choices")
+    choice = completion.choices[0]
+    if getattr(choice, "finish_reason", None) == "content_filter":
+        raise ContentFilteredError("The response was blocked by the provider's content filter")
+    message = getattr(choice, "message", None)
+    if message is None or (message.content is None and not getattr(message, "tool_calls", None)):
+        if getattr(message, "refusal", None):
+            raise ContentFilteredError(f"The model refused to respond: {message.refusal}")
+        raise EmptyResponseError(f"The model returned no content (finish reason: {getattr(choice, 'finish_reason', None)})")
+    return completion
+
+# --- Gateway ---
+
+class _Completions:
+    def __init__(self, gateway):
+        self._gateway = gateway
+
+    def create(self, **kwargs):
+        return self._gateway.create(**kwargs)
+
+class _Chat:
+    def __init__(self, gateway):
+        self.completions = _Completions(gateway)
+
+class LLMGateway:
+    """Drop-in replacement for an OpenAI client whose chat completions go through the gateway."""
+
+    def __init__(self, client):
+        self.client = client
+        self.chat = _Chat(self)
+
+    def __getattr__(self, name):
+        # Everything else (base_url, api_key, models, ...) comes from the wrapped client
+        return getattr(self.client, name)
+
+    def _routes(self, model):
+        """The primary (client, model) followed by the configured fallbacks."""
+        routes = [(self.client, model)]
+        fallbacks = load_fallbacks()
+        for entry in list(fallbacks.get(model, [])) + list(fallbacks.get("*", [])):
+            if not isinstance(entry, dict) or not entry.get("model"):
+                continue
+            client = self.client
+            if entry.get("base_url"):
+                from llm.client import get_raw_client
+                api_key = os.getenv(entry["api_key_env"]) if entry.get("api_key_env") else self.client.api_key
+                client = get_raw_client(api_key, entry["base_url"]) if api_key else None
+            if client is not None and (client, entry["model"]) not in routes:
+                routes.append((client, entry["model"]))
+        return routes
+
+    def create(self, hedge=False, phase=None, cache=None, **kwargs):
+        """Create a chat completion with retries, circuit breaking and failover.
+
+        Streaming requests are retried only while the stream is being opened and
+        are never hedged. Every call is recorded in the LLM telemetry log.
+
+        Args:
+            hedge: Send a second request to the secondary route if this one is slower
+                than the model's p90 latency; the first usable response wins
+            phase: Pipeline phase making the call, for telemetry (planner, executor, ...)
+            cache: With the response cache enabled: True to cache this call even at a
+                non-zero temperature, False never to; by default temperature-0 calls are cached
+            **kwargs: Arguments of client.chat.completions.create
+
+        Raises:
+            The last provider error, or LLMGatewayError if every route returned an unusable response
+        """
+        started = time.time()
+        scope = current_scope()
+        cache_key = None
+        if scope.get("response_cache", response_cache_enabled()) and is_cacheable(kwargs, cache):
+            cache_key = response_cache_key(kwargs, self.client.base_url)
+            completion = lookup_response(cache_key)
+            if completion is not None:
+                usage = getattr(completion, "usage", None)
+                record_call(phase, kwargs.get("model"), getattr(completion, "model", None),
+                            prompt_tokens=getattr(usage, "prompt_tokens", None),
+                            completion_tokens=getattr(usage, "completion_tokens", None),
+                            latency=time.time() - started, cached=True)
+                return completion
+
+        hedge_budget.record_call()
+        trace = {"attempts": 0, "model": None, "base_url": None, "hedged": False, "queued": 0.0,
+                 # Rate limiting: queue class, fairness key and the estimated token cost of the call
+                 "priority": call_priority(phase, scope.get("complexity")),
+                 "session": scope.get("session"),
+                 "tokens": estimate_call_tokens(kwargs)}
+        try:
+            delay = hedge_delay(kwargs.get("model")) if hedge and not kwargs.get("stream") else None
+            if delay is not None:
+                completion = self._create_hedged(delay, kwargs, trace)
+            else:
+                completion = self._create(self._routes(kwargs.get("model")), kwargs, trace)
+        except Exception as e:
+            record_call(phase, kwargs.get("model"), trace["model"], latency=time.time() - started,
+                        retries=max(0, trace["attempts"] - 1), hedged=trace["hedged"],
+                        queued=trace["queued"], stream=bool(kwargs.get("stream")), error=str(e)[:300])
+            raise
+
+        if kwargs.get("stream"):
+            return _RecordedStream(completion, phase, kwargs, trace, started)
+        usage = getattr(completion, "usage", None)
+        latency = time.time() - started
+        record_call(phase, kwargs.get("model"), trace["model"],
+                    prompt_tokens=getattr(usage, "prompt_tokens", None),
+                    completion_tokens=getattr(usage, "completion_tokens", None),
+                    latency=latency, retries=max(0, trace["attempts"] - 1),
+                    hedged=trace["hedged"], queued=trace["queued"])
+        record_completion(kwargs, completion, latency, trace["model"])
+        if cache_key:
+            # Keyed by the route that answered, so a fallback's response is never
+            # replayed as if the primary provider and model had given it
+            store_response(response_cache_key(dict(kwargs, model=trace["model"]), trace["base_url"]), completion)
+        return completion
+
+    def _create_hedged(self, delay, kwargs, trace):
+        """Run the request, and after delay seconds a hedge on the secondary route."""
+        routes = self._routes(kwargs.get("model"))
+        traces = {}
+        # Both requests stay bound to the caller's step deadline
+        create = in_current_deadline(self._create)
+        primary = _hedge_pool.submit(create, routes, dict(kwargs), traces.setdefault("primary", dict(trace)))
+        done, _ = wait([primary], timeout=delay)
+        if done or not hedge_budget.try_spend():
+            try:
+                return primary.result()
+            finally:
+                trace.update(traces["primary"])
+
+        # The secondary route is the first fallback, or the same route again
+        secondary_route = routes[1] if len(routes) > 1 else routes[0]
+        log_debug(f"{kwargs.get('model')} slower than {delay:.1f}s; hedging on {secondary_route[1]}")
+        secondary = _hedge_pool.submit(create, [secondary_route], dict(kwargs),
+                                       traces.setdefault("secondary", dict(trace)))
+        trace["hedged"] = True
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        hedge_budget.record_win()
+                    winner = traces["secondary" if future is secondary else "primary"]
+                    trace["model"], trace["base_url"] = winner["model"], winner["base_url"]
+                    trace["attempts"] = sum(t["attempts"] for t in traces.values())
+                    trace["queued"] = max(t["queued"] for t in traces.values())
+                    # The SDK cannot abort a request in flight; the loser finishes in the
+                    # background and its response is discarded
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                error = error or future.exception()
+        trace["attempts"] = sum(t["attempts"] for t in traces.values())
+        raise error
+
+    def _create(self, routes, kwargs, trace):
+        """Try each (client, model) route in turn, retrying transient errors.
+
+        trace["attempts"] counts requests sent; trace["model"] and trace["base_url"] are the last route tried.
+        """
+        kwargs = dict(kwargs)
+        model = kwargs.pop("model")
+        streaming = bool(kwargs.get("stream"))
+        last_error = None
+
+        for route_index, (client, route_model) in enumerate(routes):
+            breaker = _breaker(client.base_url, route_model)
+            if not breaker.allow():
+                log_debug(f"Circuit open for {route_model} at {client.base_url}; skipping")
+                continue
+            if route_index:
+                log_debug(f"Falling back to {route_model} at {client.base_url} after: {last_error}")
+
+            limiter = get_limiter(client.base_url, route_model)
+            for attempt in range(MAX_ATTEMPTS_PER_ROUTE):
+                # Stop retrying once the step is skipped or out of time
+                check_deadline()
+                trace["attempts"] += 1
+                trace["model"] = route_model
+                trace["base_url"] = client.base_url
+                if limiter:
+                    # Wait for this route's shared RPM/TPM budget
+                    trace["queued"] += limiter.acquire(trace["tokens"], trace["priority"], trace["session"])
+                request_timeout = io_timeout(None)
+                request_kwargs = dict(kwargs, timeout=request_timeout) if request_timeout is not None else kwargs
+                try:
+                    attempt_started = time.time()
+                    completion = client.chat.completions.create(model=route_model, **request_kwargs)
+                    if not streaming:
+                        check_completion(completion)
+                        # Per-route latency history drives plan estimates and hedge delays
+                        usage = getattr(completion, "usage", None)
+                        get_perf_stats().record_model(route_model, time.time() - attempt_started,
+                                                      getattr(usage, "prompt_tokens", None),
+                                                      getattr(usage, "completion_tokens", None))
+                        if limiter:
+                            limiter.reconcile(trace["tokens"], getattr(usage, "total_tokens", None))
+                    breaker.record_success()
+                    return completion
+                except Exception as e:
+                    last_error = e
+                    if limiter and isinstance(e, openai.RateLimitError):
+                        # Hold every session's calls to this route, not just this one
+                        limiter.block(_retry_after(e) or backoff_delay(attempt))
+                    if not is_retryable(e):
+                        # Bad request, auth, unknown model or content filter: try the next route
+                        if not isinstance(e, ContentFilteredError):
+                            breaker.record_success()  # The route itself is healthy
+                        break
+                    if attempt + 1 < MAX_ATTEMPTS_PER_ROUTE:
+                        delay = max(backoff_delay(attempt), _retry_after(e) or 0.0)
+                        log_debug(f"Transient LLM error from {route_model} ({e}); retrying in {delay:.1f}s")
+                        deadline_sleep(delay)
+            else:
+                # Every attempt on this route failed transiently
+                breaker.record_failure()
+
+        if last_error is None:
+            raise LLMGatewayError(f"No available route for model {model} (circuit breakers open)")
+        raise last_error
+
+class _RecordedStream:
+    """Wraps a completion stream to record time to first token and usage once it is consumed."""
+
+    def __init__(self, stream, phase, kwargs, trace, started):
+        self._stream = stream
+        self._phase = phase
+        self._kwargs = kwargs
+        self._trace = trace
+        self._started = started
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __iter__(self):
+        first_token_at = None
+        text_chars = 0
+        usage = None
+        error = None
+        finish_reason = None
+        # The text is kept only while a cassette is being recorded
+        parts = [] if recording_path() else None
+        try:
+            for chunk in self._stream:
+                usage = getattr(chunk, "usage", None) or usage
+                for choice in getattr(chunk, "choices", None) or []:
+                    finish_reason = getattr(choice, "finish_reason", None) or finish_reason
+                    content = getattr(getattr(choice, "delta", None), "content", None)
+                    if content:
+                        if first_token_at is None:
+                            first_token_at = time.time()
+                        text_chars += len(content)
+                        if parts is not None:
+                            parts.append(content)
+                yield chunk
+        except Exception as e:
+            error = str(e)[:300]
+            raise
+        finally:
+            # Providers that do not report usage on streams get an estimate
+            estimated = usage is None
+            prompt_tokens = getattr(usage, "prompt_tokens", None) if usage else \
+                estimate_prompt_tokens(self._kwargs.get("messages"))
+            completion_tokens = getattr(usage, "completion_tokens", None) if usage else text_chars // CHARS_PER_TOKEN
+            record_call(self._phase, self._kwargs.get("model"), self._trace["model"],
+                        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                        latency=time.time() - self._started,
+                        ttft=first_token_at - self._started if first_token_at else None,
+                        retries=max(0, self._trace["attempts"] - 1), queued=self._trace["queued"], stream=True,
+                        estimated_usage=estimated, error=error)
+            if parts is not None and error is None:
+                record_exchange(self._kwargs, "".join(parts), finish_reason,
+                                usage.model_dump() if hasattr(usage, "model_dump") else None,
+                                latency=time.time() - self._started,
+                                ttft=first_token_at - self._started if first_token_at else None,
+                                served_model=self._trace["model"])
@@ -0,0 +1,253 @@
+"""
+Tolerant JSON parsing for LLM outputs in the ReAct application.
+Repairs the usual completion quirks (code fences, trailing prose, trailing commas,
+single quotes, truncated arrays/objects) so a response can be salvaged instead of
+discarded, and only asks the model again as a last resort.
+"""
+import ast
+import json
+import re
+
+_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([\]}])")
+
+class JSONRepairError(ValueError):
+    """Raised when no JSON value could be recovered from a response."""
+
+def _strip_fences(text: str) -> str:
+    """Remove markdown code fences, including an unterminated opening fence."""
+    match = _FENCE_PATTERN.search(text)
+    if match:
+        return match.group(1).strip()
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        # Truncated response: opening fence without a closing one
+        first_newline = stripped.find("\n")
+        return stripped[first_newline + 1:].strip() if first_newline != -1 else ""
+    return stripped
+
+def _next_bracket(text: str, start: int) -> int:
+    """Index of the next [ or { at or after start (-1 if none)."""
+    return next((index for index in range(start, len(text)) if text[index] in "[{"), -1)
+
+def _bracket_end(text: str, start: int):
+    """Index just past the bracket closing the one at start (None if it is never closed)."""
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return None
+
+def _raw_decode_from_first_bracket(text: str):
+    """Decode the first JSON value in the text, ignoring prose before and after it.
+
+    A bracketed span in leading prose (e.g. "Here is the plan [see below]:") is neither
+    a valid nor a repairable value, so the search continues after it. Brackets nested
+    inside such a span are not tried on their own: a fragment of a Python-style object
+    must not pass for the whole value.
+    """
+    decoder = json.JSONDecoder()
+    index = _next_bracket(text, 0)
+    if index == -1:
+        raise JSONRepairError("No JSON object or array found in response")
+    while index != -1:
+        try:
+            value, _ = decoder.raw_decode(text, index)
+            return value
+        except ValueError:
+            pass
+        try:
+            return _close_truncated(text[index:])
+        except JSONRepairError:
+            pass
+        end = _bracket_end(text, index)
+        if end is None:
+            break
+        index = _next_bracket(text, end)
+    raise JSONRepairError("Could not repair truncated JSON")
+
+def _close_truncated(text: str):
+    """Recover a truncated JSON value by cutting at the last complete element and closing brackets."""
+    stack = []
+    in_string = False
+    escaped = False
+    candidates = []
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "[{":
+            stack.append(char)
+        elif char in "]}":
+            if stack:
+                stack.pop()
+            candidates.append((index + 1, tuple(stack)))
+            if not stack:
+                break  # Complete top-level value; anything after it is trailing text
+        elif char == ",":
+            candidates.append((index, tuple(stack)))
+
+    if not in_string and stack:
+        candidates.append((len(text), tuple(stack)))
+
+    # Try the longest prefix first so as much content as possible is kept
+    for cut, open_brackets in reversed(candidates):
+        closers = "".join("]" if bracket == "[" else "}" for bracket in reversed(open_brackets))
+        candidate = _TRAILING_COMMA_PATTERN.sub(r"\1", text[:cut].rstrip().rstrip(",") + closers)
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    raise JSONRepairError("Could not repair truncated JSON")
+
+class _JSONLiterals(ast.NodeTransformer):
+    """Turn the bare names true/false/null of JSON into Python constants."""
+
+    _VALUES = {"true": True, "false": False, "null": None}
+
+    def visit_Name(self, node):
+        if node.id in self._VALUES:
+            return ast.copy_location(ast.Constant(self._VALUES[node.id]), node)
+        return node
+
+def _python_literal(text: str):
+    """Parse single-quoted, Python-style JSON (e.g. {'tool': 'x', 'ok': True})."""
+    start = min([i for i in (text.find("{"), text.find("[")) if i != -1], default=-1)
+    if start == -1:
+        raise JSONRepairError("No JSON object or array found in response")
+    try:
+        # JSON literals are mapped on the syntax tree, so "true" inside a string stays as written
+        tree = _JSONLiterals().visit(ast.parse(text[start:].strip(), mode="eval"))
+        value = ast.literal_eval(tree)
+    except (ValueError, SyntaxError) as e:
+        raise JSONRepairError(f"Could not parse response as JSON: {e}")
+    if not isinstance(value, (dict, list)):
+        raise JSONRepairError("Response is not a JSON object or array")
+    return value
+
+def parse_llm_json(text):
+    """Parse an LLM response as JSON, repairing common problems.
+
+    Args:
+        text (str): The raw completion content
+
+    Returns:
+        dict | list: The recovered JSON value
+
+    Raises:
+        JSONRepairError: If nothing could be recovered
+    """
+    if text is None:
+        raise JSONRepairError("Empty response")
+    body = _strip_fences(str(text))
+    if not body:
+        raise JSONRepairError("Empty response")
+
+    # 1. Plain JSON
+    try:
+        return json.loads(body)
+    except ValueError:
+        pass
+
+    # 2. Trailing commas
+    without_trailing_commas = _TRAILING_COMMA_PATTERN.sub(r"\1", body)
+    try:
+        return json.loads(without_trailing_commas)
+    except ValueError:
+        pass
+
+    # 3. Prose around the value, or a truncated value
+    try:
+        return _raw_decode_from_first_bracket(without_trailing_commas)
+    except JSONRepairError:
+        pass
+
+    # 4. Single quotes / Python literals
+    return _python_literal(body)
+
+def _looks_like_step(value) -> bool:
+    return isinstance(value, dict) and "description" in value
+
+def extract_plan_steps(parsed) -> list:
+    """Extract the list of plan steps from a parsed planner/adjuster response.
+
+    Accepts a bare list, a dict wrapper with any key (e.g. {"plan": [...]} or
+    {"steps": [...]}) or a single step object. Items that are not step objects
+    are dropped so the valid steps can still be used.
+
+    Returns:
+        list: The salvaged step dicts (possibly empty)
+    """
+    if isinstance(parsed, list):
+        candidates = parsed
+    elif isinstance(parsed, dict):
+        if _looks_like_step(parsed):
+            candidates = [parsed]
+        else:
+            # Prefer the first list value that contains step objects
+            lists = [value for value in parsed.values() if isinstance(value, list)]
+            candidates = next((value for value in lists if any(_looks_like_step(item) for item in value)),
+                              lists[0] if lists else [])
+    else:
+        candidates = []
+    return [item for item in candidates if _looks_like_step(item)]
+
+def extract_action(parsed):
+    """Extract an executor action ({"tool": ..., "args": {...}}) from a parsed response.
+
+    Returns:
+        dict | None: The action, or None if none could be found
+    """
+    if isinstance(parsed, list):
+        return next((item for item in parsed if isinstance(item, dict) and "tool" in item), None)
+    if isinstance(parsed, dict):
+        if "tool" in parsed:
+            if not isinstance(parsed.get("args"), dict):
+                parsed["args"] = {}
+            return parsed
+        # Wrapped action, e.g. {"action": {"tool": ..., "args": ...}}
+        for value in parsed.values():
+            if isinstance(value, dict) and "tool" in value:
+                return extract_action(value)
+    return None
+
+def reask_messages(messages, bad_content, expected: str) -> list:
+    """Build a follow-up conversation asking the model to resend valid JSON.
+
+    Args:
+        messages (list): The original messages
+        bad_content (str): The response that could not be parsed
+        expected (str): Short description of the expected JSON shape
+
+    Returns:
+        list: Messages for the retry call
+    """
+    return list(messages) + [
+        {"role": "assistant", "content": bad_content or ""},
+        {"role": "user", "content": f"Your previous response was not valid JSON. Respond again with *only* {expected}, "
+                                    "with no code fences or text before or after it."}
+    ]
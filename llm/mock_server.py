@@ -0,0 +1,238 @@
+"""
+Local OpenAI-compatible stand-in that replays recorded LLM cassettes.
+Serves POST /v1/chat/completions (JSON or SSE streaming) and GET /v1/models from
+one or more cassette files recorded with LLM_RECORD_CASSETTE, with a configurable
+latency profile, so the pipeline can be benchmarked offline and reproducibly.
+
+Usage:
+    python -m llm.mock_server agent_workspace/cassettes/bench.jsonl --port 8765 --latency recorded
+
+then set the LLM API Base URL to http://127.0.0.1:8765/v1 (any API key works).
+
+Latency profiles:
+    recorded            the latency (and time to first token) measured while recording
+    fixed:SECONDS       the same latency for every response
+    lognormal:MEDIAN,SIGMA
+                        random latencies with a long tail, seeded with --seed
+    none                answer immediately
+--speed divides every latency (e.g. --speed 10 replays ten times faster).
+
+A request that is not in the cassette gets a 404 error (the gateway does not retry it),
+or a placeholder answer with --on-miss stub. Repeated identical requests replay the
+recorded responses in order, cycling at the end.
+"""
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from llm.cassette import load_cassette, cassette_key
+
+# Time to first token as a share of the latency when none was recorded
+DEFAULT_TTFT_FRACTION = 0.3
+# Characters per streamed chunk
+STREAM_CHUNK_CHARS = 16
+
+class LatencyProfile:
+    """Turns a recorded exchange into (time to first token, total latency) in seconds."""
+
+    def __init__(self, spec="recorded", speed=1.0, seed=None):
+        self.kind, _, args = spec.partition(":")
+        self.args = [float(a) for a in args.split(",") if a]
+        if self.kind not in ("recorded", "fixed", "lognormal", "none"):
+            raise ValueError(f"Unknown latency profile: {spec}")
+        if self.kind == "fixed" and len(self.args) != 1 or self.kind == "lognormal" and len(self.args) != 2:
+            raise ValueError(f"Invalid latency profile arguments: {spec}")
+        self.speed = max(speed, 1e-6)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def timing(self, entry):
+        if self.kind == "none":
+            return 0.0, 0.0
+        if self.kind == "fixed":
+            latency = self.args[0]
+        elif self.kind == "lognormal":
+            with self._lock:
+                latency = self._random.lognormvariate(math.log(self.args[0]), self.args[1])
+        else:
+            latency = entry.get("latency") or 0.0
+        ttft = entry.get("ttft") if self.kind == "recorded" and entry.get("ttft") is not None \
+            else latency * DEFAULT_TTFT_FRACTION
+        return min(ttft, latency) / self.speed, latency / self.speed
+
+class CassetteReplayer:
+    """Looks up recorded responses, replaying repeated requests in recording order."""
+
+    def __init__(self, exchanges, on_miss="error"):
+        self.exchanges = exchanges
+        self.on_miss = on_miss
+        self.hits = 0
+        self.misses = 0
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, request):
+        key = cassette_key(request)
+        with self._lock:
+            entries = self.exchanges.get(key)
+            if not entries:
+                self.misses += 1
+                return key, None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            self.hits += 1
+            return key, entries[position % len(entries)]
+
+def _completion_body(entry, model):
+    """A chat.completion object for an exchange."""
+    response = entry.get("response")
+    if response and response.get("choices"):
+        return dict(response, id=f"chatcmpl-{uuid.uuid4().hex[:24]}", created=int(time.time()))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": entry.get("served_model") or model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": entry.get("content") or ""},
+                     "finish_reason": entry.get("finish_reason") or "stop"}],
+        "usage": entry.get("usage"),
+    }
+
+def _stream_chunks(entry, model):
+    """chat.completion.chunk objects streaming an exchange's text."""
+    chunk_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    text = entry.get("content") or ""
+    pieces = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+    base = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": entry.get("served_model") or model}
+    chunks = [dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": piece} if i == 0
+                                   else {"content": piece}, "finish_reason": None}])
+              for i, piece in enumerate(pieces)]
+    chunks.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": entry.get("finish_reason") or "stop"}],
+                       usage=entry.get("usage")))
+    return chunks
+
+def make_handler(replayer, profile, quiet=False):
+    """Build the request handler class serving a replayer."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status, message, code):
+            self._send_json(status, {"error": {"message": message, "type": "invalid_request_error", "code": code}})
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                models = sorted({e["model"] for entries in replayer.exchanges.values() for e in entries if e.get("model")})
+                self._send_json(200, {"object": "list", "data": [{"id": m, "object": "model", "owned_by": "cassette"}
+                                                                 for m in models]})
+            else:
+                self._error(404, f"Unknown path {self.path}", "not_found")
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._error(404, f"Unknown path {self.path}", "not_found")
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._error(400, "Request body is not valid JSON", "invalid_json")
+                return
+
+            key, entry = replayer.lookup(request)
+            if entry is None:
+                if replayer.on_miss != "stub":
+                    self._error(404, f"No recorded response for {key}", "cassette_miss")
+                    return
+                entry = {"content": "(no recorded response)", "finish_reason": "stop"}
+
+            ttft, latency = profile.timing(entry)
+            model = request.get("model")
+            if not request.get("stream"):
+                time.sleep(latency)
+                self._send_json(200, _completion_body(entry, model))
+                return
+
+            # Server-sent events: the first chunk after ttft, the rest spread over the remaining time
+            chunks = _stream_chunks(entry, model)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            time.sleep(ttft)
+            gap = (latency - ttft) / max(1, len(chunks) - 1)
+            try:
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        time.sleep(gap)
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            self.close_connection = True
+
+    return Handler
+
+def start_server(cassettes, host="127.0.0.1", port=8765, latency="recorded", speed=1.0,
+                 seed=None, on_miss="error", quiet=True):
+    """Start the mock server in a background thread.
+
+    Returns:
+        tuple: (server, base_url) - call server.shutdown() to stop it
+    """
+    replayer = CassetteReplayer(load_cassette(cassettes), on_miss)
+    server = ThreadingHTTPServer((host, port), make_handler(replayer, LatencyProfile(latency, speed, seed), quiet))
+    server.daemon_threads = True
+    server.replayer = replayer
+    threading.Thread(target=server.serve_forever, name="llm-mock-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded LLM cassettes as an OpenAI-compatible API.")
+    parser.add_argument("cassettes", nargs="+", help="Cassette files recorded with LLM_RECORD_CASSETTE")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="recorded",
+                        help="recorded, none, fixed:SECONDS or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--speed", type=float, default=1.0, help="Divide every latency by this factor")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for random latency profiles")
+    parser.add_argument("--on-miss", choices=["error", "stub"], default="error",
+                        help="Answer unknown requests with a 404 error or a placeholder")
+    parser.add_argument("--quiet", action="store_true", help="Do not log requests")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_server(args.cassettes, args.host, args.port, args.latency, args.speed,
+                                    args.seed, args.on_miss, args.quiet)
+    count = sum(len(entries) for entries in server.replayer.exchanges.values())
+    print(f"Replaying {count} recorded responses at {base_url}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Stopped. {server.replayer.hits} hits, {server.replayer.misses} misses.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
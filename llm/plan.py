@@ -0,0 +1,287 @@
+"""
+Indexed plan data structure for the ReAct application.
+
+A Plan keeps its steps in execution order together with an id-to-step map, a
+reverse-dependency adjacency list and an incrementally maintained ready set.
+Step ids are stable: inserting or replacing steps allocates fresh ids instead of
+renumbering, so dependency lists never have to be rewritten. Steps still support
+dict-style access and serialize to the original dict shape for the UI and for
+saved conversations.
+"""
+
+# Statuses that satisfy a dependency
+DONE_STATUSES = ("Completed", "Skipped")
+
+class PlanStep:
+    """A single plan step with dict-style access for compatibility."""
+
+    __slots__ = ("step_id", "description", "tool_suggestion", "dependencies", "status", "result", "extra", "_plan")
+
+    FIELDS = ("step_id", "description", "tool_suggestion", "dependencies", "status", "result")
+
+    def __init__(self, step_id, description="", tool_suggestion="None", dependencies=None,
+                 status="Pending", result=None, extra=None):
+        self.step_id = step_id
+        self.description = description
+        self.tool_suggestion = tool_suggestion
+        self.dependencies = list(dependencies or [])
+        self.status = status
+        self.result = result
+        self.extra = dict(extra or {})  # reasoning, action_str, retry counters, ...
+        self._plan = None
+
+    # --- dict-style access ---
+    def __getitem__(self, key):
+        if key in PlanStep.FIELDS:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key, value):
+        if key == "status":
+            self._set_status(value)
+        elif key in PlanStep.FIELDS:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in PlanStep.FIELDS or key in self.extra
+
+    def get(self, key, default=None):
+        if key in PlanStep.FIELDS:
+            return getattr(self, key)
+        return self.extra.get(key, default)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def _set_status(self, status):
+        previous = self.status
+        self.status = status
+        if self._plan is not None and previous != status:
+            self._plan._on_status_change(self, previous)
+
+    def to_dict(self) -> dict:
+        """Serialize to the original plan step dict shape."""
+        data = {field: getattr(self, field) for field in PlanStep.FIELDS}
+        data["dependencies"] = list(self.dependencies)
+        data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlanStep":
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS}
+        return cls(data.get("step_id"), data.get("description", ""), data.get("tool_suggestion", "None"),
+                   data.get("dependencies", []), data.get("status", "Pending"), data.get("result"), extra)
+
+    def __repr__(self):
+        return f"PlanStep({self.step_id!r}, {self.status!r}, {self.description!r})"
+
+class Plan:
+    """Ordered, indexed collection of plan steps."""
+
+    def __init__(self, steps=None):
+        self._order = []
+        self._by_id = {}
+        self._dependents = {}
+        self._unmet = {}
+        self._ready = set()
+        self._next_id = 1
+        self.meta = {}  # Plan-wide execution bookkeeping (adjustment counters, fingerprints)
+        for step in steps or []:
+            self._append(step if isinstance(step, PlanStep) else PlanStep.from_dict(step))
+        self._rebuild_index()
+
+    @classmethod
+    def from_dicts(cls, steps) -> "Plan":
+        """Build a plan from the planner's list of step dicts."""
+        if isinstance(steps, Plan):
+            return steps
+        return cls(steps or [])
+
+    def to_dicts(self) -> list:
+        """Serialize to a list of step dicts (the original plan shape)."""
+        return [step.to_dict() for step in self._order]
+
+    # --- sequence protocol ---
+    def __len__(self):
+        return len(self._order)
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __getitem__(self, index):
+        return self._order[index]
+
+    def __bool__(self):
+        return bool(self._order)
+
+    # --- lookups ---
+    def get(self, step_id):
+        """Return the step with the given id, or None (O(1))."""
+        return self._by_id.get(step_id)
+
+    def index_of(self, step_id) -> int:
+        """Return the execution-order index of a step (-1 if missing)."""
+        step = self._by_id.get(step_id)
+        return self._order.index(step) if step is not None else -1
+
+    def dependents(self, step_id) -> set:
+        """Ids of the steps that depend on the given step."""
+        return set(self._dependents.get(step_id, ()))
+
+    def is_ready(self, step_id) -> bool:
+        """True if the step is pending and all of its dependencies are done (O(1))."""
+        return step_id in self._ready
+
+    def ready_steps(self) -> list:
+        """Pending steps whose dependencies are all done, in execution order."""
+        return [step for step in self._order if step.step_id in self._ready]
+
+    def unmet_dependencies(self, step_id) -> list:
+        """Dependencies of a step that are not yet Completed or Skipped."""
+        step = self._by_id.get(step_id)
+        if step is None:
+            return []
+        return [dep for dep in step.dependencies
+                if dep not in self._by_id or self._by_id[dep].status not in DONE_STATUSES]
+
+    # --- index maintenance ---
+    def _allocate_id(self):
+        step_id = self._next_id
+        self._next_id += 1
+        return step_id
+
+    def _append(self, step: PlanStep, position=None):
+        if step.step_id is None or step.step_id in self._by_id:
+            step.step_id = self._allocate_id()
+        elif isinstance(step.step_id, int):
+            self._next_id = max(self._next_id, step.step_id + 1)
+        step._plan = self
+        if position is None:
+            self._order.append(step)
+        else:
+            self._order.insert(position, step)
+        self._by_id[step.step_id] = step
+
+    def _rebuild_index(self):
+        """Recompute the reverse adjacency list, unmet counts and ready set from scratch."""
+        self._dependents = {step_id: set() for step_id in self._by_id}
+        for step in self._order:
+            for dep in step.dependencies:
+                self._dependents.setdefault(dep, set()).add(step.step_id)
+        self._unmet = {step.step_id: len(self.unmet_dependencies(step.step_id)) for step in self._order}
+        self._ready = {step_id for step_id, count in self._unmet.items()
+                       if count == 0 and self._by_id[step_id].status == "Pending"}
+
+    def _refresh_step(self, step: PlanStep):
+        """Recompute the unmet count and ready membership of one step."""
+        self._unmet[step.step_id] = len(self.unmet_dependencies(step.step_id))
+        if self._unmet[step.step_id] == 0 and step.status == "Pending":
+            self._ready.add(step.step_id)
+        else:
+            self._ready.discard(step.step_id)
+
+    def _on_status_change(self, step: PlanStep, previous):
+        """Keep unmet counts and the ready set in sync when a step changes status."""
+        was_done = previous in DONE_STATUSES
+        is_done = step.status in DONE_STATUSES
+        if was_done != is_done:
+            delta = -1 if is_done else 1
+            for dependent_id in self._dependents.get(step.step_id, ()):
+                dependent = self._by_id.get(dependent_id)
+                if dependent is None:
+                    continue
+                self._unmet[dependent_id] = self._unmet.get(dependent_id, 0) + delta
+                if self._unmet[dependent_id] == 0 and dependent.status == "Pending":
+                    self._ready.add(dependent_id)
+                else:
+                    self._ready.discard(dependent_id)
+        if step.status == "Pending" and self._unmet.get(step.step_id, 0) == 0:
+            self._ready.add(step.step_id)
+        else:
+            self._ready.discard(step.step_id)
+
+    # --- structural edits ---
+    def _add_steps(self, position: int, step_dicts, excluded_ids=()) -> list:
+        """Insert new steps at a position, mapping their provisional ids to fresh stable ids.
+
+        Dependencies that refer to provisional ids within the new group are remapped;
+        dependencies on existing steps are kept; anything else is dropped.
+        """
+        id_map = {}
+        new_steps = []
+        for data in step_dicts:
+            step = PlanStep.from_dict(data)
+            provisional = step.step_id
+            step.step_id = self._allocate_id()
+            if provisional is not None and provisional not in id_map:
+                id_map[provisional] = step.step_id
+            step.status = "Pending"
+            step.result = None
+            new_steps.append(step)
+
+        for step in new_steps:
+            remapped = []
+            for dep in step.dependencies:
+                if dep in id_map and id_map[dep] != step.step_id:
+                    remapped.append(id_map[dep])
+                elif dep in self._by_id and dep not in excluded_ids:
+                    remapped.append(dep)
+            step.dependencies = list(dict.fromkeys(remapped))
+
+        for offset, step in enumerate(new_steps):
+            self._append(step, position + offset)
+        for step in new_steps:
+            for dep in step.dependencies:
+                self._dependents.setdefault(dep, set()).add(step.step_id)
+            self._dependents.setdefault(step.step_id, set())
+            self._refresh_step(step)
+        return new_steps
+
+    def insert_after(self, step_id, step_dicts) -> list:
+        """Insert new steps right after the given step (at the start if step_id is None).
+
+        Returns:
+            list: The inserted PlanStep objects (with their stable ids)
+        """
+        position = 0 if step_id is None else self.index_of(step_id) + 1
+        return self._add_steps(position, step_dicts)
+
+    def replace(self, step_id, step_dicts) -> list:
+        """Replace a step with new steps; its dependents are rewired to the new group's final steps.
+
+        Returns:
+            list: The inserted PlanStep objects
+        """
+        old = self._by_id.get(step_id)
+        if old is None:
+            return []
+        position = self._order.index(old)
+        new_steps = self._add_steps(position, step_dicts, excluded_ids=(step_id,))
+
+        # Remove the replaced step
+        self._order.remove(old)
+        del self._by_id[step_id]
+        old._plan = None
+        for dep in old.dependencies:
+            self._dependents.get(dep, set()).discard(step_id)
+        self._unmet.pop(step_id, None)
+        self._ready.discard(step_id)
+
+        # Steps that depended on the replaced step now depend on the new group's sink steps
+        new_ids = {step.step_id for step in new_steps}
+        sinks = [step.step_id for step in new_steps
+                 if not any(step.step_id in other.dependencies for other in new_steps)]
+        for dependent_id in self._dependents.pop(step_id, set()):
+            dependent = self._by_id.get(dependent_id)
+            if dependent is None or dependent_id in new_ids:
+                continue
+            dependent.dependencies = list(dict.fromkeys(
+                [d for d in dependent.dependencies if d != step_id] + sinks))
+            for sink in sinks:
+                self._dependents.setdefault(sink, set()).add(dependent_id)
+            self._refresh_step(dependent)
+        return new_steps
@@ -3,10 +3,128 @@ Plan adjustment functions for the ReAct application.
 Allows for dynamic modification of plans during execution.
 """
 import json
+import time
 import streamlit as st
 from datetime import datetime
-from config import TOOL_DESCRIPTIONS
 from utils.status import log_debug
+from llm.prompt_builder import render_static_prefix, build_messages, client_base_url
+from llm.retry_policy import (
+    classify_failure, backoff_delay, fingerprint, TRANSIENT, SKIP, ABORT, STEP_BACKOFF_CAP,
+    MAX_TRANSIENT_RETRIES_PER_STEP, MAX_TRANSIENT_RETRIES_PER_PLAN,
+    MAX_ADJUST_RETRIES_PER_STEP, MAX_REPLACEMENTS_PER_STEP, MAX_ADJUSTMENTS_PER_PLAN, MAX_INSERTIONS_PER_PLAN
+)
+from llm.plan import Plan
+from llm.json_repair import parse_llm_json, extract_plan_steps, reask_messages, JSONRepairError
+
+# Static recovery instructions; the plan, failed step, observation and context are sent in the user message.
+FAILURE_STATIC_TEMPLATE = """You are a plan adjustment specialist. The current execution step has failed.
+Your task is to analyze the failure and suggest how to modify the plan to recover.
+The user message contains the current plan, the failed step, the error observation and the execution context.
+
+You have these options:
+1. RETRY: Suggest retrying the same step with modified parameters
+2. REPLACE: Replace the failed step with one or more alternative steps
+3. SKIP: Skip the failed step and continue with the next step
+4. ABORT: Abort the plan execution if recovery is not possible
+
+Respond with a JSON object with the following structure:
+{{
+  "action": "RETRY|REPLACE|SKIP|ABORT",
+  "reason": "Detailed explanation of your decision",
+  "new_steps": [] // Only for REPLACE action, array of new step objects
+}}
+
+For REPLACE action, each new step should have the same structure as existing steps:
+{{
+  "step_id": integer,
+  "description": "Step description",
+  "tool_suggestion": "tool_name",
+  "dependencies": [list of step_ids],
+  "status": "Pending",
+  "result": null
+}}
+"""
+
+# Static plan-enhancement instructions; the plan-specific data is sent in the user message.
+ADDITIONAL_STEPS_STATIC_TEMPLATE = """You are a plan enhancement specialist. The current execution step has completed,
+but the observation indicates that additional steps are needed.
+The user message contains the current plan, the current step, the observation and the execution context.
+
+Your task is to suggest additional steps to insert after the current step.
+
+Respond with a JSON object with the following structure:
+{{
+  "reason": "Detailed explanation of why additional steps are needed",
+  "new_steps": [] // Array of new step objects to insert
+}}
+
+Each new step should have the same structure as existing steps:
+{{
+  "step_id": integer,
+  "description": "Step description",
+  "tool_suggestion": "tool_name",
+  "dependencies": [list of step_ids],
+  "status": "Pending",
+  "result": null
+}}
+"""
+
+# Size limits for the adjuster prompt, independent of how much data the plan has gathered
+MAX_OBSERVATION_CHARS = 2000
+MAX_CONTEXT_VALUE_CHARS = 800
+MAX_RETRY_NOTE_CHARS = 300
+OUTLINE_FIELDS = ("step_id", "description", "tool_suggestion", "status", "dependencies")
+
+def truncate_text(text, limit: int) -> str:
+    """Keep the head and tail of a long text, marking how much was cut."""
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    return f"{text[:head]}\n... [{len(text) - limit} characters omitted] ...\n{text[-tail:]}"
+
+def _compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+def _step_outline(step) -> dict:
+    """A step without its result and execution details."""
+    return {field: step.get(field) for field in OUTLINE_FIELDS}
+
+def plan_outline(plan) -> str:
+    """Compact plan outline: ids, descriptions, tools, statuses and dependencies (no results)."""
+    return "\n".join(_compact_json(_step_outline(step)) for step in plan)
+
+def relevant_context(plan, from_index, context) -> dict:
+    """Select only the context entries the remaining steps depend on.
+
+    Args:
+        plan: The plan steps
+        from_index (int): Index of the first step that still has to run
+        context (dict): The full execution context
+
+    Returns:
+        dict: Truncated dependency results, mentioned memory values and the names of other memory keys
+    """
+    remaining = plan[from_index:]
+    needed_keys = set()
+    for step in remaining:
+        for dep in step.get("dependencies", []):
+            needed_keys.add(f"step_{dep}_result")
+    descriptions = " ".join(str(step.get("description", "")) for step in remaining)
+
+    selected = {}
+    other_keys = []
+    for key, value in context.items():
+        if key in ("current_component", "component_capabilities"):
+            selected[key] = value
+        elif key in needed_keys or (not key.startswith("step_") and key in descriptions):
+            selected[key] = truncate_text(value, MAX_CONTEXT_VALUE_CHARS)
+        elif not key.startswith("step_"):
+            other_keys.append(key)
+    if other_keys:
+        selected["other_memory_keys"] = other_keys
+    return selected
 
 def adjust_plan(client, plan, current_step_index, context, observation, executor_model):
     """
@@ -14,7 +132,7 @@ def adjust_plan(client, plan, current_step_index, context, observation, executor
     
     Args:
         client: The LLM client
-        plan: The current plan
+        plan (Plan): The current plan (a list of step dicts is converted)
         current_step_index: The index of the current step
         context: The execution context
         observation: The observation from the current step
@@ -23,123 +141,212 @@ def adjust_plan(client, plan, current_step_index, context, observation, executor
     Returns:
         tuple: (adjusted_plan, should_continue, next_step_index, status_message)
     """
+    plan = Plan.from_dicts(plan)
+    current_step = plan[current_step_index]
+    step_failed = current_step.get("status") == "Failed" or "error" in observation.lower() or "failed" in observation.lower()
+
+    # Transient failures (network, rate limits, 5xx) are retried in place without asking the LLM
+    if current_step.get("status") == "Failed" and classify_failure(observation) == TRANSIENT:
+        retried = retry_transient_failure(plan, current_step_index, observation)
+        if retried:
+            return retried
+
     # If we're at the last step, no need to adjust
     if current_step_index >= len(plan) - 1:
         return plan, True, current_step_index + 1, None
     
     # Check if the current step failed
-    current_step = plan[current_step_index]
-    if "error" in observation.lower() or "failed" in observation.lower():
-        # The step failed, we need to adjust the plan
+    if step_failed:
+        # Escalate without another LLM call if the plan is looping or out of budget
+        escalation = check_failure_loop(plan, current_step, observation)
+        if escalation:
+            return escalate(plan, current_step_index, *escalation)
+        # The step failed for a semantic reason, we need the LLM to adjust the plan
         return handle_step_failure(client, plan, current_step_index, context, observation, executor_model)
     
     # Check if we need to add additional steps based on the observation
-    if needs_additional_steps(observation):
+    if needs_additional_steps(observation) and insertion_allowed(plan, current_step, observation):
         return add_additional_steps(client, plan, current_step_index, context, observation, executor_model)
     
     # Default: continue with the original plan
     return plan, True, current_step_index + 1, None
 
-def handle_step_failure(client, plan, current_step_index, context, observation, executor_model):
-    """Handle a failed step by creating a recovery plan."""
-    current_step = plan[current_step_index]
-    
-    # Create a prompt for the LLM to generate a recovery plan
-    system_prompt = f"""You are a plan adjustment specialist. The current execution step has failed.
-Your task is to analyze the failure and suggest how to modify the plan to recover.
+def _parse_adjustment(client, executor_model, messages, response_content):
+    """Leniently parse an adjuster response; re-ask the model once if nothing can be salvaged.
+
+    Returns:
+        dict: The adjustment object (may be empty)
+    """
+    try:
+        parsed = parse_llm_json(response_content)
+    except JSONRepairError as e:
+        log_debug(f"Adjuster JSON repair failed: {e}. Re-asking the model for valid JSON.")
+        completion = client.chat.completions.create(
+            model=executor_model,
+            messages=reask_messages(messages, response_content, "the JSON adjustment object"),
+            temperature=0.2,
+            response_format={"type": "json_object"},
+            phase="adjuster"
+        )
+        parsed = parse_llm_json(completion.choices[0].message.content)
 
-Current Plan:
-{json.dumps(plan, indent=2)}
+    if isinstance(parsed, list):
+        # A bare list of steps: treat it as the new steps
+        return {"new_steps": parsed}
+    if isinstance(parsed, dict):
+        return parsed
+    return {}
 
-Failed Step (index {current_step_index}):
-{json.dumps(current_step, indent=2)}
+def check_failure_loop(plan, current_step, observation):
+    """Detect runaway adjustment loops before asking the LLM for another recovery.
 
-Error Observation:
-{observation}
+    A failure whose action and observation match an earlier failure in this plan is a
+    loop: retrying or replacing again would only repeat it.
 
-Context:
-{json.dumps(context, indent=2)}
+    Returns:
+        tuple | None: (SKIP or ABORT, reason) to escalate, or None to let the LLM adjust
+    """
+    adjustments = plan.meta.get("adjustments", 0)
+    if adjustments >= MAX_ADJUSTMENTS_PER_PLAN:
+        return ABORT, f"plan adjustment budget spent ({adjustments} retries/replacements)"
 
-You have these options:
-1. RETRY: Suggest retrying the same step with modified parameters
-2. REPLACE: Replace the failed step with one or more alternative steps
-3. SKIP: Skip the failed step and continue with the next step
-4. ABORT: Abort the plan execution if recovery is not possible
+    seen = plan.meta.setdefault("failure_fingerprints", set())
+    key = fingerprint(current_step.get("action_str"), observation)
+    if key in seen:
+        return SKIP, "the step repeated an earlier failing action with the same result"
+    seen.add(key)
 
-Respond with a JSON object with the following structure:
-{{
-  "action": "RETRY|REPLACE|SKIP|ABORT",
-  "reason": "Detailed explanation of your decision",
-  "new_steps": [] // Only for REPLACE action, array of new step objects
-}}
+    # Neither a retry nor a replacement would be accepted, so do not ask
+    if (current_step.get("adjust_retries", 0) >= MAX_ADJUST_RETRIES_PER_STEP
+            and current_step.get("replacement_depth", 0) >= MAX_REPLACEMENTS_PER_STEP):
+        return SKIP, "retry and replacement budgets for this step are spent"
+    return None
 
-For REPLACE action, each new step should have the same structure as existing steps:
-{{
-  "step_id": integer,
-  "description": "Step description",
-  "tool_suggestion": "tool_name",
-  "dependencies": [list of step_ids],
-  "status": "Pending",
-  "result": null
-}}
-"""
+def insertion_allowed(plan, current_step, observation) -> bool:
+    """Check the insertion budget and that this observation has not already triggered an insertion."""
+    if plan.meta.get("insertions", 0) >= MAX_INSERTIONS_PER_PLAN:
+        log_debug(f"Insertion budget spent ({MAX_INSERTIONS_PER_PLAN}); continuing with the current plan")
+        return False
+    seen = plan.meta.setdefault("insertion_fingerprints", set())
+    key = fingerprint(current_step.get("action_str"), observation)
+    if key in seen:
+        log_debug(f"Step {current_step['step_id']} repeated an observation that already added steps; not adding more")
+        return False
+    seen.add(key)
+    return True
+
+def escalate(plan, current_step_index, action, reason):
+    """Skip the current step or abort the plan because a retry budget is spent or a loop was detected."""
+    current_step = plan[current_step_index]
+    log_debug(f"Escalating step {current_step['step_id']} to {action}: {reason}")
+    if action == SKIP:
+        if current_step.get("status") != "Completed":
+            current_step["status"] = "Skipped"
+            current_step["result"] = f"Skipped: {reason}"
+        return plan, True, current_step_index + 1, f"⏭️ Skipping step {current_step['step_id']}: {reason}"
+    return plan, False, -2, f"❌ Plan execution aborted: {reason}"
+
+def retry_transient_failure(plan, current_step_index, observation):
+    """Retry a transiently failed step in place after a short jittered backoff.
+
+    Returns:
+        tuple | None: The adjust_plan result, or None if the retry budget is spent
+    """
+    current_step = plan[current_step_index]
+    step_retries = current_step.get("transient_retries", 0)
+    # Kept in the plan's bookkeeping so replacing a step does not refill the plan budget
+    plan_retries = plan.meta.get("transient_retries", 0)
+    if step_retries >= MAX_TRANSIENT_RETRIES_PER_STEP or plan_retries >= MAX_TRANSIENT_RETRIES_PER_PLAN:
+        log_debug(f"Transient retry budget spent (step: {step_retries}, plan: {plan_retries}); escalating to the adjuster")
+        return None
+
+    # The failed call was already retried by the gateway/HTTP helpers, so this wait stays short
+    delay = backoff_delay(step_retries, cap=STEP_BACKOFF_CAP)
+    retry_at = time.time() + delay
+    while True:
+        left = retry_at - time.time()
+        if left <= 0:
+            break
+        # Updating the status each second also lets a Skip/Reset click interrupt the wait
+        if 'status_container' in st.session_state:
+            st.session_state.status_container.warning(
+                f"🔁 Transient failure in step {current_step['step_id']}, retrying in {left:.0f}s "
+                f"(attempt {step_retries + 1}/{MAX_TRANSIENT_RETRIES_PER_STEP})")
+        time.sleep(min(1.0, left))
+
+    current_step["transient_retries"] = step_retries + 1
+    plan.meta["transient_retries"] = plan_retries + 1
+    current_step["status"] = "Pending"
+    current_step["result"] = None
+    return plan, True, current_step_index, f"🔁 Retried step {current_step['step_id']} after a transient failure: {str(observation)[:120]}"
+
+def handle_step_failure(client, plan, current_step_index, context, observation, executor_model):
+    """Handle a failed step by creating a recovery plan."""
+    current_step = plan[current_step_index]
     
+    # Static instructions first (cacheable), then the plan-specific data
+    system_prompt = render_static_prefix(FAILURE_STATIC_TEMPLATE)
+    volatile_sections = [
+        f"Current Plan (outline):\n{plan_outline(plan)}",
+        f"Failed Step (index {current_step_index}):\n{_compact_json(_step_outline(current_step))}",
+        f"Error Observation:\n{truncate_text(observation, MAX_OBSERVATION_CHARS)}",
+        f"Context:\n{_compact_json(relevant_context(plan, current_step_index, context))}"
+    ]
+    messages = build_messages(system_prompt, volatile_sections,
+                              "Analyze the failed step and suggest a recovery plan.", client_base_url(client))
+
     try:
         completion = client.chat.completions.create(
             model=executor_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Analyze the failed step and suggest a recovery plan."}
-            ],
+            messages=messages,
             temperature=0.2,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            phase="adjuster"
         )
         
         response_content = completion.choices[0].message.content
-        adjustment = json.loads(response_content)
+        adjustment = _parse_adjustment(client, executor_model, messages, response_content)
         
-        action = adjustment.get("action", "ABORT")
+        # A response with replacement steps but no explicit action is treated as REPLACE
+        action = str(adjustment.get("action") or ("REPLACE" if adjustment.get("new_steps") else "ABORT")).upper()
         reason = adjustment.get("reason", "No reason provided")
         
         if action == "RETRY":
+            retries = current_step.get("adjust_retries", 0)
+            if retries >= MAX_ADJUST_RETRIES_PER_STEP:
+                return escalate(plan, current_step_index, SKIP, f"retry budget spent ({retries} retries): {reason}")
             # Modify the current step based on the failure
-            plan[current_step_index]["status"] = "Pending"  # Reset status
-            plan[current_step_index]["result"] = None  # Clear result
-            # Add a note about the retry
-            plan[current_step_index]["description"] += f" (Retry after failure: {reason})"
-            return plan, True, current_step_index, f"🔄 Retrying step {current_step_index + 1}: {reason}"
+            current_step["adjust_retries"] = retries + 1
+            plan.meta["adjustments"] = plan.meta.get("adjustments", 0) + 1
+            current_step["status"] = "Pending"  # Reset status
+            current_step["result"] = None  # Clear result
+            # Keep only the latest retry reason so the description and prompts do not grow
+            current_step["retry_note"] = truncate_text(reason, MAX_RETRY_NOTE_CHARS)
+            return plan, True, current_step_index, f"🔄 Retrying step {current_step['step_id']}: {reason}"
             
         elif action == "REPLACE":
             # Replace the failed step with new steps
-            new_steps = adjustment.get("new_steps", [])
+            new_steps = extract_plan_steps(adjustment.get("new_steps", []))
             if not new_steps:
                 return plan, False, -2, f"❌ Plan adjustment failed: Replacement steps not provided"
+            depth = current_step.get("replacement_depth", 0)
+            if depth >= MAX_REPLACEMENTS_PER_STEP:
+                return escalate(plan, current_step_index, SKIP, f"replacement budget spent ({depth} replacements): {reason}")
+            # Replacements inherit the depth so a chain of replacements is bounded as well
+            for new_step in new_steps:
+                new_step["replacement_depth"] = depth + 1
+            plan.meta["adjustments"] = plan.meta.get("adjustments", 0) + 1
             
-            # Remove the failed step
-            failed_step = plan.pop(current_step_index)
-            
-            # Insert new steps at the current position
-            for i, new_step in enumerate(new_steps):
-                # Ensure step_id is sequential
-                new_step["step_id"] = current_step_index + i + 1
-                plan.insert(current_step_index + i, new_step)
-            
-            # Adjust step_ids for all subsequent steps
-            for i in range(current_step_index + len(new_steps), len(plan)):
-                plan[i]["step_id"] = i + 1
-            
-            # Adjust dependencies for all steps
-            for step in plan:
-                # Update dependencies that pointed to steps after the failed step
-                step["dependencies"] = [dep if dep <= failed_step["step_id"] else dep + len(new_steps) - 1 
-                                       for dep in step["dependencies"]]
+            # Replace the failed step; new steps get fresh stable ids and the
+            # failed step's dependents are rewired to them (no renumbering)
+            plan.replace(current_step["step_id"], new_steps)
             
             return plan, True, current_step_index, f"🔄 Replaced failed step with {len(new_steps)} new steps: {reason}"
             
         elif action == "SKIP":
             # Mark the current step as skipped and move to the next
-            plan[current_step_index]["status"] = "Skipped"
-            plan[current_step_index]["result"] = f"Skipped: {reason}"
+            current_step["status"] = "Skipped"
+            current_step["result"] = f"Skipped: {reason}"
             return plan, True, current_step_index + 1, f"⏭️ Skipping failed step: {reason}"
             
         else:  # ABORT or unknown action
@@ -168,78 +375,39 @@ def add_additional_steps(client, plan, current_step_index, context, observation,
     """Add additional steps to the plan based on the observation."""
     current_step = plan[current_step_index]
     
-    # Create a prompt for the LLM to generate additional steps
-    system_prompt = f"""You are a plan enhancement specialist. The current execution step has completed,
-but the observation indicates that additional steps are needed.
-
-Current Plan:
-{json.dumps(plan, indent=2)}
-
-Current Step (index {current_step_index}):
-{json.dumps(current_step, indent=2)}
-
-Observation:
-{observation}
-
-Context:
-{json.dumps(context, indent=2)}
-
-Your task is to suggest additional steps to insert after the current step.
-
-Respond with a JSON object with the following structure:
-{{
-  "reason": "Detailed explanation of why additional steps are needed",
-  "new_steps": [] // Array of new step objects to insert
-}}
+    # Static instructions first (cacheable), then the plan-specific data
+    system_prompt = render_static_prefix(ADDITIONAL_STEPS_STATIC_TEMPLATE)
+    volatile_sections = [
+        f"Current Plan (outline):\n{plan_outline(plan)}",
+        f"Current Step (index {current_step_index}):\n{_compact_json(_step_outline(current_step))}",
+        f"Observation:\n{truncate_text(observation, MAX_OBSERVATION_CHARS)}",
+        f"Context:\n{_compact_json(relevant_context(plan, current_step_index + 1, context))}"
+    ]
+    messages = build_messages(system_prompt, volatile_sections,
+                              "Analyze the observation and suggest additional steps.", client_base_url(client))
 
-Each new step should have the same structure as existing steps:
-{{
-  "step_id": integer,
-  "description": "Step description",
-  "tool_suggestion": "tool_name",
-  "dependencies": [list of step_ids],
-  "status": "Pending",
-  "result": null
-}}
-"""
-    
     try:
         completion = client.chat.completions.create(
             model=executor_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Analyze the observation and suggest additional steps."}
-            ],
+            messages=messages,
             temperature=0.2,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            phase="adjuster"
         )
         
         response_content = completion.choices[0].message.content
-        adjustment = json.loads(response_content)
+        adjustment = _parse_adjustment(client, executor_model, messages, response_content)
         
         reason = adjustment.get("reason", "No reason provided")
-        new_steps = adjustment.get("new_steps", [])
+        new_steps = extract_plan_steps(adjustment.get("new_steps", []))
         
         if not new_steps:
             # No additional steps needed, continue with the original plan
             return plan, True, current_step_index + 1, None
         
-        # Insert new steps after the current step
-        for i, new_step in enumerate(new_steps):
-            # Ensure step_id is sequential
-            new_step["step_id"] = current_step_index + i + 2  # +2 because we're inserting after the current step
-            plan.insert(current_step_index + i + 1, new_step)
-        
-        # Adjust step_ids for all subsequent steps
-        for i in range(current_step_index + len(new_steps) + 1, len(plan)):
-            plan[i]["step_id"] = i + 1
-        
-        # Adjust dependencies for all steps
-        for step in plan:
-            # Update dependencies that pointed to steps after the current step
-            if step["step_id"] > current_step_index + len(new_steps) + 1:
-                step["dependencies"] = [dep if dep <= current_step_index + 1 else dep + len(new_steps) 
-                                      for dep in step["dependencies"]]
+        # Insert new steps after the current step with fresh stable ids
+        new_steps = plan.insert_after(current_step["step_id"], new_steps)
+        plan.meta["insertions"] = plan.meta.get("insertions", 0) + 1
         
         return plan, True, current_step_index + 1, f"➕ Added {len(new_steps)} new steps: {reason}"
         
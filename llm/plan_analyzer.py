@@ -0,0 +1,129 @@
+"""
+Plan analysis for the ReAct application.
+Computes dependency levels, the critical path and estimated time/token cost per step
+from historical per-tool and per-model statistics.
+"""
+from storage.perf_stats import get_perf_stats
+
+def compute_dependency_levels(plan) -> dict:
+    """Compute the dependency level of each step (steps on the same level can run in parallel).
+
+    Args:
+        plan: The plan steps
+
+    Returns:
+        dict: Mapping of step_id to level (0 for steps without dependencies)
+    """
+    deps_by_id = {step["step_id"]: [d for d in step.get("dependencies", [])] for step in plan}
+    levels = {}
+
+    def level_of(step_id, visiting):
+        if step_id in levels:
+            return levels[step_id]
+        if step_id in visiting:
+            return 0  # Cycle guard; validate_and_assess_plan removes cycles before execution
+        visiting.add(step_id)
+        parent_levels = [level_of(dep, visiting) for dep in deps_by_id.get(step_id, []) if dep in deps_by_id]
+        visiting.discard(step_id)
+        levels[step_id] = (max(parent_levels) + 1) if parent_levels else 0
+        return levels[step_id]
+
+    for step_id in deps_by_id:
+        level_of(step_id, set())
+    return levels
+
+def estimate_step(step, executor_model, stats=None) -> dict:
+    """Estimate wall-clock seconds and tokens for a single step.
+
+    A step costs one executor call plus the suggested tool's latency.
+    """
+    stats = stats or get_perf_stats()
+    prompt_tokens, completion_tokens = stats.model_tokens(executor_model)
+    tool = step.get("tool_suggestion", "None")
+    seconds = stats.model_seconds(executor_model) + stats.tool_seconds(tool)
+    return {"seconds": seconds, "tokens": int(prompt_tokens + completion_tokens)}
+
+def analyze_plan(plan, executor_model, stats=None) -> dict:
+    """Analyze a plan before or during execution.
+
+    Args:
+        plan: The plan steps
+        executor_model (str): The model that executes each step
+        stats (PerfStats, optional): Statistics store; defaults to the process-wide store
+
+    Returns:
+        dict: levels, estimates per step, critical path and totals
+    """
+    stats = stats or get_perf_stats()
+    steps = list(plan or [])
+    levels = compute_dependency_levels(steps)
+    estimates = {step["step_id"]: estimate_step(step, executor_model, stats) for step in steps}
+
+    # Longest path through the dependency graph, weighted by estimated seconds
+    finish = {}
+    previous = {}
+    for step in sorted(steps, key=lambda s: levels.get(s["step_id"], 0)):
+        step_id = step["step_id"]
+        best_dep, best_time = None, 0.0
+        for dep in step.get("dependencies", []):
+            if dep in finish and finish[dep] > best_time:
+                best_dep, best_time = dep, finish[dep]
+        finish[step_id] = best_time + estimates[step_id]["seconds"]
+        previous[step_id] = best_dep
+
+    critical_path = []
+    if finish:
+        node = max(finish, key=finish.get)
+        while node is not None:
+            critical_path.append(node)
+            node = previous.get(node)
+        critical_path.reverse()
+
+    remaining = [s for s in steps if s.get("status", "Pending") == "Pending"]
+    level_count = (max(levels.values()) + 1) if levels else 0
+    return {
+        "levels": levels,
+        "level_count": level_count,
+        "estimates": estimates,
+        "critical_path": critical_path,
+        "critical_path_seconds": max(finish.values()) if finish else 0.0,
+        "total_seconds": sum(e["seconds"] for e in estimates.values()),
+        "remaining_seconds": sum(estimates[s["step_id"]]["seconds"] for s in remaining),
+        "total_tokens": sum(e["tokens"] for e in estimates.values()),
+        "parallelism": (len(steps) / level_count) if level_count else 0.0,
+    }
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as a short human-readable duration."""
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    return f"{seconds / 60:.1f}min"
+
+def summarize_costs_for_planner(allowed_tools=None, stats=None) -> str:
+    """Compact summary of historical tool costs for the planner prompt.
+
+    Args:
+        allowed_tools (list, optional): Restrict the summary to these tools
+        stats (PerfStats, optional): Statistics store
+
+    Returns:
+        str: One line listing tools from cheapest to most expensive, or an empty string without history
+    """
+    stats = stats or get_perf_stats()
+    tools = stats.known_tools()
+    if allowed_tools is not None:
+        tools = [t for t in tools if t in allowed_tools]
+    if not tools:
+        return ""
+    ordered = sorted(tools, key=stats.tool_seconds)
+    costs = ", ".join(f"{t} ~{stats.tool_seconds(t):.1f}s" for t in ordered)
+    return ("Observed average tool latency (cheapest first): " + costs + ".\n"
+            "Prefer cheaper tools when they can answer the query (e.g. kb_search before firecrawl_crawl), "
+            "and only add dependencies that are really needed so independent steps stay parallel.")
+
+def describe_plan_estimate(analysis: dict) -> str:
+    """One-line description of a plan analysis for status messages."""
+    path = " → ".join(str(step_id) for step_id in analysis["critical_path"])
+    return (f"Estimated ~{format_duration(analysis['total_seconds'])}, ~{analysis['total_tokens']:,} tokens · "
+            f"{analysis['level_count']} dependency levels · critical path {path or '-'} "
+            f"(~{format_duration(analysis['critical_path_seconds'])})")
@@ -1,19 +1,88 @@
 """
 Planning functions for the ReAct application.
 """
-import json
 import traceback
 import streamlit as st
 from datetime import datetime
-from config import TOOL_DESCRIPTIONS
 from utils.status import log_debug
+from scf.router import get_router
+from llm.prompt_builder import tools_key, render_static_prefix, build_messages, client_base_url
+from tools.tool_docs import get_tool_descriptions
+from llm.plan_analyzer import summarize_costs_for_planner
+from llm.json_repair import parse_llm_json, extract_plan_steps, reask_messages, JSONRepairError
+
+# Static part of the planner prompt. Only the component prompt and the tool set vary,
+# so the rendered text is cached and sent as an identical prefix on every call.
+PLANNER_STATIC_TEMPLATE = """{base_prompt}
+You have access to the following tools:
+{tool_descriptions}
+
+**IMPORTANT FOR FILE OPERATIONS:**
+- When the user wants to ADD, APPEND, or UPDATE content in an existing file, plan to use `write_file` with `append=true`
+- When the user wants to CREATE a new file or REPLACE/OVERWRITE an existing file, plan to use `write_file` with `append=false` (default)
+- When the user wants to DELETE or REMOVE a file, plan to use `delete_file` with the filename
+- Examples where `append=true` is needed: "add a line to file.txt", "append text to file.txt", "update file.txt with new content"
+- After performing a web search, URLs are extracted and stored in memory under the key "search_result_urls". Use `memory_get("search_result_urls")` to retrieve the list of URLs for scraping or further processing.
+
+- Examples where `delete_file` is needed: "delete file.txt", "remove file.txt", "erase file.txt"
+
+**IMPORTANT FOR WEB SCRAPING AND KNOWLEDGE:**
+- When the user wants to scrape a URL and use it as knowledge, plan to use `web_scrape` to get the content and then `memory_set` to store it
+- After scraping a URL, store the content in memory with a descriptive key like "scraped_[domain]" for future reference
+- When answering questions about previously scraped content, plan to use `memory_get` to retrieve the stored content
+
+**IMPORTANT FOR KNOWLEDGE BASE OPERATIONS:**
+- When the user wants to add a web page to the knowledge base, plan to use `kb_add_web` with the URL
+- When the user wants to add a local markdown file to the knowledge base, plan to use `kb_add_file` with the filename
+- When the user wants to list all knowledge base entries, plan to use `kb_list`
+- When the user wants to retrieve content from the knowledge base, plan to use `kb_get` with the entry_id or memory_key
+- When the user wants to delete a knowledge base entry, plan to use `kb_delete` with the entry_id
+- When the user wants to search the knowledge base, plan to use `kb_search` with the query
+- Knowledge base entries are automatically added to memory and can be accessed in future conversations
+
+**IMPORTANT FOR MEMORY OPERATIONS:**
+- Use memory_get, memory_set, and memory_list tools to maintain information across multiple queries
+- When the user refers to information from previous interactions, plan to use memory_get to retrieve it
+- When you discover information that might be useful in future queries, plan to use memory_set to store it
+- Memory items available from previous interactions (if any) are listed in the user message
+
+**GUIDELINES FOR COMPLEX QUERIES:**
+- For multi-part queries, break down each part into separate steps with clear dependencies
+- For data-intensive tasks, include steps for data validation and error handling
+- For tasks requiring multiple sources, plan to gather all information before synthesis
+- For tasks with potential failure points, include fallback steps or verification steps
+- For tasks requiring comparisons or analysis, break down into data gathering, analysis, and synthesis steps
+- For tasks involving multiple tools in sequence, ensure proper data flow between steps
+- For tasks with conditional logic, create separate steps for each condition and use dependencies appropriately
+- For tasks requiring iterative processing, create steps that can handle batches or chunks of data
+- For tasks with ambiguity, include steps to clarify requirements or validate assumptions
+
+The user message contains today's date, the available memory items and the user query.
+Generate a structured plan for the user query as a JSON list of objects. Each object represents a step and must have the following keys:
+- "step_id": A unique integer identifier for the step (starting from 1).
+- "description": A clear, concise instruction for what needs to be done in this step.
+- "tool_suggestion": The name of the *most likely* tool to be used for this step (must be one of the available tools). If no specific tool is needed (e.g., final reasoning/compilation), suggest "None".
+- "dependencies": A list of `step_id`s that must be completed *before* this step can start. Empty list `[]` if no dependencies.
+- "status": Initialize this to "Pending".
+- "result": Initialize this to `null`.
+
+Ensure the plan is logical, sequential, and covers all aspects of the user query. The final step should typically involve compiling or presenting the result.
+Output *only* the JSON list, nothing else before or after.
+"""
 
 def assess_query_complexity(query: str) -> str:
     """Assess the complexity of a user query based on various factors.
 
+    Uses the learned router when a confident prediction is available and falls
+    back to the keyword heuristic otherwise.
+
     Returns:
         str: Complexity level - "Low", "Medium", or "High"
     """
+    learned = get_router().predict_complexity(query)
+    if learned:
+        return learned
+
     # Simple heuristic-based assessment
     complexity_indicators = [
         "compare", "analyze", "multiple", "several", "complex",
@@ -194,12 +263,8 @@ def run_planner(client, user_query: str, planner_model: str, custom_system_promp
         if memory_sections:
             memory_info = ''.join(memory_sections)
 
-    # Filter tool descriptions if allowed_tools is specified
-    tool_descriptions = TOOL_DESCRIPTIONS
-    if allowed_tools is not None:
-        # Filter the tool descriptions to only include allowed tools
-        tool_descriptions = "\n".join([line for line in TOOL_DESCRIPTIONS.split('\n')
-                                if any(tool in line for tool in allowed_tools) or not line.strip().startswith('-')])
+    # Tool descriptions are memoized per allowed tool set
+    tool_descriptions = get_tool_descriptions(tools_key(allowed_tools))
 
     # Use custom system prompt if provided, otherwise use the default
     if custom_system_prompt:
@@ -207,92 +272,65 @@ def run_planner(client, user_query: str, planner_model: str, custom_system_promp
     else:
         base_prompt = "You are a meticulous planning agent. Your task is to break down the user's query into a sequence of actionable steps."
 
-    system_prompt = f"""{base_prompt}
-Today's Date: {datetime.now().strftime('%Y-%m-%d')}
-You have access to the following tools:
-{tool_descriptions}
-
-**IMPORTANT FOR FILE OPERATIONS:**
-- When the user wants to ADD, APPEND, or UPDATE content in an existing file, plan to use `write_file` with `append=true`
-- When the user wants to CREATE a new file or REPLACE/OVERWRITE an existing file, plan to use `write_file` with `append=false` (default)
-- When the user wants to DELETE or REMOVE a file, plan to use `delete_file` with the filename
-- Examples where `append=true` is needed: "add a line to file.txt", "append text to file.txt", "update file.txt with new content"
-- After performing a web search, URLs are extracted and stored in memory under the key "search_result_urls". Use `memory_get("search_result_urls")` to retrieve the list of URLs for scraping or further processing.
-
-- Examples where `delete_file` is needed: "delete file.txt", "remove file.txt", "erase file.txt"
-
-**IMPORTANT FOR WEB SCRAPING AND KNOWLEDGE:**
-- When the user wants to scrape a URL and use it as knowledge, plan to use `web_scrape` to get the content and then `memory_set` to store it
-- After scraping a URL, store the content in memory with a descriptive key like "scraped_[domain]" for future reference
-- When answering questions about previously scraped content, plan to use `memory_get` to retrieve the stored content
-
-**IMPORTANT FOR KNOWLEDGE BASE OPERATIONS:**
-- When the user wants to add a web page to the knowledge base, plan to use `kb_add_web` with the URL
-- When the user wants to add a local markdown file to the knowledge base, plan to use `kb_add_file` with the filename
-- When the user wants to list all knowledge base entries, plan to use `kb_list`
-- When the user wants to retrieve content from the knowledge base, plan to use `kb_get` with the entry_id or memory_key
-- When the user wants to delete a knowledge base entry, plan to use `kb_delete` with the entry_id
-- When the user wants to search the knowledge base, plan to use `kb_search` with the query
-- Knowledge base entries are automatically added to memory and can be accessed in future conversations
-
-**IMPORTANT FOR MEMORY OPERATIONS:**
-- Use memory_get, memory_set, and memory_list tools to maintain information across multiple queries
-- When the user refers to information from previous interactions, plan to use memory_get to retrieve it
-- When you discover information that might be useful in future queries, plan to use memory_set to store it{memory_info}
-
-**GUIDELINES FOR COMPLEX QUERIES:**
-- For multi-part queries, break down each part into separate steps with clear dependencies
-- For data-intensive tasks, include steps for data validation and error handling
-- For tasks requiring multiple sources, plan to gather all information before synthesis
-- For tasks with potential failure points, include fallback steps or verification steps
-- For tasks requiring comparisons or analysis, break down into data gathering, analysis, and synthesis steps
-- For tasks involving multiple tools in sequence, ensure proper data flow between steps
-- For tasks with conditional logic, create separate steps for each condition and use dependencies appropriately
-- For tasks requiring iterative processing, create steps that can handle batches or chunks of data
-- For tasks with ambiguity, include steps to clarify requirements or validate assumptions
-
-Based on the user query: "{user_query}"
-
-Generate a structured plan as a JSON list of objects. Each object represents a step and must have the following keys:
-- "step_id": A unique integer identifier for the step (starting from 1).
-- "description": A clear, concise instruction for what needs to be done in this step.
-- "tool_suggestion": The name of the *most likely* tool to be used for this step (must be one of the available tools). If no specific tool is needed (e.g., final reasoning/compilation), suggest "None".
-- "dependencies": A list of `step_id`s that must be completed *before* this step can start. Empty list `[]` if no dependencies.
-- "status": Initialize this to "Pending".
-- "result": Initialize this to `null`.
+    # Static instructions form a byte-identical prefix; volatile data goes last
+    system_prompt = render_static_prefix(PLANNER_STATIC_TEMPLATE, base_prompt=base_prompt,
+                                         tool_descriptions=tool_descriptions)
+    volatile_sections = [
+        f"Today's Date: {datetime.now().strftime('%Y-%m-%d')}",
+        memory_info.strip(),
+        # Rolling averages; llm/cassette.py leaves this paragraph out of replay keys
+        summarize_costs_for_planner(allowed_tools),
+        f'User query: "{user_query}"'
+    ]
+    messages = build_messages(system_prompt, volatile_sections,
+                              "Generate the plan for the user query above. Output *only* the JSON list.",
+                              client_base_url(client))
 
-Ensure the plan is logical, sequential, and covers all aspects of the user query. The final step should typically involve compiling or presenting the result.
-Output *only* the JSON list, nothing else before or after.
-"""
+    response_content = ""
     try:
         completion = client.chat.completions.create(
             model=planner_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_query}
-            ],
+            messages=messages,
             temperature=temperature,  # Use complexity-based temperature
-            response_format={"type": "json_object"} # Request JSON output if model supports it
+            response_format={"type": "json_object"}, # Request JSON output if model supports it
+            hedge=st.session_state.get("hedge_llm_calls", False),
+            phase="planner"
         )
         response_content = completion.choices[0].message.content
-        # Sometimes the response might be wrapped in ```json ... ```, try to extract
-        if response_content.strip().startswith("```json"):
-             response_content = response_content.strip()[7:-3].strip()
-        # The model might return a dict with a key like "plan"
-        parsed_json = json.loads(response_content)
-        if isinstance(parsed_json, dict) and len(parsed_json) == 1:
-             plan_list = list(parsed_json.values())[0] # Get the list if it's nested
-        elif isinstance(parsed_json, list):
-             plan_list = parsed_json
-        else:
-             raise ValueError("Planner did not return a JSON list.")
+        # Repair fences, trailing text, truncation and dict wrappers; keep every valid step
+        plan_list = _salvage_plan(response_content)
+
+        if not plan_list:
+            # Last resort: ask the model once more for a clean JSON list
+            log_debug("Planner response could not be salvaged. Re-asking the model for valid JSON.")
+            completion = client.chat.completions.create(
+                model=planner_model,
+                messages=reask_messages(messages, response_content, "the JSON list of plan steps"),
+                temperature=temperature,
+                response_format={"type": "json_object"},
+                hedge=st.session_state.get("hedge_llm_calls", False),
+                phase="planner"
+            )
+            response_content = completion.choices[0].message.content
+            plan_list = _salvage_plan(response_content)
+
+        if not plan_list:
+            raise JSONRepairError("Planner did not return any valid plan steps.")
 
         # Validate and assess plan structure
         plan_list = validate_and_assess_plan(plan_list, complexity)
         return plan_list
-    except json.JSONDecodeError as e:
+    except JSONRepairError as e:
         st.error(f"Planner Error: Failed to decode JSON response: {e}\nResponse received:\n{response_content}")
         return []
     except Exception as e:
         st.error(f"Planner Error: An unexpected error occurred: {e}\n{traceback.format_exc()}")
         return []
+
+def _salvage_plan(response_content) -> list:
+    """Parse a planner response leniently and return the valid steps (empty list if none)."""
+    try:
+        return extract_plan_steps(parse_llm_json(response_content))
+    except JSONRepairError as e:
+        log_debug(f"Planner JSON repair failed: {e}")
+        return []
@@ -0,0 +1,75 @@
+"""
+Prompt assembly for the ReAct application.
+
+Static instructions (tool docs, guidelines, component prompt) are rendered once per
+component/tool set and reused as a byte-identical prefix, so providers that support
+prompt caching can reuse them across calls. Volatile content (today's date, memory
+listing, user query, context) is always appended after the static prefix.
+"""
+from functools import lru_cache
+from urllib.parse import urlparse
+
+# Hosts known to honour explicit `cache_control` hints on message content parts
+CACHE_CONTROL_HOSTS = ("openrouter.ai", "api.anthropic.com")
+
+def supports_cache_control(base_url) -> bool:
+    """Check whether the endpoint accepts explicit cache-control hints.
+
+    Args:
+        base_url: The API base URL (str or httpx.URL)
+
+    Returns:
+        bool: True if cache-control hints should be attached to the static prefix
+    """
+    if not base_url:
+        return False
+    host = urlparse(str(base_url)).netloc.lower()
+    return any(host == known or host.endswith("." + known) for known in CACHE_CONTROL_HOSTS)
+
+def tools_key(allowed_tools):
+    """Normalize an allowed-tools collection into a hashable cache key.
+
+    None means all tools are allowed and is kept as None.
+    """
+    if allowed_tools is None:
+        return None
+    return tuple(sorted(set(allowed_tools)))
+
+@lru_cache(maxsize=128)
+def render_static_prefix(template: str, **parts) -> str:
+    """Render a static prompt template once and reuse the exact same string afterwards.
+
+    Only stable values (component prompt, tool descriptions, agent description)
+    may be passed in `parts`; anything that changes per call belongs in the
+    volatile sections passed to `build_messages()`.
+    """
+    return template.format(**parts)
+
+def build_messages(static_prefix: str, volatile_sections, user_message: str, base_url=None) -> list:
+    """Assemble chat messages with the static prefix first and volatile content last.
+
+    Args:
+        static_prefix (str): The cached system prompt
+        volatile_sections (list): Per-call sections (date, memory, query, context); empty ones are dropped
+        user_message (str): The final instruction for the model
+        base_url: The API base URL, used to decide on cache-control hints
+
+    Returns:
+        list: Messages ready for `client.chat.completions.create`
+    """
+    if supports_cache_control(base_url):
+        system_content = [{"type": "text", "text": static_prefix, "cache_control": {"type": "ephemeral"}}]
+    else:
+        system_content = static_prefix
+
+    sections = [section for section in (volatile_sections or []) if section]
+    sections.append(user_message)
+
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": "\n\n".join(sections)}
+    ]
+
+def client_base_url(client):
+    """Return the base URL configured on an OpenAI-compatible client, if any."""
+    return getattr(client, "base_url", None)
@@ -0,0 +1,211 @@
+"""
+Process-wide LLM rate limiter for the ReAct application.
+All Streamlit sessions share the API key, so requests-per-minute and tokens-per-minute
+budgets are enforced per (base URL, model) for the whole process with token buckets.
+Waiting calls are served by priority class (interactive before background) and,
+within a class, round-robin between sessions so one long research plan cannot
+starve the others.
+
+Limits come from the "rate_limits" section of model_config.json:
+
+    "rate_limits": {
+        "*": {"rpm": 60, "tpm": 200000},
+        "google/gemini-2.0-flash-exp:free": {"rpm": 10}
+    }
+
+or from LLM_RPM_LIMIT / LLM_TPM_LIMIT. OpenRouter ":free" models default to 20 RPM.
+"""
+import os
+import time
+import itertools
+import threading
+from typing import Dict, Optional
+from config import model_config_section
+from utils.deadline import check_deadline, current_deadline, POLL_INTERVAL
+
+# OpenRouter's documented request limit for free models
+FREE_MODEL_RPM = 20
+# Longest a call waits in the queue before it is sent anyway (the gateway then handles any 429)
+MAX_QUEUE_SECONDS = 300.0
+
+# Lower runs first. Interactive phases (the user is watching) come before background work.
+PHASE_PRIORITY = {
+    "summarizer": 0,
+    "planner": 1,
+    "executor": 1,
+    "condenser": 1,
+    "adjuster": 2,
+    "draft": 2,
+    "title": 3,
+}
+DEFAULT_PRIORITY = 2
+
+def call_priority(phase, complexity=None) -> int:
+    """Priority of a call from its phase; calls answering low-complexity queries are promoted."""
+    priority = PHASE_PRIORITY.get(phase, DEFAULT_PRIORITY)
+    if complexity == "Low" and priority > 0:
+        priority -= 1
+    return priority
+
+def configured_limits(model) -> Dict[str, float]:
+    """{"rpm": ..., "tpm": ...} for a model (missing keys are unlimited)."""
+    limits = {}
+    env_rpm, env_tpm = os.getenv("LLM_RPM_LIMIT"), os.getenv("LLM_TPM_LIMIT")
+    if env_rpm:
+        limits["rpm"] = float(env_rpm)
+    if env_tpm:
+        limits["tpm"] = float(env_tpm)
+    if "rpm" not in limits and model and str(model).endswith(":free"):
+        limits["rpm"] = FREE_MODEL_RPM
+    config = model_config_section("rate_limits")
+    for section in (config.get("*"), config.get(model)):
+        if isinstance(section, dict):
+            limits.update({k: float(v) for k, v in section.items() if k in ("rpm", "tpm") and v})
+    return limits
+
+class TokenBucket:
+    """A bucket of capacity units refilled continuously over one minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount, now) -> float:
+        """Seconds until amount is available (requests larger than the bucket wait for a full bucket)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Charge (or refund) the difference between estimated and actual usage."""
+        self.level = min(self.capacity, self.level - delta)
+
+class _Waiter:
+    __slots__ = ("priority", "session", "seq", "tokens")
+
+    def __init__(self, priority, session, seq, tokens):
+        self.priority = priority
+        self.session = session
+        self.seq = seq
+        self.tokens = tokens
+
+class RouteLimiter:
+    """RPM/TPM buckets and the fair wait queue of one (base URL, model)."""
+
+    def __init__(self, rpm: Optional[float], tpm: Optional[float]):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self.waiting = []
+        self.last_served = {}  # session -> grant number, for round-robin
+        self.granted = 0
+        self.total_wait = 0.0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def configure(self, rpm, tpm):
+        """Apply changed limits (the configuration file can be edited while running)."""
+        with self._cond:
+            if (self.requests.capacity if self.requests else None) != rpm:
+                self.requests = TokenBucket(rpm) if rpm else None
+            if (self.tokens.capacity if self.tokens else None) != tpm:
+                self.tokens = TokenBucket(tpm) if tpm else None
+
+    def _next(self):
+        """The waiter to serve next: best priority, then the session served least recently."""
+        return min(self.waiting, key=lambda w: (w.priority, self.last_served.get(w.session, -1), w.seq))
+
+    def _wait_time(self, tokens, now) -> float:
+        wait = max(0.0, self.blocked_until - time.time())
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def acquire(self, tokens, priority, session) -> float:
+        """Wait for a slot; returns the seconds spent waiting.
+
+        Raises:
+            Cancelled, DeadlineExceeded: If the calling step is cancelled or runs out of time while queued
+        """
+        started = time.monotonic()
+        with self._cond:
+            waiter = _Waiter(priority, session, next(self._seq), tokens)
+            self.waiting.append(waiter)
+            try:
+                while True:
+                    # A skipped or expired step leaves the queue instead of waiting its turn
+                    check_deadline()
+                    now = time.monotonic()
+                    if self._next() is waiter:
+                        wait = self._wait_time(tokens, now)
+                        if wait <= 0 or now - started >= MAX_QUEUE_SECONDS:
+                            break
+                    else:
+                        wait = 0.5  # Re-check when woken or when the head's wait ends
+                    timeout = min(wait, max(0.05, MAX_QUEUE_SECONDS - (now - started)))
+                    deadline = current_deadline()
+                    if deadline is not None:
+                        # Wake up in time to notice a cancellation or the deadline passing
+                        left = deadline.remaining()
+                        timeout = min(timeout, POLL_INTERVAL, max(0.05, left) if left is not None else POLL_INTERVAL)
+                    self._cond.wait(timeout=timeout)
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(tokens)
+                self.granted += 1
+                self.last_served[session] = self.granted
+            finally:
+                self.waiting.remove(waiter)
+                self._cond.notify_all()
+        waited = time.monotonic() - started
+        self.total_wait += waited
+        return waited
+
+    def reconcile(self, estimated, actual):
+        """Correct the token bucket once the provider reported real usage."""
+        if self.tokens and actual is not None:
+            with self._cond:
+                self.tokens.adjust(actual - estimated)
+
+    def block(self, seconds):
+        """Hold every call for this route after a 429 (honouring Retry-After)."""
+        with self._cond:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(base_url, model) -> Optional[RouteLimiter]:
+    """The limiter of a route, or None if it has no limits."""
+    limits = configured_limits(model)
+    key = (str(base_url), model)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if not limits:
+            _limiters.pop(key, None)
+            return None
+        if limiter is None:
+            limiter = _limiters[key] = RouteLimiter(limits.get("rpm"), limits.get("tpm"))
+        else:
+            limiter.configure(limits.get("rpm"), limits.get("tpm"))
+        return limiter
+
+def limiter_states() -> Dict[str, Dict]:
+    """Queue length, grants and total wait per limited route, for diagnostics."""
+    with _limiters_lock:
+        items = list(_limiters.items())
+    return {f"{url} {model}": {"waiting": len(l.waiting), "granted": l.granted, "wait_s": round(l.total_wait, 1)}
+            for (url, model), l in items}
@@ -0,0 +1,124 @@
+"""
+Failure classification and retry backoff for the ReAct application.
+Distinguishes transient failures (network, rate limits, 5xx) that can simply be
+retried from semantic failures (bad arguments, missing data, wrong tool) that need
+the plan adjuster.
+"""
+import re
+import json
+import random
+import hashlib
+
+TRANSIENT = "transient"
+SEMANTIC = "semantic"
+
+# Retry budgets for transient failures
+MAX_TRANSIENT_RETRIES_PER_STEP = 3
+MAX_TRANSIENT_RETRIES_PER_PLAN = 8
+
+# Budgets for LLM-driven plan adjustments (RETRY/REPLACE decisions)
+MAX_ADJUST_RETRIES_PER_STEP = 2
+MAX_REPLACEMENTS_PER_STEP = 2
+MAX_ADJUSTMENTS_PER_PLAN = 6
+MAX_INSERTIONS_PER_PLAN = 3
+
+# Escalation actions when a budget is spent
+SKIP = "SKIP"
+ABORT = "ABORT"
+
+# Backoff parameters (seconds)
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 20.0
+
+# Backoff of a whole-step retry; the LLM gateway and HTTP helpers already retried the call itself
+STEP_BACKOFF_CAP = 5.0
+
+# Status codes only count next to HTTP wording, so ids and counts in messages do not match
+_TRANSIENT_PATTERNS = re.compile(
+    r"\b(?:429|500|502|503|504|529) (?:client |server )?error\b"
+    r"|\b(?:error code|status(?: code)?|http(?: error| status)?)[:=]? ?(?:429|500|502|503|504|529)\b"
+    r"|rate[ _-]?limit|too many requests|quota exceeded|overloaded"
+    r"|timed? ?out|timeout|deadline exceeded"
+    r"|connection (?:error|reset|refused|aborted|closed)|connectionerror|remote ?disconnected"
+    r"|remote end closed|max retries exceeded|broken pipe|network is unreachable"
+    r"|temporarily unavailable|service unavailable|bad gateway|gateway time-?out|internal server error"
+    r"|name resolution|ssl ?error|eof occurred|server disconnected|try again later",
+    re.IGNORECASE,
+)
+
+# How failed tool and executor calls start their observation (see llm/executor.py)
+_ERROR_PREFIXES = ("Tool execution failed", "Unexpected error", "Executor Error", "Error", "Failed", "Search failed")
+
+# Only this much of the error message is classified (tracebacks and payloads are ignored)
+MAX_ERROR_HEAD_CHARS = 500
+
+def _error_head(observation):
+    """The error message of a failed call, or None if the observation is tool output."""
+    text = str(observation).strip()
+    if text.startswith("{"):
+        # Tools report errors as {"error": "..."}; other JSON is a result
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and data.get("error"):
+            return str(data["error"])[:MAX_ERROR_HEAD_CHARS]
+        return None
+    first_line = text.split("\n", 1)[0]
+    if not first_line.startswith(_ERROR_PREFIXES):
+        return None
+    return first_line[:MAX_ERROR_HEAD_CHARS]
+
+def classify_failure(failure) -> str:
+    """Classify a failed step's observation or a raised exception.
+
+    Only the error message itself is classified: the first line of an observation
+    that starts with an error prefix, or the "error" field of a JSON error. Tool
+    output that merely mentions a status code or a timeout is semantic.
+
+    Args:
+        failure: The observation of the failed step, or the exception
+
+    Returns:
+        str: TRANSIENT for retryable infrastructure errors, SEMANTIC otherwise
+    """
+    if failure is None:
+        return SEMANTIC
+    if isinstance(failure, BaseException):
+        if isinstance(failure, (TimeoutError, ConnectionError)):
+            return TRANSIENT
+        head = f"{type(failure).__name__}: {failure}"[:MAX_ERROR_HEAD_CHARS]
+    else:
+        head = _error_head(failure)
+    if head is None:
+        return SEMANTIC
+    return TRANSIENT if _TRANSIENT_PATTERNS.search(head) else SEMANTIC
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Exponential backoff with full jitter.
+
+    Args:
+        attempt (int): Zero-based retry attempt
+        base (float): Delay of the first attempt
+        cap (float): Maximum delay
+
+    Returns:
+        float: Seconds to wait before the next attempt
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+_VOLATILE_TOKENS = re.compile(r"\b\d{2,}[\d:.\-t]*\b|0x[0-9a-f]+")
+
+def fingerprint(*parts) -> str:
+    """Fingerprint an action/observation pair for loop detection.
+
+    Whitespace, case and long numbers (timestamps, request ids) are normalized so
+    attempts that differ only in such details are still recognized as repeats.
+
+    Returns:
+        str: A short hex digest
+    """
+    normalized = "\x1f".join(
+        _VOLATILE_TOKENS.sub("#", " ".join(str(part or "").lower().split()))[:4000] for part in parts
+    )
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
@@ -3,13 +3,35 @@ Response generation functions for the ReAct application.
 """
 import re
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from processing.file_listing_handler import process_file_listing_response
+from llm.telemetry import in_current_scope
 
-def generate_final_response(client, user_query, plan):
-    """Generates a final response to the user's query based on execution results."""
-    if not client:
-        return "I couldn't generate a proper response due to API configuration issues."
+# Above this many characters of step results, results are condensed chunk by chunk (map)
+# with the condenser model before the summarizer writes the final answer (reduce)
+MAP_REDUCE_THRESHOLD_CHARS = 24000
+CHUNK_CHARS = 12000
+MAX_CONDENSE_WORKERS = 4
+
+CONDENSE_PROMPT = """You are condensing part of the results of a research plan so another model can answer the user's query.
+The user asked: "{user_query}"
+
+Extract everything in the results below that is relevant to the query: facts, figures, names, dates,
+quotes and conclusions. Drop boilerplate, navigation text and anything irrelevant.
+Keep the step number of each fact, and keep every URL or file name next to the facts it supports so
+sources can be cited. Respond with concise bullet points only."""
 
+def collect_results(plan, exclude_ids=()):
+    """Collect the completed step results and the referenced sources.
+
+    Args:
+        plan: The executed plan
+        exclude_ids: Ids of steps whose results are already covered (e.g. by the draft);
+            their sources are still collected
+
+    Returns:
+        tuple: (results_summary, references) lists
+    """
     # Prepare context for the final response
     results_summary = []
 
@@ -19,7 +41,9 @@ def generate_final_response(client, user_query, plan):
     for step in plan:
         if step["result"] and step["status"] == "Completed":
             # Process file listing responses to make them more user-friendly
-            if step["tool_suggestion"] == "list_files":
+            if step["step_id"] in exclude_ids:
+                pass
+            elif step["tool_suggestion"] == "list_files":
                 processed_result = process_file_listing_response(step["result"])
                 results_summary.append(f"Step {step['step_id']} ({step['description']}): {processed_result}")
             else:
@@ -48,15 +72,107 @@ def generate_final_response(client, user_query, plan):
 
     # Remove duplicate references
     references = list(set(references))
+    return results_summary, references
 
-    results_text = "\n\n".join(results_summary)
+def chunk_results(results_summary, chunk_chars=CHUNK_CHARS):
+    """Group step results into chunks of at most chunk_chars, splitting oversized results.
+
+    Returns:
+        list: Chunk texts
+    """
+    pieces = []
+    for entry in results_summary:
+        if len(entry) <= chunk_chars:
+            pieces.append(entry)
+            continue
+        # Split a large result into parts, keeping its "Step N (description)" header on each part
+        header = entry.split(":", 1)[0][:200]
+        size = chunk_chars - len(header) - 20
+        parts = [entry[i:i + size] for i in range(0, len(entry), size)]
+        pieces.extend(f"{header} [part {n}/{len(parts)}]: {part}" if n > 1 else part
+                      for n, part in enumerate(parts, 1))
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def condense_chunk(client, model, user_query, chunk):
+    """Condense one chunk of results against the user query (map step).
+
+    Runs in a worker thread, so it must not touch st.session_state.
+    """
+    try:
+        completion = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": CONDENSE_PROMPT.format(user_query=user_query)},
+                {"role": "user", "content": chunk}
+            ],
+            temperature=0,
+            phase="condenser"
+        )
+        condensed = completion.choices[0].message.content if completion and completion.choices else None
+        return condensed or chunk[:CHUNK_CHARS // 4]
+    except Exception as e:
+        print(f"Error condensing results chunk: {e}")
+        # Fall back to the start of the raw chunk so its facts are not lost entirely
+        return chunk[:CHUNK_CHARS // 4]
+
+def condense_results(client, model, user_query, results_summary):
+    """Condense all step results in parallel chunks (map) for the final answer (reduce).
+
+    Returns:
+        str: The condensed notes, one section per chunk
+    """
+    chunks = chunk_results(results_summary)
+    with ThreadPoolExecutor(max_workers=min(MAX_CONDENSE_WORKERS, len(chunks))) as pool:
+        # Worker threads keep the query's telemetry tags
+        condense = in_current_scope(lambda chunk: condense_chunk(client, model, user_query, chunk))
+        condensed = list(pool.map(condense, chunks))
+    return "\n\n".join(f"Notes from results part {i}/{len(condensed)}:\n{notes}"
+                        for i, notes in enumerate(condensed, 1))
+
+def build_summary_messages(user_query, results_text, references, condensed=False, draft=None):
+    """Build the summarizer messages.
+
+    Args:
+        user_query (str): The user's query
+        results_text (str): The step results, or condensed notes in map-reduce mode
+        references (list): Sources referenced by the steps
+        condensed (bool): Whether results_text holds condensed notes
+        draft (str, optional): Draft answer written during execution; results_text then only
+            holds the results not yet reflected in it
+
+    Returns:
+        list: The messages for the summarizer
+    """
     references_text = "\n".join(references) if references else "No external sources were used."
+    results_label = ("the following results (condensed into notes because the raw results were large)"
+                     if condensed else "the following results")
+
+    if draft:
+        # Polish mode: the draft already covers most results, only the remainder is sent
+        results_section = f"""A plan was executed and a draft answer was written while it ran:
+{draft}
+
+Results not yet reflected in the draft:
+{results_text or "None - the draft covers all results."}
+
+Polish the draft into the final response, integrating any results not yet reflected in it."""
+    else:
+        results_section = f"""A plan was executed with {results_label}:
+{results_text}"""
 
     system_prompt = f"""You are a helpful assistant tasked with providing a thorough and insightful final response to the user's query.
 The user asked: "{user_query}"
 
-A plan was executed with the following results:
-{results_text}
+{results_section}
 
 The following sources were used to gather information:
 {references_text}
@@ -75,18 +191,68 @@ Sources:
 - [Source description or title] (URL or filename)
 """
 
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Please provide a final response to my query: {user_query}"}
+    ]
+
+def stream_final_response(client, user_query, plan, draft=None):
+    """Stream the final response to the user's query as it is generated.
+
+    Args:
+        client: The LLM client
+        user_query (str): The user's query
+        plan: The executed plan
+        draft (tuple, optional): (draft text, incorporated step ids) from the running draft summary
+
+    Yields:
+        str: Text chunks of the response
+    """
+    if not client:
+        yield "I couldn't generate a proper response due to API configuration issues."
+        return
+
+    draft_text, incorporated = draft if draft else (None, set())
+    results_summary, references = collect_results(plan, incorporated)
+    results_text = "\n\n".join(results_summary)
+
+    # Map-reduce for large result sets: condense chunks in parallel with the cheap condenser model
+    condensed = False
+    condenser_model = st.session_state.get("condenser_model") or st.session_state.summarizer_model
+    if len(results_text) > MAP_REDUCE_THRESHOLD_CHARS:
+        if 'status_container' in st.session_state:
+            st.session_state.status_container.info(
+                f"📚 Condensing {len(results_text):,} characters of results before writing the final response...")
+        results_text = condense_results(client, condenser_model, user_query, results_summary)
+        condensed = True
+
+    messages = build_summary_messages(user_query, results_text, references, condensed, draft_text)
+    produced = False
     try:
-        completion = client.chat.completions.create(
+        stream = client.chat.completions.create(
             model=st.session_state.summarizer_model,  # Using the summarizer model for the final response
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Please provide a final response to my query: {user_query}"}
-            ],
-            temperature=0.3
+            messages=messages,
+            temperature=0.3,
+            stream=True,
+            phase="summarizer"
         )
-
-        final_response = completion.choices[0].message.content
-        return final_response
+        for chunk in stream:
+            # Some providers send chunks without choices (e.g. usage-only chunks)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                produced = True
+                yield delta
     except Exception as e:
         st.error(f"Error generating final response: {e}")
-        return f"I've completed the steps to answer your query, but encountered an error when generating the final response. Here's a summary of what I found:\n\n{results_text}"
+        if produced:
+            yield f"\n\n_(The response was interrupted: {e})_"
+            return
+    if not produced:
+        found = "\n\n".join(part for part in (draft_text, results_text) if part)
+        yield f"I've completed the steps to answer your query, but encountered an error when generating the final response. Here's a summary of what I found:\n\n{found}"
+
+def generate_final_response(client, user_query, plan, draft=None):
+    """Generates a final response to the user's query based on execution results."""
+    return "".join(stream_final_response(client, user_query, plan, draft))
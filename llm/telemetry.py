@@ -0,0 +1,221 @@
+"""
+LLM call telemetry for the ReAct application.
+Every LLM call made through the gateway is recorded as one JSON line in the workspace
+with its phase (planner, executor, adjuster, summarizer, ...), model, token usage,
+latency, time to first token, retries and estimated cost, tagged with the
+conversation, query and plan step it belongs to. The Debug Options sidebar
+summarizes the records per phase.
+
+The conversation/query/step tags live in a context variable. The Streamlit script
+thread sets them; work handed to other threads must be wrapped with in_current_scope().
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from config import WORKSPACE_DIR, model_config_section
+
+TELEMETRY_FILE = os.path.join(WORKSPACE_DIR, "llm_telemetry.jsonl")
+# The log is rotated to llm_telemetry.jsonl.1 beyond this size
+MAX_FILE_BYTES = 20 * 1024 * 1024
+# Records kept in memory for the sidebar summary
+MAX_RECENT_RECORDS = 5000
+# Rough token estimate for providers that do not report usage on streams
+CHARS_PER_TOKEN = 4
+
+# --- Scope ---
+
+_scope = contextvars.ContextVar("llm_telemetry_scope", default={})
+
+def current_scope() -> Dict:
+    """The conversation/query/step tags of the current context."""
+    return _scope.get()
+
+def set_scope(**fields) -> None:
+    """Set tags for the rest of the current context (e.g. a Streamlit rerun)."""
+    _scope.set({**_scope.get(), **fields})
+
+@contextmanager
+def telemetry_scope(**fields):
+    """Set tags for the duration of a with block."""
+    token = _scope.set({**_scope.get(), **fields})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+def in_current_scope(fn):
+    """Wrap fn so it runs with the caller's tags, e.g. when submitted to a worker thread."""
+    scope = _scope.get()
+    def run(*args, **kwargs):
+        token = _scope.set(scope)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _scope.reset(token)
+    return run
+
+# --- Cost ---
+
+def model_pricing(model) -> Optional[tuple]:
+    """(prompt, completion) price in USD per million tokens, or None if unknown.
+
+    Prices come from the "pricing" section of model_config.json, e.g.
+    "pricing": {"gpt-4.1-mini": {"prompt": 0.4, "completion": 1.6}}.
+    OpenRouter ":free" models cost nothing.
+    """
+    price = model_config_section("pricing").get(model)
+    if isinstance(price, dict):
+        try:
+            return float(price.get("prompt", 0)), float(price.get("completion", 0))
+        except (TypeError, ValueError):
+            return None
+    if model and str(model).endswith(":free"):
+        return 0.0, 0.0
+    return None
+
+def estimate_cost(model, prompt_tokens, completion_tokens) -> Optional[float]:
+    """Estimated cost of a call in USD, or None if the model's price is unknown."""
+    price = model_pricing(model)
+    if price is None:
+        return None
+    return ((prompt_tokens or 0) * price[0] + (completion_tokens or 0) * price[1]) / 1_000_000
+
+def estimate_tokens(text) -> int:
+    """Rough token count of a text."""
+    return len(text or "") // CHARS_PER_TOKEN
+
+def estimate_prompt_tokens(messages) -> int:
+    """Rough token count of a list of chat messages."""
+    total = 0
+    for message in messages or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, list):
+            content = " ".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+        total += estimate_tokens(content if isinstance(content, str) else "")
+    return total
+
+# --- Recording ---
+
+_lock = threading.Lock()
+_recent = None
+
+def _recent_records() -> deque:
+    """In-memory tail of the log, loaded from disk on first use (caller holds the lock)."""
+    global _recent
+    if _recent is None:
+        _recent = deque(maxlen=MAX_RECENT_RECORDS)
+        if os.path.exists(TELEMETRY_FILE):
+            try:
+                with open(TELEMETRY_FILE, 'r', encoding='utf-8') as f:
+                    for line in deque(f, maxlen=MAX_RECENT_RECORDS):
+                        try:
+                            _recent.append(json.loads(line))
+                        except ValueError:
+                            continue
+            except IOError as e:
+                print(f"Error reading LLM telemetry: {e}")
+    return _recent
+
+def record_call(phase, model, served_model=None, prompt_tokens=None, completion_tokens=None,
+                latency=None, ttft=None, retries=0, hedged=False, queued=0.0, stream=False,
+                estimated_usage=False, cached=False, error=None) -> Dict:
+    """Append one LLM call to the telemetry log.
+
+    Args:
+        phase: Pipeline phase that made the call (planner, executor, adjuster, ...)
+        model: Requested model
+        served_model: Model that answered (differs after a failover or a won hedge)
+        prompt_tokens / completion_tokens: Token usage (estimated if the provider reported none)
+        latency: Seconds until the full response (the end of the stream for streaming calls)
+        ttft: Seconds until the first streamed token (None for non-streaming calls)
+        retries: Attempts beyond the first, across all routes
+        hedged: Whether a hedge request was sent
+        queued: Seconds spent waiting for the rate limiter (included in latency)
+        stream: Whether the call was streamed
+        estimated_usage: True if token counts are estimates
+        cached: True if the response came from the LLM response cache (costs nothing)
+        error: Error message if the call failed
+
+    Returns:
+        dict: The record
+    """
+    served_model = served_model or model
+    record = {
+        "ts": round(time.time(), 3),
+        **current_scope(),
+        "phase": phase or "other",
+        "model": model,
+        "served_model": served_model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "estimated_usage": estimated_usage,
+        "latency": round(latency, 3) if latency is not None else None,
+        "ttft": round(ttft, 3) if ttft is not None else None,
+        "retries": retries,
+        "hedged": hedged,
+        "queued": round(queued, 3) if queued else 0.0,
+        "stream": stream,
+        "cached": cached,
+        "cost": 0.0 if cached else estimate_cost(served_model, prompt_tokens, completion_tokens),
+        "error": error,
+    }
+    with _lock:
+        _recent_records().append(record)
+        try:
+            if os.path.exists(TELEMETRY_FILE) and os.path.getsize(TELEMETRY_FILE) > MAX_FILE_BYTES:
+                os.replace(TELEMETRY_FILE, TELEMETRY_FILE + ".1")
+            with open(TELEMETRY_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except (IOError, OSError) as e:
+            print(f"Error writing LLM telemetry: {e}")
+    return record
+
+def recent_records(**filters) -> List[Dict]:
+    """Recent records matching all filters, e.g. recent_records(query_id="...")."""
+    with _lock:
+        records = list(_recent_records())
+    return [r for r in records if all(r.get(k) == v for k, v in filters.items())]
+
+# --- Summary ---
+
+def _percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+def summarize_records(records) -> List[Dict]:
+    """Per-phase totals of a set of records, plus a total row."""
+    groups = {}
+    for record in records:
+        groups.setdefault(record.get("phase") or "other", []).append(record)
+    rows = []
+    for phase, group in sorted(groups.items()) + [("total", list(records))]:
+        if not group:
+            continue
+        latencies = [r["latency"] for r in group if r.get("latency") is not None]
+        ttfts = [r["ttft"] for r in group if r.get("ttft") is not None]
+        costs = [r["cost"] for r in group if r.get("cost") is not None]
+        rows.append({
+            "phase": phase,
+            "calls": len(group),
+            "cached": sum(1 for r in group if r.get("cached")),
+            "errors": sum(1 for r in group if r.get("error")),
+            "prompt tok": sum(r.get("prompt_tokens") or 0 for r in group),
+            "completion tok": sum(r.get("completion_tokens") or 0 for r in group),
+            "total s": round(sum(latencies), 2),
+            "p50 s": _percentile(latencies, 50),
+            "p95 s": _percentile(latencies, 95),
+            "ttft s": round(sum(ttfts) / len(ttfts), 2) if ttfts else None,
+            "retries": sum(r.get("retries") or 0 for r in group),
+            "queued s": round(sum(r.get("queued") or 0 for r in group), 2),
+            "hedged": sum(1 for r in group if r.get("hedged")),
+            # Unknown prices are left out; a partial sum is marked with "+"
+            "cost $": (f"{sum(costs):.4f}" + ("+" if len(costs) < len(group) else "")) if costs else "n/a",
+        })
+    return rows
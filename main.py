@@ -11,8 +11,11 @@ st.set_page_config(
     page_icon="🔸",  # Nexus-like symbol (octagonal sign)
     layout="wide"
 )
+# Paint the title before the heavier imports below so the first render is not blank
+st.title("🔸 ReAct Nexus")
 
 import os
+import uuid
 from dotenv import load_dotenv
 
 # Import configuration
@@ -21,25 +24,23 @@ from config import WORKSPACE_DIR, load_model_config
 # Import SCF module
 # (SCFManager is now imported via manager_instance)
 
-# Import tools
-from tools import TOOLS
-
 # Import LLM modules
 from llm.client import get_openai_client
-from llm.executor import run_executor_step
 
 # Import UI components
 from ui.sidebar import render_configuration_sidebar, render_conversation_sidebar
-from ui.workspace_sidebar import render_workspace_sidebar
-from ui.knowledge_base_sidebar import render_knowledge_base_sidebar
 from ui.chat import (
     display_messages, display_plan_progress, display_execution_results,
     handle_execution_step, handle_plan_completion, handle_plan_failure,
-    process_user_input
+    process_user_input, cancel_running_step
 )
 
 # Import utilities
-from utils.conversation import migrate_conversations_schema
+from utils.conversation import migrate_conversations_schema, conversation_telemetry_tags
+from llm.telemetry import set_scope
+from storage.query_cache import release_query
+from storage.llm_cache import env_enabled as llm_cache_env_enabled
+from storage.tool_cache import env_enabled as tool_cache_env_enabled
 
 # --- Configuration & Constants ---
 load_dotenv()  # Load .env file if it exists
@@ -60,10 +61,6 @@ from scf.manager_instance import scf_manager
 if 'deep_research_mode' not in st.session_state:
     st.session_state.deep_research_mode = False
 
-# --- Streamlit UI ---
-# Extremely simplified UI to avoid any potential conflicts
-st.title("🔸 ReAct Nexus")
-
 # Function to get current conversation metadata
 def get_current_conversation_metadata():
     """Get title and timestamp for the current conversation."""
@@ -99,6 +96,8 @@ if 'summarizer_model' not in st.session_state:
     st.session_state.summarizer_model = model_config.get('summarizer_model')
 if 'title_model' not in st.session_state:
     st.session_state.title_model = model_config.get('title_model')
+if 'condenser_model' not in st.session_state:
+    st.session_state.condenser_model = model_config.get('condenser_model')
 
 # Other session variables
 if 'api_key' not in st.session_state:
@@ -107,6 +106,12 @@ if 'base_url' not in st.session_state:
     st.session_state.base_url = os.getenv("LLM_API_BASE_URL", "https://openrouter.ai/api/v1")
 if 'debug_mode' not in st.session_state:
     st.session_state.debug_mode = False
+if 'llm_response_cache' not in st.session_state:
+    st.session_state.llm_response_cache = llm_cache_env_enabled()
+if 'tool_result_cache' not in st.session_state:
+    st.session_state.tool_result_cache = tool_cache_env_enabled()
+if 'hedge_llm_calls' not in st.session_state:
+    st.session_state.hedge_llm_calls = os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes")
 # deep_research_mode is now initialized earlier in the file
 
 # Initialize session state
@@ -130,6 +135,13 @@ if "current_conversation_filename" not in st.session_state:
 # Migrate legacy conversations if needed
 migrate_conversations_schema()
 
+# Tag the LLM calls of this rerun with the session, the conversation and the query being answered
+if 'session_tag' not in st.session_state:
+    st.session_state.session_tag = uuid.uuid4().hex[:12]
+set_scope(session=st.session_state.session_tag, conversation=conversation_telemetry_tags()[0],
+          query_id=st.session_state.get("query_id"), complexity=st.session_state.get("query_complexity"),
+          response_cache=st.session_state.llm_response_cache, step_id=None)
+
 # Initialize OpenAI client
 client = get_openai_client(st.session_state.api_key, st.session_state.base_url)
 
@@ -139,8 +151,11 @@ page = st.sidebar.radio("Sidebar Pages", ["Configuration", "Conversation Managem
 if page == "Configuration":
     render_configuration_sidebar(knowledge_manager)
 elif page == "Workspace":
+    # Imported only when the page is open
+    from ui.workspace_sidebar import render_workspace_sidebar
     render_workspace_sidebar()
 elif page == "Knowledge Base":
+    from ui.knowledge_base_sidebar import render_knowledge_base_sidebar
     render_knowledge_base_sidebar(knowledge_manager)
 else:  # Conversation Management
     render_conversation_sidebar(client)
@@ -160,9 +175,13 @@ display_messages()
 if st.session_state.plan is not None and 0 <= st.session_state.current_step_index < len(st.session_state.plan):
     # Add a reset button for stuck executions
     if st.button("Reset Execution", help="Use this if the execution appears to be stuck"):
+        cancel_running_step()
         st.session_state.current_step_index = -1
         st.session_state.plan = None
         st.session_state.execution_log = []
+        # Let other sessions waiting on this query run it themselves
+        release_query(st.session_state.get("query_cache_claim"))
+        st.session_state.query_cache_claim = None
         if 'status_container' in st.session_state:
             st.session_state.status_container.empty()
         st.success("Execution reset successfully. You can now submit a new query.")
@@ -186,6 +205,9 @@ display_execution_results()
 # --- Chat Input ---
 if prompt := st.chat_input("Enter your query..."):
     process_user_input(prompt, client)
+elif st.session_state.get("refresh_query"):
+    # Re-run a query whose cached answer the user asked to refresh
+    process_user_input(st.session_state.pop("refresh_query"), client, bypass_cache=True)
 
 # Create containers for plan display and log updates
 if 'plan_container' not in st.session_state:
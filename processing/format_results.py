@@ -58,4 +58,31 @@ def process_final_output(text):
     Returns:
         str: Processed text ready for display
     """
-    return escape_dollar_amounts(text)
\ No newline at end of file
+    return escape_dollar_amounts(text)
+
+# A dollar amount that may still continue in the next chunk
+_PENDING_AMOUNT = re.compile(r'\$[\d,.]*$')
+
+def process_final_output_stream(chunks):
+    """
+    Process streamed output text incrementally.
+
+    A trailing "$" plus digits is held back until the next chunk shows where the amount
+    ends, so the result is identical to process_final_output on the joined text.
+
+    Args:
+        chunks (iterable): Text chunks as they arrive
+
+    Yields:
+        str: Processed text chunks ready for display
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        pending = _PENDING_AMOUNT.search(buffer)
+        cut = pending.start() if pending else len(buffer)
+        if cut:
+            yield process_final_output(buffer[:cut])
+            buffer = buffer[cut:]
+    if buffer:
+        yield process_final_output(buffer)
@@ -0,0 +1,272 @@
+"""
+Learned query router for the Specialized Component Framework.
+
+Predicts query complexity and the SCF component together with a small softmax
+regression over hashed word/character n-grams. The model is trained offline from
+the execution log (step counts, failures, latency, tools used) and falls back to
+the keyword/regex rules when no model is available or the prediction is not confident.
+
+Retrain with:
+    python -m scf.router train
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import threading
+from functools import lru_cache
+from config import WORKSPACE_DIR
+
+# NumPy is optional (routing falls back to the rules) and slow to import, so it is
+# imported on first use: when a trained model is loaded or the router is trained
+np = None
+
+def _load_numpy() -> bool:
+    """Import NumPy on first use; False if it is not installed."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+COMPLEXITY_LABELS = ["Low", "Medium", "High"]
+NUM_FEATURES = 2 ** 14
+MIN_CONFIDENCE = 0.55
+MIN_TRAINING_EXAMPLES = 20
+
+ROUTER_LOG_FILE = os.path.join(WORKSPACE_DIR, "router_log.jsonl")
+ROUTER_MODEL_FILE = os.path.join(WORKSPACE_DIR, "router_model.npz")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_log_lock = threading.Lock()
+
+def extract_features(query: str) -> dict:
+    """Hash word unigrams/bigrams and character trigrams into a sparse feature vector.
+
+    Uses crc32 rather than hash() so indices are stable across processes.
+
+    Returns:
+        dict: Mapping of feature index to value
+    """
+    text = query.lower()
+    words = _TOKEN_PATTERN.findall(text)
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    # Coarse length/shape features
+    grams.append(f"len:{min(len(words) // 10, 6)}")
+    grams.append(f"q:{min(text.count('?'), 3)}")
+
+    features = {}
+    for gram in grams:
+        hashed = zlib.crc32(gram.encode("utf-8"))
+        index = hashed % NUM_FEATURES
+        sign = 1.0 if (hashed >> 31) & 1 == 0 else -1.0
+        features[index] = features.get(index, 0.0) + sign
+    # L2 normalize so long queries do not dominate
+    norm = sum(v * v for v in features.values()) ** 0.5 or 1.0
+    return {index: value / norm for index, value in features.items()}
+
+# --- Execution log ---
+
+def record_execution(query: str, component, complexity: str, plan, latency_seconds: float) -> None:
+    """Append an executed query to the router training log.
+
+    Args:
+        query (str): The user query
+        component (str): The SCF component used (None for standard planning)
+        complexity (str): The complexity the query was routed with
+        plan (list): The executed plan steps
+        latency_seconds (float): Wall-clock time from planning to final response
+    """
+    steps = list(plan or [])
+    record = {
+        "timestamp": time.time(),
+        "query": query,
+        "component": component,
+        "complexity": complexity,
+        "steps": len(steps),
+        "completed": sum(1 for s in steps if s.get("status") == "Completed"),
+        "failures": sum(1 for s in steps if s.get("status") in ("Failed", "Skipped")),
+        "tools": [s.get("tool_suggestion") for s in steps if s.get("status") == "Completed"],
+        "latency": round(latency_seconds, 2),
+    }
+    try:
+        with _log_lock:
+            with open(ROUTER_LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+    except IOError as e:
+        print(f"Error writing router log: {e}")
+
+def label_complexity(record: dict) -> str:
+    """Derive the complexity label from how much work the query actually needed."""
+    needed = record.get("completed", 0)
+    if needed <= 2 and record.get("failures", 0) == 0:
+        return "Low"
+    if needed <= 6:
+        return "Medium"
+    return "High"
+
+def label_component(record: dict, components: dict):
+    """Derive the component label: the most specialized component covering the tools actually used."""
+    used = {tool for tool in record.get("tools", []) if tool and tool != "None"}
+    best, best_size = None, None
+    for name, component in components.items():
+        capabilities = component.get("capabilities", [])
+        if "all" in capabilities:
+            continue
+        if used.issubset(capabilities) and (best_size is None or len(capabilities) < best_size):
+            best, best_size = name, len(capabilities)
+    if best is None:
+        # Fall back to a component allowed to use every tool
+        best = next((name for name, c in components.items() if "all" in c.get("capabilities", [])),
+                    record.get("component"))
+    return best
+
+# --- Model ---
+
+def _train_softmax(rows, labels, num_classes, epochs=200, learning_rate=0.5, l2=1e-4):
+    """Full-batch gradient descent for multinomial logistic regression on sparse rows."""
+    weights = np.zeros((num_classes, NUM_FEATURES), dtype=np.float32)
+    bias = np.zeros(num_classes, dtype=np.float32)
+    indices = [np.fromiter(row.keys(), dtype=np.int64) for row in rows]
+    values = [np.fromiter(row.values(), dtype=np.float32) for row in rows]
+    targets = np.asarray(labels)
+    n = len(rows)
+
+    for _ in range(epochs):
+        logits = np.stack([weights[:, idx] @ val for idx, val in zip(indices, values)]) + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        probs[np.arange(n), targets] -= 1.0  # gradient of cross-entropy w.r.t. logits
+        probs /= n
+        grad = np.zeros_like(weights)
+        for row_grad, idx, val in zip(probs, indices, values):
+            grad[:, idx] += np.outer(row_grad, val)
+        weights -= learning_rate * (grad + l2 * weights)
+        bias -= learning_rate * probs.sum(axis=0)
+    return weights, bias
+
+def train_router(components: dict, log_file: str = ROUTER_LOG_FILE, model_file: str = ROUTER_MODEL_FILE) -> str:
+    """Train the router from the execution log and save it.
+
+    Args:
+        components (dict): SCF components by name (from SCFManager.components)
+        log_file (str): Path to the execution log
+        model_file (str): Where to save the model
+
+    Returns:
+        str: A short training report
+    """
+    if not _load_numpy():
+        return "NumPy is not installed; the learned router is unavailable."
+    try:
+        with open(log_file, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except (IOError, json.JSONDecodeError) as e:
+        return f"Could not read execution log: {e}"
+    if len(records) < MIN_TRAINING_EXAMPLES:
+        return f"Not enough executions to train ({len(records)}/{MIN_TRAINING_EXAMPLES})."
+
+    component_labels = sorted(components.keys())
+    rows, complexity_targets, component_targets = [], [], []
+    for record in records:
+        component = label_component(record, components)
+        if component not in component_labels:
+            continue
+        rows.append(extract_features(record["query"]))
+        complexity_targets.append(COMPLEXITY_LABELS.index(label_complexity(record)))
+        component_targets.append(component_labels.index(component))
+    if len(rows) < MIN_TRAINING_EXAMPLES:
+        return (f"Not enough labelled executions to train ({len(rows)}/{MIN_TRAINING_EXAMPLES}); "
+                f"{len(records) - len(rows)} executions did not map to a known component.")
+
+    complexity_w, complexity_b = _train_softmax(rows, complexity_targets, len(COMPLEXITY_LABELS))
+    component_w, component_b = _train_softmax(rows, component_targets, len(component_labels))
+    np.savez_compressed(model_file, complexity_w=complexity_w, complexity_b=complexity_b,
+                        component_w=component_w, component_b=component_b,
+                        component_labels=np.asarray(component_labels))
+    _load_router.cache_clear()
+    return f"Trained router on {len(rows)} executions ({len(component_labels)} components)."
+
+class QueryRouter:
+    """Inference side of the learned router."""
+
+    def __init__(self, model_file: str = ROUTER_MODEL_FILE):
+        """Load the model if NumPy and a trained model file are available."""
+        self.model = None
+        if os.path.exists(model_file) and _load_numpy():
+            try:
+                with np.load(model_file) as data:
+                    self.model = {key: data[key] for key in data.files}
+                self.component_labels = [str(label) for label in self.model["component_labels"]]
+            except Exception as e:
+                print(f"Error loading router model: {e}")
+                self.model = None
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    def _predict_head(self, features, weights, bias):
+        index = np.fromiter(features.keys(), dtype=np.int64)
+        values = np.fromiter(features.values(), dtype=np.float32)
+        logits = weights[:, index] @ values + bias
+        logits -= logits.max()
+        probs = np.exp(logits)
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return best, float(probs[best])
+
+    @lru_cache(maxsize=256)
+    def predict(self, query: str):
+        """Predict (complexity, complexity_confidence, component, component_confidence), or None."""
+        if not self.available or not query:
+            return None
+        features = extract_features(query)
+        complexity, complexity_conf = self._predict_head(features, self.model["complexity_w"], self.model["complexity_b"])
+        component, component_conf = self._predict_head(features, self.model["component_w"], self.model["component_b"])
+        return COMPLEXITY_LABELS[complexity], complexity_conf, self.component_labels[component], component_conf
+
+    def predict_complexity(self, query: str):
+        """Return the predicted complexity if confident, else None."""
+        prediction = self.predict(query)
+        if prediction and prediction[1] >= MIN_CONFIDENCE:
+            return prediction[0]
+        return None
+
+    def predict_component(self, query: str):
+        """Return the predicted component if confident, else None."""
+        prediction = self.predict(query)
+        if prediction and prediction[3] >= MIN_CONFIDENCE:
+            return prediction[2]
+        return None
+
+@lru_cache(maxsize=1)
+def _load_router(model_version) -> QueryRouter:
+    return QueryRouter()
+
+def get_router() -> QueryRouter:
+    """Return the process-wide router, reloaded whenever the model file changes
+    (e.g. after `python -m scf.router train` in another process)."""
+    try:
+        model_version = os.stat(ROUTER_MODEL_FILE).st_mtime_ns
+    except OSError:
+        model_version = None
+    return _load_router(model_version)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "train":
+        config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scf_config.json")
+        with open(config_path, "r", encoding="utf-8") as f:
+            scf_config = json.load(f)
+        print(train_router({c["name"]: c for c in scf_config.get("components", [])}))
+    else:
+        print("Usage: python -m scf.router train")
@@ -7,6 +7,7 @@ import json
 import re
 import streamlit as st
 from config import WORKSPACE_DIR
+from scf.router import get_router
 
 class SCFManager:
     """Manages Specialized Component Framework for complex queries."""
@@ -37,7 +38,14 @@ class SCFManager:
             return False
 
     def route_query(self, query):
-        """Route a query to the appropriate component based on routing rules."""
+        """Route a query to the appropriate component.
+
+        Uses the learned router when it is confident, then the regex routing rules.
+        """
+        learned = get_router().predict_component(query)
+        if learned in self.components:
+            return learned
+
         # Check each routing rule for a match
         for rule in self.routing_rules:
             pattern = rule.get('pattern', '')
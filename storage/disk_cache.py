@@ -0,0 +1,167 @@
+"""
+Persistent key-value cache for the ReAct application.
+A small SQLite store in WAL mode with per-entry TTLs and LRU eviction, shared by all
+sessions in the process (and safe across processes). Values are stored as JSON.
+Also provides a process-wide single-flight registry so concurrent identical
+computations run only once.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+# Purge expired rows every this many writes
+PURGE_INTERVAL = 100
+
+class DiskCache:
+    """SQLite-backed cache with TTL expiry and least-recently-used eviction."""
+
+    def __init__(self, path: str, max_entries: int = 1000):
+        """
+        Initialize the cache.
+
+        Args:
+            path: Path of the SQLite database file
+            max_entries: Entries kept before the least recently used are evicted
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self._connection()
+        conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            tag TEXT,
+            created REAL NOT NULL,
+            expires REAL NOT NULL,
+            last_access REAL NOT NULL
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries(expires)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (Streamlit runs each session in its own thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Build a stable cache key from JSON-serializable parts."""
+        raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return {"value", "created", "expires", "tag"} for a live entry, or None."""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT value, created, expires, tag FROM entries WHERE key = ? AND expires > ?",
+                               (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return {"value": json.loads(row[0]), "created": row[1], "expires": row[2], "tag": row[3]}
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Cache read error ({self.path}): {e}")
+            self.misses += 1
+            return None
+
+    def get(self, key: str, default=None):
+        """Return the cached value, or default if missing or expired."""
+        entry = self.get_entry(key)
+        return entry["value"] if entry else default
+
+    def set(self, key: str, value, ttl: float, tag: Optional[str] = None) -> None:
+        """Store a value for ttl seconds (non-positive TTLs are not stored)."""
+        if ttl <= 0:
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, tag, created, expires, last_access) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, json.dumps(value, default=str), tag, now, now + ttl, now))
+            self._writes += 1
+            if self._writes % PURGE_INTERVAL == 0:
+                conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+            self._evict(conn)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Cache write error ({self.path}): {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop the least recently used entries beyond max_entries."""
+        count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute("DELETE FROM entries WHERE key IN "
+                         "(SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                         (count - self.max_entries,))
+
+    def delete(self, key: str) -> None:
+        """Remove an entry."""
+        try:
+            self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"Cache delete error ({self.path}): {e}")
+
+    def clear(self, tag: Optional[str] = None) -> None:
+        """Remove all entries, or only those with the given tag."""
+        try:
+            if tag is None:
+                self._connection().execute("DELETE FROM entries")
+            else:
+                self._connection().execute("DELETE FROM entries WHERE tag = ?", (tag,))
+        except sqlite3.Error as e:
+            print(f"Cache clear error ({self.path}): {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Entry count and the hit/miss counters of this process."""
+        try:
+            entries = self._connection().execute("SELECT COUNT(*) FROM entries WHERE expires > ?",
+                                                 (time.time(),)).fetchone()[0]
+        except sqlite3.Error:
+            entries = 0
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+# --- Single flight ---
+
+_flights: Dict[str, tuple] = {}
+_flights_lock = threading.Lock()
+
+def begin_flight(key: str, lease_seconds: float = 300.0):
+    """Claim a computation for key.
+
+    Returns:
+        tuple: (True, event) if the caller should compute and later call end_flight(key),
+            or (False, event) if another caller holds an unexpired claim; wait on the event
+    """
+    now = time.time()
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight and flight[1] > now and not flight[0].is_set():
+            return False, flight[0]
+        event = threading.Event()
+        _flights[key] = (event, now + lease_seconds)
+        return True, event
+
+def end_flight(key: str) -> None:
+    """Release a claim and wake up everyone waiting for it."""
+    with _flights_lock:
+        flight = _flights.pop(key, None)
+    if flight:
+        flight[0].set()
@@ -0,0 +1,122 @@
+"""
+Persistent LLM response cache for the ReAct application.
+Deterministic LLM calls (temperature 0, e.g. the executor) whose prompts repeat exactly
+are answered from the workspace instead of the provider. Sampled calls such as the plan
+adjuster are not cached, so one bad answer is not replayed. Entries are keyed on the
+provider's base URL, the model, the whitespace-normalized messages, temperature,
+response_format and max_tokens, expire after a TTL and are evicted
+least-recently-used. A small in-memory layer in front of the SQLite store
+answers hot repeats in microseconds.
+
+The cache is opt-in: the "Cache deterministic LLM calls" setting or LLM_RESPONSE_CACHE=1.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from openai.types.chat import ChatCompletion
+from config import WORKSPACE_DIR
+from storage.disk_cache import DiskCache
+
+LLM_CACHE_FILE = os.path.join(WORKSPACE_DIR, "llm_response_cache.sqlite")
+MAX_CACHED_RESPONSES = 5000
+# Responses parsed and kept in memory
+MAX_MEMORY_RESPONSES = 256
+
+def default_ttl() -> float:
+    """Seconds a cached response stays valid (LLM_RESPONSE_CACHE_TTL, default 24 hours)."""
+    try:
+        return float(os.getenv("LLM_RESPONSE_CACHE_TTL", 24 * 3600))
+    except ValueError:
+        return 24 * 3600
+
+def env_enabled() -> bool:
+    """Whether LLM_RESPONSE_CACHE turns the cache on by default."""
+    return os.getenv("LLM_RESPONSE_CACHE", "").lower() in ("1", "true", "yes")
+
+def is_cacheable(kwargs, cache=None) -> bool:
+    """Whether a create() call may be served from the cache.
+
+    Args:
+        kwargs: The create() arguments
+        cache: True to cache regardless of temperature, False never, None for temperature-0 calls only
+    """
+    if cache is False or kwargs.get("stream") or kwargs.get("n", 1) != 1:
+        return False
+    return cache is True or kwargs.get("temperature") == 0
+
+def _normalize_messages(messages):
+    """Messages with whitespace runs collapsed, so formatting-only differences share an entry."""
+    normalized = []
+    for message in messages or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            content = " ".join(content.split())
+        normalized.append({"role": message.get("role"), "content": content})
+    return normalized
+
+def response_cache_key(kwargs, base_url=None) -> str:
+    """Cache key of a create() call.
+
+    Args:
+        kwargs: The create() arguments
+        base_url: The provider's base URL, so one model name on different providers
+            (or a mock server) does not share entries
+    """
+    return DiskCache.make_key("llm", str(base_url or ""), kwargs.get("model"), _normalize_messages(kwargs.get("messages")),
+                              kwargs.get("temperature"), kwargs.get("response_format"),
+                              kwargs.get("max_tokens"))
+
+_cache = None
+_cache_lock = threading.Lock()
+_memory = OrderedDict()  # key -> (expires, ChatCompletion)
+_memory_lock = threading.Lock()
+
+def get_llm_cache() -> DiskCache:
+    """Return the process-wide LLM response cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskCache(LLM_CACHE_FILE, MAX_CACHED_RESPONSES)
+    return _cache
+
+def _remember(key, expires, completion):
+    with _memory_lock:
+        _memory[key] = (expires, completion)
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_MEMORY_RESPONSES:
+            _memory.popitem(last=False)
+
+def lookup_response(key):
+    """Return the cached ChatCompletion for key, or None."""
+    now = time.time()
+    with _memory_lock:
+        hit = _memory.get(key)
+        if hit and hit[0] > now:
+            _memory.move_to_end(key)
+            get_llm_cache().hits += 1
+            return hit[1]
+    entry = get_llm_cache().get_entry(key)
+    if entry is None:
+        return None
+    try:
+        completion = ChatCompletion.model_validate(entry["value"])
+    except ValueError:
+        return None
+    _remember(key, entry["expires"], completion)
+    return completion
+
+def store_response(key, completion, ttl=None) -> None:
+    """Cache a completion (objects without model_dump, e.g. test doubles, are skipped)."""
+    if not hasattr(completion, "model_dump"):
+        return
+    ttl = default_ttl() if ttl is None else ttl
+    get_llm_cache().set(key, completion.model_dump(), ttl, tag="llm")
+    _remember(key, time.time() + ttl, completion)
+
+def clear_responses() -> None:
+    """Drop every cached response."""
+    with _memory_lock:
+        _memory.clear()
+    get_llm_cache().clear()
@@ -0,0 +1,149 @@
+"""
+Historical performance statistics for the ReAct application.
+Keeps a rolling window of per-tool and per-model latencies and token counts,
+persisted in the workspace so estimates improve across sessions.
+"""
+import os
+import json
+import threading
+from typing import Dict, List, Optional
+from config import WORKSPACE_DIR
+
+# Number of recent samples kept per tool/model
+MAX_SAMPLES = 50
+
+# Prior estimates (seconds) used until a tool has recorded history
+DEFAULT_TOOL_SECONDS = {
+    "web_search": 3.0,
+    "web_scrape": 6.0,
+    "get_stock_data": 2.0,
+    "firecrawl_scrape": 10.0,
+    "firecrawl_crawl": 60.0,
+    "firecrawl_map": 10.0,
+    "kb_add_web": 6.0,
+    "execute_python": 1.0,
+}
+DEFAULT_LOCAL_TOOL_SECONDS = 0.2  # memory, file and knowledge base lookups
+DEFAULT_MODEL_SECONDS = 4.0
+DEFAULT_PROMPT_TOKENS = 2500
+DEFAULT_COMPLETION_TOKENS = 300
+
+class PerfStats:
+    """Rolling latency and token statistics per tool and per model."""
+
+    def __init__(self, workspace_dir: str):
+        """
+        Initialize the statistics store.
+
+        Args:
+            workspace_dir: The base workspace directory path
+        """
+        self.stats_file = os.path.join(workspace_dir, "perf_stats.json")
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self) -> Dict:
+        """Load statistics from disk."""
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    data.setdefault("tools", {})
+                    data.setdefault("models", {})
+                    return data
+            except (json.JSONDecodeError, IOError):
+                pass
+        return {"tools": {}, "models": {}}
+
+    def _save(self) -> None:
+        """Persist statistics to disk (caller holds the lock)."""
+        try:
+            with open(self.stats_file, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f)
+        except IOError as e:
+            print(f"Error saving performance stats: {e}")
+
+    @staticmethod
+    def _append(samples: List, value) -> None:
+        """Append a sample and trim the window."""
+        samples.append(round(float(value), 4))
+        del samples[:-MAX_SAMPLES]
+
+    def record_tool(self, tool_name: str, seconds: float) -> None:
+        """Record the wall-clock time of a tool call."""
+        if not tool_name or tool_name == "None":
+            return
+        with self._lock:
+            entry = self.data["tools"].setdefault(tool_name, {"latency": []})
+            self._append(entry["latency"], seconds)
+            self._save()
+
+    def record_model(self, model: str, seconds: float, prompt_tokens: Optional[int] = None,
+                     completion_tokens: Optional[int] = None) -> None:
+        """Record the latency and token usage of a model call."""
+        if not model:
+            return
+        with self._lock:
+            entry = self.data["models"].setdefault(model, {"latency": [], "prompt_tokens": [], "completion_tokens": []})
+            self._append(entry["latency"], seconds)
+            if prompt_tokens is not None:
+                self._append(entry["prompt_tokens"], prompt_tokens)
+            if completion_tokens is not None:
+                self._append(entry["completion_tokens"], completion_tokens)
+            self._save()
+
+    @staticmethod
+    def _mean(samples: List) -> Optional[float]:
+        return sum(samples) / len(samples) if samples else None
+
+    @staticmethod
+    def _percentile(samples: List, p: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def tool_seconds(self, tool_name: str) -> float:
+        """Average latency of a tool, falling back to a prior estimate."""
+        samples = self.data["tools"].get(tool_name, {}).get("latency", [])
+        mean = self._mean(samples)
+        if mean is not None:
+            return mean
+        if not tool_name or tool_name == "None":
+            return 0.0
+        return DEFAULT_TOOL_SECONDS.get(tool_name, DEFAULT_LOCAL_TOOL_SECONDS)
+
+    def model_seconds(self, model: str) -> float:
+        """Average latency of a model call, falling back to a prior estimate."""
+        mean = self._mean(self.data["models"].get(model, {}).get("latency", []))
+        return mean if mean is not None else DEFAULT_MODEL_SECONDS
+
+    def model_latency_percentile(self, model: str, p: float) -> Optional[float]:
+        """Latency percentile of a model, or None without history."""
+        return self._percentile(self.data["models"].get(model, {}).get("latency", []), p)
+
+    def model_tokens(self, model: str) -> tuple:
+        """Average (prompt_tokens, completion_tokens) of a model call."""
+        entry = self.data["models"].get(model, {})
+        prompt = self._mean(entry.get("prompt_tokens", []))
+        completion = self._mean(entry.get("completion_tokens", []))
+        return (prompt if prompt is not None else DEFAULT_PROMPT_TOKENS,
+                completion if completion is not None else DEFAULT_COMPLETION_TOKENS)
+
+    def known_tools(self) -> List[str]:
+        """Tools with recorded history."""
+        return list(self.data["tools"].keys())
+
+_perf_stats = None
+_instance_lock = threading.Lock()
+
+def get_perf_stats() -> PerfStats:
+    """Return the process-wide statistics store."""
+    global _perf_stats
+    if _perf_stats is None:
+        with _instance_lock:
+            if _perf_stats is None:
+                _perf_stats = PerfStats(WORKSPACE_DIR)
+    return _perf_stats
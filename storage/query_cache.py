@@ -0,0 +1,173 @@
+"""
+Whole-query answer cache for the ReAct application.
+Stores the final response, plan and sources of answered queries so identical or
+trivially reworded questions are answered from disk instead of re-running the plan.
+Entries expire according to how fresh their sources need to be.
+"""
+import os
+import re
+import time
+import threading
+from config import WORKSPACE_DIR
+from storage.disk_cache import DiskCache, begin_flight, end_flight
+
+QUERY_CACHE_FILE = os.path.join(WORKSPACE_DIR, "query_cache.sqlite")
+MAX_CACHED_QUERIES = 500
+
+# How long an answer stays fresh, by the tools its plan used (seconds); the shortest applies
+DEFAULT_TTL = 6 * 3600
+TOOL_TTLS = {
+    "get_stock_data": 5 * 60,
+    "web_search": 30 * 60,
+    "web_scrape": 24 * 3600,
+    "firecrawl_scrape": 24 * 3600,
+    "firecrawl_crawl": 24 * 3600,
+    "firecrawl_map": 24 * 3600,
+    "kb_search": 24 * 3600,
+    "kb_get": 24 * 3600,
+    "kb_list": 3600,
+    "read_file": 10 * 60,
+    "list_files": 10 * 60,
+    "enhanced_list_files": 10 * 60,
+    "memory_get": 3600,
+    "memory_list": 3600,
+}
+# Plans using these tools change state, so their answers are never cached
+SIDE_EFFECT_TOOLS = {
+    "write_file", "delete_file", "execute_python", "reset_python_environment", "list_python_variables",
+    "memory_set", "kb_add_web", "kb_add_file", "kb_delete", "open_file",
+}
+# Queries about fast-moving data are capped at a short TTL whatever tools were used
+VOLATILE_TTL = 15 * 60
+_VOLATILE_QUERY = re.compile(
+    r"\b(today|tonight|now|right now|latest|current|currently|live|breaking|news|headlines?|"
+    r"prices?|stocks?|quotes?|shares?|market|weather|this (?:week|morning|afternoon|evening))\b")
+
+# How long a session waits for an identical query that another session is answering
+SINGLE_FLIGHT_WAIT_SECONDS = 120
+SINGLE_FLIGHT_LEASE_SECONDS = 600
+
+_URL_PATTERN = re.compile(r"https?://\S+")
+_FILLER_PATTERN = re.compile(
+    r"^(?:(?:please|pls|hey|hi|hello|can you|could you|would you|will you|i want to know|i'd like to know|"
+    r"tell me|show me|give me|let me know|the|a|an)\s+)+")
+_NON_WORD_PATTERN = re.compile(r"[^\w\s]")
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially reworded versions share a cache entry.
+
+    Lowercases, drops punctuation and leading politeness/filler phrases and collapses
+    whitespace. URLs are kept verbatim (minus trailing punctuation).
+    """
+    urls = [url.rstrip(".,;:!?)\"'") for url in _URL_PATTERN.findall(query)]
+    text = _URL_PATTERN.sub(" ", query).lower()
+    text = _NON_WORD_PATTERN.sub(" ", text)
+    text = " ".join(text.split())
+    text = _FILLER_PATTERN.sub("", text).strip()
+    text = re.sub(r"\s+please$", "", text)
+    return " ".join([text] + urls).strip()
+
+def query_cache_key(query: str, component, models: dict, memory: dict) -> str:
+    """Build the cache key for a query.
+
+    Args:
+        query: The user query
+        component: The SCF component the query is routed to (None for standard planning)
+        models: The model settings that shape the answer
+        memory: The persistent memory the planner sees (answers depend on it)
+    """
+    memory_digest = DiskCache.make_key(sorted((str(k), str(v)) for k, v in (memory or {}).items()))
+    return DiskCache.make_key("query", normalize_query(query), component, models, memory_digest)
+
+# The executor records each step's action as "tool_name({...json args...})"
+_ACTION_TOOL = re.compile(r"^([A-Za-z_]\w*)\(")
+
+def executed_tool(step):
+    """The tool a step actually ran, from its recorded action (None if it ran none)."""
+    match = _ACTION_TOOL.match(str(step.get("action_str") or ""))
+    return match.group(1) if match else None
+
+def answer_ttl(query: str, plan) -> float:
+    """Seconds an answer stays fresh, from the tools its plan ran and the query wording (0 = do not cache).
+
+    Answers of plans with a failed, skipped or cancelled step are not cached, nor are
+    answers whose steps ran a tool with side effects.
+    """
+    if any(step.get("status") != "Completed" for step in plan):
+        return 0
+    used = {tool for tool in (executed_tool(step) for step in plan) if tool}
+    if used & SIDE_EFFECT_TOOLS:
+        return 0
+    ttl = min([TOOL_TTLS.get(tool, DEFAULT_TTL) for tool in used] or [DEFAULT_TTL])
+    if _VOLATILE_QUERY.search(query.lower()):
+        ttl = min(ttl, VOLATILE_TTL)
+    return ttl
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_query_cache() -> DiskCache:
+    """Return the process-wide query cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskCache(QUERY_CACHE_FILE, MAX_CACHED_QUERIES)
+    return _cache
+
+def lookup_answer(key: str):
+    """Return the cached answer entry ({"value": {...}, "created": ...}) or None."""
+    return get_query_cache().get_entry(key)
+
+def store_answer(key: str, query: str, response: str, plan, sources, ttl: float) -> None:
+    """Cache a final answer together with its plan and sources."""
+    get_query_cache().set(key, {
+        "query": query,
+        "response": response,
+        "plan": plan,
+        "sources": sources,
+    }, ttl, tag="answer")
+
+def invalidate_answer(key: str) -> None:
+    """Drop a cached answer (used by the refresh button)."""
+    get_query_cache().delete(key)
+
+def claim_query(key: str, on_wait=None):
+    """Claim answering a query for this session, or wait for another session answering it.
+
+    Args:
+        key: The query cache key
+        on_wait: Optional callback invoked before blocking on another session
+
+    Returns:
+        tuple: (claimed, entry) - claimed is True if this session should run the plan
+            (and later call release_query); entry is the answer another session produced, if any
+    """
+    claimed, event = begin_flight(key, SINGLE_FLIGHT_LEASE_SECONDS)
+    if claimed:
+        return True, None
+    if on_wait:
+        on_wait()
+    event.wait(SINGLE_FLIGHT_WAIT_SECONDS)
+    entry = lookup_answer(key)
+    if entry:
+        return False, entry
+    # The other session failed or timed out: answer it here
+    claimed, _ = begin_flight(key, SINGLE_FLIGHT_LEASE_SECONDS)
+    return claimed, None
+
+def release_query(key) -> None:
+    """Release a claimed query so waiting sessions can read the answer."""
+    if key:
+        end_flight(key)
+
+def describe_age(created: float) -> str:
+    """Short age of a cached answer, e.g. "4 min ago"."""
+    seconds = max(0, time.time() - created)
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h ago"
+    return f"{int(seconds // 86400)} d ago"
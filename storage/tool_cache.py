@@ -0,0 +1,155 @@
+"""
+Persistent tool result cache for the ReAct application.
+Results of network tools (search, scraping, stock quotes) are kept in the workspace
+and shared by every session and restart, keyed on the tool and its normalized
+arguments. Each tool has its own freshness window: seconds for stock quotes, hours
+for search results, days for scraped pages. Error results are never cached.
+
+TTLs can be overridden in the "tool_cache_ttls" section of model_config.json
+(seconds; 0 disables caching for that tool):
+
+    "tool_cache_ttls": {"web_search": 3600, "get_stock_data": 0}
+
+The cache is on by default; TOOL_CACHE=0 turns it off, and a single call can bypass
+it with the "fresh" argument (or the refresh button of a cached answer).
+"""
+import os
+import json
+import threading
+from typing import Callable, Dict, Optional, Tuple
+from config import WORKSPACE_DIR, model_config_section
+from storage.disk_cache import DiskCache, begin_flight, end_flight
+
+TOOL_CACHE_FILE = os.path.join(WORKSPACE_DIR, "tool_cache.sqlite")
+MAX_CACHED_RESULTS = 2000
+
+# Seconds a result stays fresh, by tool; tools not listed are never cached
+TOOL_TTLS = {
+    "get_stock_data": 60,
+    "web_search": 6 * 3600,
+    "web_scrape": 3 * 24 * 3600,
+    "firecrawl_scrape": 3 * 24 * 3600,
+    "firecrawl_crawl": 24 * 3600,
+    "firecrawl_map": 24 * 3600,
+}
+
+# Arguments whose case does not change the result
+_CASE_FOLD = {
+    ("web_search", "query"): str.lower,
+    ("get_stock_data", "symbol"): str.upper,
+}
+
+# How long a call waits for an identical call that is already running
+SINGLE_FLIGHT_WAIT_SECONDS = 60
+
+def env_enabled() -> bool:
+    """Whether TOOL_CACHE leaves the cache on (the default)."""
+    return os.getenv("TOOL_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+def tool_ttl(name: str) -> float:
+    """Seconds a result of the tool stays fresh (0: not cached)."""
+    overrides = model_config_section("tool_cache_ttls")
+    try:
+        return float(overrides.get(name, TOOL_TTLS.get(name, 0)))
+    except (TypeError, ValueError):
+        return TOOL_TTLS.get(name, 0)
+
+def _normalize(name, arg, value):
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        fold = _CASE_FOLD.get((name, arg))
+        return fold(value) if fold else value
+    if isinstance(value, list):
+        return [_normalize(name, arg, v) for v in value]
+    return value
+
+def tool_cache_key(name: str, args: Dict) -> str:
+    """Cache key of a tool call (args as bound by the tool registry, so aliases share entries)."""
+    normalized = {arg: _normalize(name, arg, value) for arg, value in args.items() if value is not None}
+    return DiskCache.make_key("tool", name, normalized)
+
+def is_error_result(result) -> bool:
+    """Whether a tool result reports a failure (those are retried, not cached)."""
+    if not isinstance(result, str) or not result.strip():
+        return True
+    text = result.lstrip()
+    if text.startswith(("Error", "Failed", "Unexpected error", "Invalid")):
+        return True
+    if text.startswith("{"):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return False
+        # Alpha Vantage reports throttling as "Note"/"Information" instead of an error
+        return isinstance(data, dict) and bool({"error", "Error Message", "Note", "Information"} & data.keys())
+    return False
+
+_cache = None
+_cache_lock = threading.Lock()
+_counters: Dict[str, Dict[str, int]] = {}
+_counters_lock = threading.Lock()
+
+def get_tool_cache() -> DiskCache:
+    """Return the process-wide tool result cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskCache(TOOL_CACHE_FILE, MAX_CACHED_RESULTS)
+    return _cache
+
+def _count(name, outcome):
+    with _counters_lock:
+        counters = _counters.setdefault(name, {"hits": 0, "misses": 0, "bypassed": 0})
+        counters[outcome] += 1
+
+def cached_tool_call(name: str, args: Dict, call: Callable[[], str], bypass: bool = False) -> Tuple[str, Optional[float]]:
+    """Run a tool call through the cache.
+
+    Args:
+        name: Tool name
+        args: Bound arguments of the call
+        call: Runs the tool and returns its result
+        bypass: Skip the lookup (the fresh result still replaces the cached one)
+
+    Returns:
+        tuple: (result, creation time of the cached result, or None if the tool ran)
+    """
+    ttl = tool_ttl(name)
+    if ttl <= 0:
+        return call(), None
+    key = tool_cache_key(name, args)
+    cache = get_tool_cache()
+    claimed = False
+    if bypass:
+        _count(name, "bypassed")
+    else:
+        entry = cache.get_entry(key)
+        if entry is None:
+            # Let an identical call already running in another session finish first
+            claimed, event = begin_flight(key, SINGLE_FLIGHT_WAIT_SECONDS)
+            if not claimed:
+                event.wait(SINGLE_FLIGHT_WAIT_SECONDS)
+                entry = cache.get_entry(key)
+        if entry is not None:
+            _count(name, "hits")
+            return entry["value"], entry["created"]
+        _count(name, "misses")
+
+    try:
+        result = call()
+        if not is_error_result(result):
+            cache.set(key, result, ttl, tag=name)
+    finally:
+        if claimed:
+            end_flight(key)
+    return result, None
+
+def tool_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss/bypass counters of this process by tool."""
+    with _counters_lock:
+        return {name: dict(counters) for name, counters in _counters.items()}
+
+def clear_tool_results(name: Optional[str] = None) -> None:
+    """Drop every cached result, or those of one tool."""
+    get_tool_cache().clear(tag=name)
@@ -1,43 +1,49 @@
 """
 Tool registry for the ReAct application.
-This module imports and registers all available tools.
+This module registers all available tools. Tools are registered by "module:function"
+so importing this package stays cheap: signatures and docs are read from the source
+and each implementation module is imported on the tool's first call.
 """
-from .web_tools import web_search, web_scrape
-from .file_tools import read_file, write_file, list_files, delete_file
-from .enhanced_file_tools import enhanced_list_files
-from .memory_tools import memory_get, memory_set, memory_list
-from .knowledge_tools import kb_add_web, kb_add_file, kb_list, kb_get, kb_delete, kb_search
-from .execution_tools import execute_python, reset_python_environment, list_python_variables
-from .stock_tools import get_stock_data
-from .firecrawl_tools import firecrawl_scrape, firecrawl_crawl, firecrawl_map
-from .text_tools import text_extract_urls
-from .system_tools import open_file
+from .registry import ToolRegistry, ToolArgumentError, non_empty
 
-# Dictionary of all available tools
-TOOLS = {
-    "web_search": web_search,
-    "web_scrape": web_scrape,
-    "get_stock_data": get_stock_data,
-    "read_file": read_file,
-    "write_file": write_file,
-    "list_files": list_files,
-    "delete_file": delete_file,
-    "execute_python": execute_python,
-    "reset_python_environment": reset_python_environment,
-    "list_python_variables": list_python_variables,
-    "memory_get": memory_get,
-    "memory_set": memory_set,
-    "memory_list": memory_list,
-    "kb_add_web": kb_add_web,
-    "kb_add_file": kb_add_file,
-    "kb_list": kb_list,
-    "kb_get": kb_get,
-    "kb_delete": kb_delete,
-    "kb_search": kb_search,
-    "firecrawl_scrape": firecrawl_scrape,
-    "firecrawl_crawl": firecrawl_crawl,
-    "firecrawl_map": firecrawl_map,
-    "text_extract_urls": text_extract_urls,
-    "enhanced_list_files": enhanced_list_files,
-    "open_file": open_file,
-}
+def _numeric_keys_to_entry_id(args):
+    """LLMs sometimes call kb_get({"0": "<id>"}): use the first numeric key's value as entry_id."""
+    if not args.get("entry_id") and not args.get("memory_key"):
+        for key in [k for k in args if k.isdigit()]:
+            value = args.pop(key)
+            if isinstance(value, str) and value.strip():
+                args["entry_id"] = value
+                break
+    return args
+
+# Registry of all available tools (a mapping of name to function, plus schemas and argument binding)
+TOOLS = ToolRegistry()
+TOOLS.register_lazy("tools.web_tools:web_search", aliases={"q": "query", "search_query": "query"}, validators=[non_empty("query")])
+TOOLS.register_lazy("tools.web_tools:web_scrape", aliases={"urls": "url", "link": "url"}, validators=[non_empty("url")])
+TOOLS.register_lazy("tools.stock_tools:get_stock_data", aliases={"ticker": "symbol", "stock_symbol": "symbol"}, validators=[non_empty("symbol")])
+TOOLS.register_lazy("tools.file_tools:read_file", aliases={"file": "filename", "path": "filename", "file_name": "filename"}, validators=[non_empty("filename")])
+TOOLS.register_lazy("tools.file_tools:write_file", aliases={"text": "content", "file": "filename", "path": "filename", "file_name": "filename"}, validators=[non_empty("filename")])
+TOOLS.register_lazy("tools.file_tools:list_files", aliases={"path": "directory", "dir": "directory"})
+TOOLS.register_lazy("tools.file_tools:delete_file", aliases={"file": "filename", "path": "filename", "file_name": "filename"}, validators=[non_empty("filename")])
+TOOLS.register_lazy("tools.execution_tools:execute_python")
+TOOLS.register_lazy("tools.execution_tools:reset_python_environment")
+TOOLS.register_lazy("tools.execution_tools:list_python_variables")
+TOOLS.register_lazy("tools.memory_tools:memory_get", aliases={"memory_key": "key", "name": "key"}, validators=[non_empty("key")])
+TOOLS.register_lazy("tools.memory_tools:memory_set", aliases={"memory_key": "key", "name": "key"}, validators=[non_empty("key")])
+TOOLS.register_lazy("tools.memory_tools:memory_list")
+TOOLS.register_lazy("tools.knowledge_tools:kb_add_web", aliases={"urls": "url"}, validators=[non_empty("url")])
+TOOLS.register_lazy("tools.knowledge_tools:kb_add_file", aliases={"file": "filename", "path": "filename"}, validators=[non_empty("filename")])
+TOOLS.register_lazy("tools.knowledge_tools:kb_list")
+TOOLS.register_lazy("tools.knowledge_tools:kb_get", aliases={"id": "entry_id"}, one_of=[("entry_id", "memory_key")],
+                    preprocess=_numeric_keys_to_entry_id)
+TOOLS.register_lazy("tools.knowledge_tools:kb_delete", aliases={"id": "entry_id"}, validators=[non_empty("entry_id")])
+TOOLS.register_lazy("tools.knowledge_tools:kb_search", aliases={"q": "query"}, validators=[non_empty("query")])
+TOOLS.register_lazy("tools.firecrawl_tools:firecrawl_scrape", aliases={"urls": "url"}, validators=[non_empty("url")])
+TOOLS.register_lazy("tools.firecrawl_tools:firecrawl_crawl", aliases={"urls": "url", "max_pages": "limit"}, validators=[non_empty("url")])
+TOOLS.register_lazy("tools.firecrawl_tools:firecrawl_map", aliases={"urls": "url"}, validators=[non_empty("url")])
+TOOLS.register_lazy("tools.text_tools:text_extract_urls", aliases={"content": "text"})
+TOOLS.register_lazy("tools.enhanced_file_tools:enhanced_list_files", aliases={"path": "directory", "dir": "directory"})
+TOOLS.register_lazy("tools.system_tools:open_file", aliases={"file": "filename", "path": "filename", "file_name": "filename"}, validators=[non_empty("filename")])
+
+# Tools of installed plugins (the "react_nexus.tools" entry point group)
+TOOLS.load_entry_points()
@@ -20,23 +20,14 @@ def read_file(filename: str) -> str:
     except Exception as e:
         return f"Error reading file '{filename}': {e}"
 
-def write_file(filename: str, content: str = None, text: str = None, append: bool = False) -> str:
+def write_file(filename: str, content: str, append: bool = False) -> str:
     """Writes or appends content to a file in the workspace directory.
 
     Args:
         filename: The name of the file to write
-        content: The content to write to the file (primary parameter)
-        text: Alternative parameter name for content (for backward compatibility)
+        content: The content to write to the file
         append: If True, append to the file instead of overwriting it (default: False)
     """
-    # Handle both 'content' and 'text' parameters for backward compatibility
-    actual_content = content
-    if actual_content is None and text is not None:
-        actual_content = text
-
-    if actual_content is None:
-        return "Error: No content provided. Please provide either 'content' or 'text' parameter."
-
     mode = 'a' if append else 'w'  # Use append mode if requested
     action = "appended" if append else "wrote"
 
@@ -44,7 +35,7 @@ def write_file(filename: str, content: str = None, text: str = None, append: boo
     filepath = os.path.join(WORKSPACE_DIR, filename)
     try:
         with open(filepath, mode, encoding='utf-8') as f:
-            f.write(actual_content)
+            f.write(content)
         return f"Successfully {action} content to '{filename}'."
     except Exception as e:
         return f"Error writing file '{filename}': {e}"
@@ -6,6 +6,10 @@ import os
 import json
 import streamlit as st
 from utils.status import update_tool_status
+from utils.deadline import io_timeout
+
+# Milliseconds Firecrawl may spend on one page (less if the step has less time left)
+SCRAPE_TIMEOUT_MS = 60000
 
 def firecrawl_scrape(url: str, formats: list = None, extract_schema: dict = None, extract_prompt: str = None, parse_pdf: bool = True) -> str:
     """
@@ -39,7 +43,8 @@ def firecrawl_scrape(url: str, formats: list = None, extract_schema: dict = None
         # Prepare parameters
         params = {
             "formats": formats,
-            "parsePDF": parse_pdf
+            "parsePDF": parse_pdf,
+            "timeout": int(io_timeout(SCRAPE_TIMEOUT_MS / 1000) * 1000)
         }
 
         # Add JSON extraction options if provided
@@ -4,7 +4,6 @@ Includes adding, retrieving, listing, and deleting knowledge entries.
 """
 import os
 import streamlit as st
-from data_acquisition.news_scraper import WebScraper
 from utils.status import update_tool_status
 from config import WORKSPACE_DIR
 
@@ -15,8 +14,9 @@ def kb_add_web(url: str, title: str = None) -> str:
     """Adds a web page to the knowledge base."""
     update_tool_status("kb_add_web", url=url, title=title)
 
-    # First scrape the content
+    # First scrape the content (the scraper is imported on first use: it pulls in BeautifulSoup)
     try:
+        from data_acquisition.news_scraper import WebScraper
         scraper = WebScraper()
         content = scraper.scrape_content(url)
 
@@ -79,22 +79,8 @@ def kb_list() -> str:
     except Exception as e:
         return f"Error listing knowledge base entries: {str(e)}"
 
-def kb_get(entry_id: str = None, memory_key: str = None, **kwargs) -> str:
+def kb_get(entry_id: str = None, memory_key: str = None) -> str:
     """Gets the content of a knowledge base entry by ID or memory key."""
-    # Handle potential numeric keys or positional arguments
-    if not entry_id and not memory_key:
-        # Check if there are numeric keys in kwargs (from LLM responses)
-        for k, v in kwargs.items():
-            try:
-                # If the key is a numeric string or can be converted to int
-                int(k)
-                # Use the first value found as entry_id
-                if isinstance(v, str) and v.strip():
-                    entry_id = v
-                    break
-            except (ValueError, TypeError):
-                continue
-
     # Log what we're actually using
     update_tool_status("kb_get", entry_id=entry_id, memory_key=memory_key)
 
@@ -0,0 +1,472 @@
+"""
+Typed tool registry for the ReAct application.
+Each tool's parameters, types and defaults are read once from its signature. From
+them the registry precompiles an argument binder that maps aliases to canonical
+names, coerces the loosely typed values LLMs produce ("10" -> 10, "true" -> True,
+"a, b" -> ["a", "b"]), drops unknown extras and rejects calls that are missing
+required arguments before the tool does any I/O. The same metadata yields JSON
+schemas for the planner and for native function calling.
+
+Tools can be registered lazily as "module:function": the signature and docstring are
+then read from the module's source without importing it, and the module (with its
+third-party clients) is imported on the tool's first call. Installed packages can add
+tools through the "react_nexus.tools" entry point group, e.g. in their pyproject.toml:
+
+    [project.entry-points."react_nexus.tools"]
+    weather_lookup = "my_package.tools:weather_lookup"
+
+The registry is also a mapping of tool name to function, so TOOLS[name] keeps working.
+"""
+import ast
+import json
+import inspect
+import typing
+import importlib
+import importlib.util
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from utils.status import log_debug
+
+class ToolArgumentError(ValueError):
+    """Raised when a tool call cannot be bound to the tool's parameters."""
+
+# Arguments the executor reads for its own bookkeeping, never passed to tools
+# ("fresh" asks to bypass the tool result cache)
+RESERVED_ARGS = ("reasoning", "fresh")
+# Entry point group of third-party tool plugins
+ENTRY_POINT_GROUP = "react_nexus.tools"
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+_TRUE = ("true", "yes", "y", "1", "on")
+_FALSE = ("false", "no", "n", "0", "off", "none", "null", "")
+
+def _types_of(annotation) -> tuple:
+    """The concrete types an annotation allows (Optional/Union unpacked, unknown -> ())."""
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return ()
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        types = []
+        for arg in typing.get_args(annotation):
+            if arg is not type(None):
+                types.extend(_types_of(arg))
+        return tuple(types)
+    if origin in (list, List):
+        return (list,)
+    if origin in (dict, Dict):
+        return (dict,)
+    return (annotation,) if annotation in _JSON_TYPES else ()
+
+def _coerce_one(value, target):
+    """Convert value to target or raise ValueError."""
+    if isinstance(value, target) and not (target is int and isinstance(value, bool)):
+        return value
+    if target is str:
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if isinstance(value, (int, float, bool)):
+            return str(value)
+    elif target is bool:
+        if isinstance(value, (int, float)):
+            return bool(value)
+        if isinstance(value, str) and value.strip().lower() in _TRUE + _FALSE:
+            return value.strip().lower() in _TRUE
+    elif target is int:
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str):
+            return int(value.strip())
+    elif target is float:
+        if isinstance(value, (int, str)) and not isinstance(value, bool):
+            return float(value)
+    elif target is list:
+        if isinstance(value, str):
+            text = value.strip()
+            if text.startswith("["):
+                parsed = json.loads(text)
+                if isinstance(parsed, list):
+                    return parsed
+            return [part.strip() for part in text.split(",") if part.strip()]
+        if isinstance(value, (tuple, set)):
+            return list(value)
+        return [value]
+    elif target is dict:
+        if isinstance(value, str):
+            parsed = json.loads(value)
+            if isinstance(parsed, dict):
+                return parsed
+    raise ValueError(f"expected {_JSON_TYPES[target]}, got {type(value).__name__}")
+
+def _make_coercer(types: tuple) -> Optional[Callable]:
+    """Precompile a coercer for a parameter's allowed types (None: accept anything)."""
+    if not types:
+        return None
+    if len(types) == 1:
+        target = types[0]
+        return lambda value: _coerce_one(value, target)
+
+    def coerce_union(value):
+        # Keep values that already have an allowed type, else try each type in order
+        if any(isinstance(value, t) for t in types):
+            return value
+        for target in types:
+            try:
+                return _coerce_one(value, target)
+            except (ValueError, TypeError):
+                continue
+        raise ValueError(f"expected {' or '.join(_JSON_TYPES[t] for t in types)}, got {type(value).__name__}")
+    return coerce_union
+
+def _json_type(types: tuple) -> Dict:
+    if not types:
+        return {}
+    if len(types) == 1:
+        return {"type": _JSON_TYPES[types[0]]}
+    return {"anyOf": [{"type": _JSON_TYPES[t]} for t in types]}
+
+def _param_docs(doc: str) -> Dict[str, str]:
+    """Parameter descriptions from an "Args:" docstring section."""
+    descriptions = {}
+    in_args = False
+    for line in doc.splitlines():
+        stripped = line.strip()
+        if stripped in ("Args:", "Arguments:", "Parameters:"):
+            in_args = True
+            continue
+        if in_args:
+            if stripped in ("Returns:", "Raises:", "Yields:", "Example:", "Examples:"):
+                break
+            name, sep, text = stripped.partition(":")
+            name = name.split("(")[0].strip()
+            if sep and name.isidentifier() and name not in descriptions:
+                descriptions[name] = text.strip()
+    return descriptions
+
+# Names an annotation in a tool module's source may use
+_ANNOTATION_NAMES = {
+    "str": str, "int": int, "float": float, "bool": bool, "list": list, "dict": dict, "tuple": tuple,
+    "Any": Any, "Optional": Optional, "Union": Union, "List": List, "Dict": Dict, "typing": typing,
+}
+
+def _eval_annotation(node):
+    """Evaluate a source annotation like Optional[str]; unknown names give an untyped parameter."""
+    if node is None:
+        return inspect.Parameter.empty
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        node = ast.parse(node.value, mode="eval").body
+    try:
+        return eval(compile(ast.Expression(node), "<annotation>", "eval"), {"__builtins__": {}}, _ANNOTATION_NAMES)
+    except Exception:
+        return inspect.Parameter.empty
+
+def _eval_default(node):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+def _source_signature(node: ast.FunctionDef) -> inspect.Signature:
+    """An inspect.Signature (with evaluated annotations) from a function definition."""
+    args = node.args
+    params = []
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    for i, (arg, default) in enumerate(zip(positional, defaults)):
+        kind = inspect.Parameter.POSITIONAL_ONLY if i < len(args.posonlyargs) else inspect.Parameter.POSITIONAL_OR_KEYWORD
+        params.append(inspect.Parameter(arg.arg, kind, annotation=_eval_annotation(arg.annotation),
+                                        default=inspect.Parameter.empty if default is None else _eval_default(default)))
+    if args.vararg:
+        params.append(inspect.Parameter(args.vararg.arg, inspect.Parameter.VAR_POSITIONAL))
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append(inspect.Parameter(arg.arg, inspect.Parameter.KEYWORD_ONLY, annotation=_eval_annotation(arg.annotation),
+                                        default=inspect.Parameter.empty if default is None else _eval_default(default)))
+    if args.kwarg:
+        params.append(inspect.Parameter(args.kwarg.arg, inspect.Parameter.VAR_KEYWORD))
+    return inspect.Signature(params)
+
+@lru_cache(maxsize=None)
+def _module_signatures(module: str) -> Dict[str, tuple]:
+    """{function: (signature, docstring)} for a module's top-level functions, read from its
+    source without importing it. Only the results are kept, not the syntax tree."""
+    spec = importlib.util.find_spec(module)
+    if spec is None or not spec.origin or not spec.origin.endswith(".py"):
+        return {}
+    with open(spec.origin, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=spec.origin)
+    return {node.name: (_source_signature(node), ast.get_docstring(node) or "")
+            for node in tree.body if isinstance(node, ast.FunctionDef)}
+
+_load_lock = threading.RLock()
+
+def non_empty(*names: str) -> Callable:
+    """Validator rejecting blank strings for the named parameters (e.g. a search query or URL).
+
+    Only for parameters where an empty value can never be meant: an empty file content,
+    for instance, is a valid way to truncate a file.
+    """
+    def validate(args):
+        for name in names:
+            value = args.get(name)
+            if isinstance(value, str) and not value.strip():
+                raise ToolArgumentError(f"'{name}' must not be empty")
+    return validate
+
+class ToolParam:
+    """One parameter of a tool."""
+
+    __slots__ = ("name", "types", "required", "default", "description", "coerce")
+
+    def __init__(self, name, types, required, default, description=""):
+        self.name = name
+        self.types = types
+        self.required = required
+        self.default = default
+        self.description = description
+        self.coerce = _make_coercer(types)
+
+    def schema(self) -> Dict:
+        schema = dict(_json_type(self.types))
+        if self.description:
+            schema["description"] = self.description
+        if not self.required and self.default is not None:
+            schema["default"] = self.default
+        return schema
+
+class ToolSpec:
+    """A registered tool: its function, parameters, aliases and validators."""
+
+    def __init__(self, name: str, func: Optional[Callable] = None, aliases: Optional[Dict[str, str]] = None,
+                 one_of: Iterable[Iterable[str]] = (), preprocess: Optional[Callable] = None,
+                 validators: Iterable[Callable] = (), description: Optional[str] = None,
+                 target: Optional[str] = None):
+        """
+        Args:
+            name: Tool name used in plans and actions
+            func: The tool implementation (or None with target)
+            aliases: Alternative argument names, {alias: canonical parameter}
+            one_of: Groups of parameters of which at least one must be given
+            preprocess: Optional function(args) -> args run before aliasing (for odd LLM argument shapes)
+            validators: Functions(args) that raise ToolArgumentError for invalid combinations
+            description: One-line description (default: first docstring line)
+            target: "module:function" to import on first call instead of func
+        """
+        self.name = name
+        self._func = func
+        self.target = target
+        self.aliases = dict(aliases or {})
+        self.one_of = [tuple(group) for group in one_of]
+        self.preprocess = preprocess
+        self.validators = list(validators)
+
+        source = None
+        if func is None:
+            module, _, attr = target.partition(":")
+            self._module, self._attr = module, attr or name
+            source = _module_signatures(module).get(self._attr)
+            if source is None:
+                # Not a plain function in the source (e.g. built dynamically): import it now
+                func = self.func
+        if source is not None:
+            signature, self.doc = source
+            hints = {}
+        else:
+            signature = inspect.signature(func)
+            self.doc = inspect.getdoc(func) or ""
+            hints = typing.get_type_hints(func) if hasattr(func, "__annotations__") else {}
+        self.description = description or next((l.strip() for l in self.doc.splitlines() if l.strip()),
+                                               "No description available.")
+        param_docs = _param_docs(self.doc)
+        self.params: Dict[str, ToolParam] = {}
+        self.accepts_extra = False
+        for param in signature.parameters.values():
+            if param.kind == inspect.Parameter.VAR_KEYWORD:
+                self.accepts_extra = True
+                continue
+            if param.kind == inspect.Parameter.VAR_POSITIONAL:
+                continue
+            required = param.default is inspect.Parameter.empty
+            self.params[param.name] = ToolParam(
+                param.name, _types_of(hints.get(param.name, param.annotation)), required,
+                None if required else param.default, param_docs.get(param.name, ""))
+        for alias, target_param in self.aliases.items():
+            if target_param not in self.params:
+                raise ValueError(f"Alias {alias!r} of tool {name!r} points to unknown parameter {target_param!r}")
+        self.required = [p.name for p in self.params.values() if p.required]
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the implementation has been imported."""
+        return self._func is not None
+
+    @property
+    def func(self) -> Callable:
+        """The tool implementation, imported on first access for lazily registered tools."""
+        if self._func is None:
+            with _load_lock:
+                if self._func is None:
+                    self._func = getattr(importlib.import_module(self._module), self._attr)
+        return self._func
+
+    def signature(self) -> str:
+        """Compact signature, e.g. `web_search(query: str)`."""
+        parts = []
+        for param in self.params.values():
+            text = param.name
+            if param.types:
+                text += ": " + " | ".join(t.__name__ for t in param.types)
+            if not param.required:
+                text += f" = {param.default!r}"
+            parts.append(text)
+        return f"{self.name}({', '.join(parts)})"
+
+    def _error(self, message) -> ToolArgumentError:
+        return ToolArgumentError(f"{self.name}: {message}. Expected {self.signature()}")
+
+    def bind(self, args: Optional[Dict]) -> Dict:
+        """Validate and coerce LLM-provided arguments into keyword arguments for the tool.
+
+        Raises:
+            ToolArgumentError: If required arguments are missing or a value has the wrong type
+        """
+        if args is None:
+            args = {}
+        if not isinstance(args, dict):
+            raise self._error(f"arguments must be an object, got {type(args).__name__}")
+        args = {str(k): v for k, v in args.items() if k not in RESERVED_ARGS}
+        if self.preprocess:
+            args = self.preprocess(args)
+
+        bound = {}
+        for key, value in args.items():
+            name = self.aliases.get(key, key)
+            if name not in self.params:
+                if self.accepts_extra:
+                    bound[name] = value
+                else:
+                    log_debug(f"Ignoring unknown argument {key!r} for tool {self.name}")
+                continue
+            # The canonical name wins over an alias given at the same time
+            if name in bound and key != name:
+                continue
+            bound[name] = value
+
+        for name, value in list(bound.items()):
+            param = self.params.get(name)
+            if param is None or value is None:
+                continue
+            if param.coerce:
+                try:
+                    bound[name] = param.coerce(value)
+                except (ValueError, TypeError) as e:
+                    raise self._error(f"invalid value for '{name}' ({e})")
+
+        missing = [name for name in self.required if bound.get(name) is None]
+        if missing:
+            raise self._error(f"missing required argument{'s' if len(missing) > 1 else ''} "
+                              f"{', '.join(repr(m) for m in missing)}")
+        for group in self.one_of:
+            if not any(bound.get(name) not in (None, "") for name in group):
+                raise self._error(f"one of {', '.join(repr(g) for g in group)} is required")
+        for validator in self.validators:
+            try:
+                validator(bound)
+            except ToolArgumentError as e:
+                raise self._error(str(e)) from None
+        return bound
+
+    def schema(self) -> Dict:
+        """JSON schema of the tool's arguments."""
+        schema = {
+            "type": "object",
+            "properties": {name: param.schema() for name, param in self.params.items()},
+            "required": list(self.required),
+        }
+        if self.one_of:
+            schema["anyOf"] = [{"required": [name]} for group in self.one_of for name in group]
+        if not self.accepts_extra:
+            schema["additionalProperties"] = False
+        return schema
+
+    def openai_tool(self) -> Dict:
+        """Tool definition for native (OpenAI-style) function calling."""
+        return {"type": "function",
+                "function": {"name": self.name, "description": self.description, "parameters": self.schema()}}
+
+class ToolRegistry(Mapping):
+    """Registered tools by name; iterating yields names and indexing yields the tool functions."""
+
+    def __init__(self):
+        self._specs: Dict[str, ToolSpec] = {}
+
+    def register(self, func: Callable, name: Optional[str] = None, **options) -> ToolSpec:
+        """Register a tool (options as for ToolSpec) and return its spec."""
+        spec = ToolSpec(name or func.__name__, func, **options)
+        self._specs[spec.name] = spec
+        return spec
+
+    def register_lazy(self, target: str, name: Optional[str] = None, **options) -> ToolSpec:
+        """Register a tool by "module:function" without importing the module (options as for ToolSpec)."""
+        spec = ToolSpec(name or target.partition(":")[2], target=target, **options)
+        self._specs[spec.name] = spec
+        return spec
+
+    def load_entry_points(self, group: str = ENTRY_POINT_GROUP) -> List[str]:
+        """Register the tools of installed plugins lazily; built-in tools keep their names.
+
+        Returns:
+            list: Names of the plugin tools registered
+        """
+        from importlib.metadata import entry_points
+        registered = []
+        for entry_point in entry_points(group=group):
+            if entry_point.name in self._specs:
+                print(f"Tool plugin {entry_point.value} ignored: a tool named {entry_point.name!r} already exists")
+                continue
+            try:
+                self.register_lazy(entry_point.value, name=entry_point.name)
+                registered.append(entry_point.name)
+            except Exception as e:
+                print(f"Error loading tool plugin {entry_point.name} ({entry_point.value}): {e}")
+        return registered
+
+    def __getitem__(self, name):
+        # Imports the implementation of lazily registered tools on first use
+        return self._specs[name].func
+
+    def __iter__(self):
+        return iter(self._specs)
+
+    def __len__(self):
+        return len(self._specs)
+
+    def spec(self, name: str) -> ToolSpec:
+        """The spec of a tool.
+
+        Raises:
+            ToolArgumentError: If no tool has that name
+        """
+        spec = self._specs.get(name)
+        if spec is None:
+            raise ToolArgumentError(f"Unknown tool '{name}'. Available tools: {', '.join(self._specs)}")
+        return spec
+
+    def bind(self, name: str, args: Optional[Dict]) -> Dict:
+        """Validate and coerce arguments for a tool (see ToolSpec.bind)."""
+        return self.spec(name).bind(args)
+
+    def call(self, name: str, args: Optional[Dict]):
+        """Bind the arguments and run the tool."""
+        spec = self.spec(name)
+        return spec.func(**spec.bind(args))
+
+    def schemas(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Argument schemas by tool name (all tools, or the given names)."""
+        names = self._specs.keys() if names is None else [n for n in names if n in self._specs]
+        return {name: self._specs[name].schema() for name in names}
+
+    def openai_tools(self, names: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Native function-calling definitions (all tools, or the given names)."""
+        names = self._specs.keys() if names is None else [n for n in names if n in self._specs]
+        return [self._specs[name].openai_tool() for name in names]
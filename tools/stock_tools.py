@@ -5,31 +5,26 @@ import os
 import json
 import requests
 from utils.status import update_tool_status
+from utils.deadline import io_timeout
 
-def get_stock_data(symbol: str = None, ticker: str = None, stock_symbol: str = None) -> str:
-    """Fetches real-time stock data using Alpha Vantage API
-    Accepts 'symbol', 'ticker', or 'stock_symbol' parameter for backward compatibility.
-    """
-    # Handle multiple parameter names for backward compatibility
-    # Try each parameter in order of preference
-    actual_symbol = symbol
-    if actual_symbol is None:
-        actual_symbol = ticker
-    if actual_symbol is None:
-        actual_symbol = stock_symbol
+# Seconds to wait for Alpha Vantage (less if the step has less time left)
+REQUEST_TIMEOUT = 15
 
-    update_tool_status("get_stock_data", symbol=actual_symbol)
+def get_stock_data(symbol: str) -> str:
+    """Fetches real-time stock data using Alpha Vantage API
 
-    if actual_symbol is None:
-        return json.dumps({'error': 'No stock symbol provided. Please provide a symbol using one of these parameters: "symbol", "ticker", or "stock_symbol"'})
+    Args:
+        symbol: The stock ticker symbol, e.g. AAPL
+    """
+    update_tool_status("get_stock_data", symbol=symbol)
 
     api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
     if not api_key:
         return json.dumps({'error': 'ALPHA_VANTAGE_API_KEY not found in environment variables'})
 
     try:
-        url = f'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={actual_symbol}&apikey={api_key}'
-        response = requests.get(url)
+        url = f'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={api_key}'
+        response = requests.get(url, timeout=io_timeout(REQUEST_TIMEOUT))
         response.raise_for_status()
         return json.dumps(response.json())
     except Exception as e:
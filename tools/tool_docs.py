@@ -0,0 +1,72 @@
+"""
+Tool documentation generated from the tool registry.
+Builds compact signatures and summaries from the tool specs registered in TOOLS,
+so the prompts always match the code instead of a hand-maintained description.
+"""
+from functools import lru_cache
+from . import TOOLS
+
+# Display order of the sections in the planner prompt
+TOOL_SECTIONS = [
+    ("Available Tools", None),
+    ("Firecrawl Tools (Advanced Web Scraping)", "firecrawl_"),
+    ("Knowledge Base Tools", "kb_"),
+]
+
+def describe_tool(name: str) -> str:
+    """One-line description of a tool: compact signature plus docstring summary."""
+    spec = TOOLS.spec(name)
+    return f"- {spec.signature()}: {spec.description}"
+
+def describe_tool_full(name: str) -> str:
+    """Full specification of a tool: signature, required parameters, accepted aliases and docstring."""
+    spec = TOOLS.spec(name)
+    lines = [spec.signature()]
+    lines.append(f"Required parameters: {', '.join(spec.required) if spec.required else 'none'}")
+    if spec.one_of:
+        lines.append("At least one of: " + "; ".join(", ".join(group) for group in spec.one_of))
+    if spec.aliases:
+        lines.append("Also accepted: " + ", ".join(f"{alias} (for {target})" for alias, target in spec.aliases.items()))
+    if spec.doc:
+        lines.append(spec.doc)
+    return "\n".join(lines)
+
+def _allowed_names(allowed_tools_key):
+    """Resolve the registered tool names allowed by a tools key (None means all)."""
+    if allowed_tools_key is None:
+        return list(TOOLS.keys())
+    return [name for name in TOOLS if name in allowed_tools_key]
+
+@lru_cache(maxsize=32)
+def get_tool_descriptions(allowed_tools_key=None) -> str:
+    """Compact, grouped tool descriptions for the planner (memoized per tool set).
+
+    Args:
+        allowed_tools_key (tuple, optional): Sorted tuple of allowed tool names. None means all tools.
+
+    Returns:
+        str: One line per tool, grouped by tool family
+    """
+    names = _allowed_names(allowed_tools_key)
+    sections = []
+    for title, prefix in TOOL_SECTIONS:
+        if prefix is None:
+            # The general section holds every tool not claimed by a prefixed section
+            section_names = [n for n in names if not any(p and n.startswith(p) for _, p in TOOL_SECTIONS)]
+        else:
+            section_names = [n for n in names if n.startswith(prefix)]
+        if section_names:
+            sections.append(f"{title}:\n" + "\n".join(describe_tool(n) for n in section_names))
+    return "\n\n".join(sections)
+
+@lru_cache(maxsize=32)
+def get_tool_summaries(allowed_tools_key=None) -> str:
+    """Ungrouped one-line summaries for the executor (memoized per tool set)."""
+    return "\n".join(describe_tool(name) for name in _allowed_names(allowed_tools_key))
+
+@lru_cache(maxsize=64)
+def get_suggested_tool_spec(tool_name: str) -> str:
+    """Full specification of the suggested tool, or an empty string if it is not a registered tool."""
+    if not tool_name or tool_name not in TOOLS:
+        return ""
+    return describe_tool_full(tool_name)
@@ -0,0 +1,70 @@
+"""
+URL helpers for the ReAct application.
+Lightweight URL detection used by the chat UI and the web tools; kept apart from
+tools/web_tools.py so the UI does not import the search and scraping clients.
+"""
+import re
+
+def extract_urls_from_markdown(markdown_text: str) -> list:
+    """Extract all URLs from markdown-formatted text."""
+    url_pattern = r'https?://[^\s\)\]\"]+'
+    urls = re.findall(url_pattern, markdown_text)
+    return urls
+
+def detect_url_scrape_request(query: str) -> tuple:
+    """Detect if a user is asking to scrape a URL for knowledge.
+
+    Args:
+        query (str): The user's query
+
+    Returns:
+        tuple: (is_scrape_request, url, memory_key, add_to_kb)
+            - is_scrape_request (bool): True if the query is asking to scrape a URL
+            - url (str): The URL to scrape, or None if no URL found
+            - memory_key (str): Suggested memory key for storing the scraped content
+            - add_to_kb (bool): True if the query is asking to add to knowledge base
+    """
+    # Common phrases that indicate a URL scrape request
+    scrape_phrases = [
+        "scrape", "extract", "get content", "get information",
+        "use as knowledge", "use as reference", "use this url",
+        "use this website", "use this link", "use this page",
+        "read this website", "read this url", "read this link", "read this page"
+    ]
+
+    # Phrases that indicate adding to knowledge base
+    kb_phrases = [
+        "add to knowledge base", "save to knowledge base", "store in knowledge base",
+        "remember for later", "save for future", "add to kb", "save to kb",
+        "persist this", "keep this information", "save this information",
+        "add to permanent memory", "save permanently"
+    ]
+
+    # Check if any scrape phrase is in the query (case insensitive)
+    is_scrape_request = any(phrase.lower() in query.lower() for phrase in scrape_phrases)
+
+    # Check if any knowledge base phrase is in the query
+    add_to_kb = any(phrase.lower() in query.lower() for phrase in kb_phrases)
+
+    # If explicitly asking to add to knowledge base, treat as a scrape request too
+    if add_to_kb and not is_scrape_request:
+        is_scrape_request = True
+
+    # Extract URL from the query
+    urls = extract_urls_from_markdown(query)
+    url = urls[0] if urls else None
+
+    # Generate a memory key based on the URL domain
+    memory_key = None
+    if url:
+        try:
+            from urllib.parse import urlparse
+            domain = urlparse(url).netloc
+            # Remove www. and .com/.org/etc. to create a clean key
+            domain = domain.replace('www.', '')
+            domain = domain.split('.')[0]  # Get the main domain name
+            memory_key = f"scraped_{domain}"
+        except:
+            memory_key = "scraped_content"
+
+    return (is_scrape_request, url, memory_key, add_to_kb)
@@ -4,78 +4,16 @@ Includes web search and web scraping functionality.
 """
 import os
 import json
-import re
-import requests
+from typing import Union
 import streamlit as st
-from tavily import TavilyClient
-from data_acquisition.news_scraper import WebScraper
 from data_acquisition.process_search_results import process_search_results
 from utils.status import update_tool_status
-from tools.firecrawl_tools import firecrawl_scrape
+from utils.deadline import io_timeout
+# Re-exported for callers that still import the URL helpers from here
+from tools.url_utils import extract_urls_from_markdown, detect_url_scrape_request
 
-def extract_urls_from_markdown(markdown_text: str) -> list:
-    """Extract all URLs from markdown-formatted text."""
-    url_pattern = r'https?://[^\s\)\]\"]+'
-    urls = re.findall(url_pattern, markdown_text)
-    return urls
-
-def detect_url_scrape_request(query: str) -> tuple:
-    """Detect if a user is asking to scrape a URL for knowledge.
-
-    Args:
-        query (str): The user's query
-
-    Returns:
-        tuple: (is_scrape_request, url, memory_key, add_to_kb)
-            - is_scrape_request (bool): True if the query is asking to scrape a URL
-            - url (str): The URL to scrape, or None if no URL found
-            - memory_key (str): Suggested memory key for storing the scraped content
-            - add_to_kb (bool): True if the query is asking to add to knowledge base
-    """
-    # Common phrases that indicate a URL scrape request
-    scrape_phrases = [
-        "scrape", "extract", "get content", "get information",
-        "use as knowledge", "use as reference", "use this url",
-        "use this website", "use this link", "use this page",
-        "read this website", "read this url", "read this link", "read this page"
-    ]
-
-    # Phrases that indicate adding to knowledge base
-    kb_phrases = [
-        "add to knowledge base", "save to knowledge base", "store in knowledge base",
-        "remember for later", "save for future", "add to kb", "save to kb",
-        "persist this", "keep this information", "save this information",
-        "add to permanent memory", "save permanently"
-    ]
-
-    # Check if any scrape phrase is in the query (case insensitive)
-    is_scrape_request = any(phrase.lower() in query.lower() for phrase in scrape_phrases)
-
-    # Check if any knowledge base phrase is in the query
-    add_to_kb = any(phrase.lower() in query.lower() for phrase in kb_phrases)
-
-    # If explicitly asking to add to knowledge base, treat as a scrape request too
-    if add_to_kb and not is_scrape_request:
-        is_scrape_request = True
-
-    # Extract URL from the query
-    urls = extract_urls_from_markdown(query)
-    url = urls[0] if urls else None
-
-    # Generate a memory key based on the URL domain
-    memory_key = None
-    if url:
-        try:
-            from urllib.parse import urlparse
-            domain = urlparse(url).netloc
-            # Remove www. and .com/.org/etc. to create a clean key
-            domain = domain.replace('www.', '')
-            domain = domain.split('.')[0]  # Get the main domain name
-            memory_key = f"scraped_{domain}"
-        except:
-            memory_key = "scraped_content"
-
-    return (is_scrape_request, url, memory_key, add_to_kb)
+# Seconds to wait for Tavily (less if the step has less time left)
+SEARCH_TIMEOUT = 30
 
 def web_search(query: str) -> str:
     """
@@ -89,8 +27,10 @@ def web_search(query: str) -> str:
         return json.dumps({"error": "TAVILY_API_KEY not found in environment variables"})
 
     try:
+        # Imported on first use: the Tavily client pulls in httpx and friends
+        from tavily import TavilyClient
         tavily = TavilyClient(api_key=api_key)
-        search_result = tavily.search(query=query, max_results=3)
+        search_result = tavily.search(query=query, max_results=3, timeout=io_timeout(SEARCH_TIMEOUT))
         results_json = json.dumps([
             {"title": result["title"], "url": result["url"], "snippet": result["content"]}
             for result in search_result["results"]
@@ -160,18 +100,21 @@ def is_document_url(url: str) -> bool:
 
     return False
 
-def web_scrape(url: str = None, urls: str = None) -> str:
+def web_scrape(url: Union[str, list]) -> str:
     """Scrapes the text content of a given URL or list of URLs.
 
     For document files (PDF, Word, Excel, PowerPoint, etc.), automatically redirects to firecrawl_scrape
     for better document handling. For regular web pages, uses the WebScraper class.
+
+    Args:
+        url: A URL, a list of URLs or a JSON array of URLs
     """
-    # Handle both parameter names (url and urls) for backward compatibility
-    target_url = url if url is not None else urls
-    update_tool_status("web_scrape", url=target_url)
+    # Imported on first use: the scraper pulls in requests and BeautifulSoup
+    from data_acquisition.news_scraper import WebScraper
+    from tools.firecrawl_tools import firecrawl_scrape
 
-    if target_url is None:
-        return "Error: No URL provided. Please provide a URL using the 'url' parameter."
+    target_url = url
+    update_tool_status("web_scrape", url=target_url)
 
     try:
         # Handle both single URL strings and lists of URLs
@@ -5,17 +5,28 @@ import streamlit as st
 import re
 import json
 import time
-from tools.web_tools import extract_urls_from_markdown, detect_url_scrape_request
+import uuid
+import threading
+from tools.url_utils import extract_urls_from_markdown, detect_url_scrape_request
 from utils.conversation import auto_save_conversation
 from utils.status import log_debug
 from llm.planner import run_planner, assess_query_complexity
-from llm.executor import run_executor_step
-from llm.summarizer import generate_final_response
+from llm.executor import run_executor_step, CANCELLED_OBSERVATION
+from llm.summarizer import stream_final_response, collect_results
+from llm.draft_summary import start_draft_summary, record_step_for_draft, get_draft
+from llm.plan import Plan
 from llm.plan_adjuster import adjust_plan
-from data_acquisition.news_scraper import WebScraper
-
-def delete_message(idx):
-    """Delete a message from the chat history and update memory."""
+from llm.plan_analyzer import analyze_plan, describe_plan_estimate, format_duration
+from llm.telemetry import set_scope
+from utils.deadline import deadline_scope, step_budget
+from scf.router import record_execution
+from storage.query_cache import (
+    query_cache_key, lookup_answer, store_answer, invalidate_answer, claim_query, release_query,
+    answer_ttl, describe_age
+)
+
+def _remove_message(idx):
+    """Remove a message and shift the memory tracking of the messages after it."""
     if 0 <= idx < len(st.session_state.messages):
         # Remove the message from the messages list
         st.session_state.messages.pop(idx)
@@ -37,6 +48,11 @@ def delete_message(idx):
         # Update the message_memories dictionary
         st.session_state.message_memories = updated_memories
 
+def delete_message(idx):
+    """Delete a message from the chat history and update memory."""
+    if 0 <= idx < len(st.session_state.messages):
+        _remove_message(idx)
+
         # Update the persistent memory
         from tools.memory_tools import update_memory_from_messages
         update_memory_from_messages()
@@ -54,6 +70,69 @@ def delete_message(idx):
         # Rerun to update the UI
         st.rerun()
 
+def log_execution_for_router(user_query):
+    """Record the finished plan in the router training log."""
+    started_at = st.session_state.get('query_started_at')
+    if not started_at or not st.session_state.plan:
+        return
+    record_execution(
+        user_query,
+        st.session_state.context.get('current_component'),
+        st.session_state.get('query_complexity', 'Low'),
+        st.session_state.plan,
+        time.time() - started_at
+    )
+    st.session_state.query_started_at = None
+
+def refresh_cached_answer(idx):
+    """Drop a cached answer and ask the same question again, bypassing the cache."""
+    message = st.session_state.messages[idx]
+    if message.get("query_cache_key"):
+        invalidate_answer(message["query_cache_key"])
+    prompt = None
+    if idx > 0 and st.session_state.messages[idx - 1]["role"] == "user":
+        prompt = st.session_state.messages[idx - 1]["content"]
+    _remove_message(idx)
+    if prompt is not None:
+        _remove_message(idx - 1)
+    from tools.memory_tools import update_memory_from_messages
+    update_memory_from_messages()
+    if prompt is not None:
+        # main.py picks this up on the next run and re-runs the query without the cache
+        st.session_state.refresh_query = prompt
+    st.rerun()
+
+def show_cached_answer(cache_key, entry, client):
+    """Answer the current query from the query cache."""
+    cached = entry["value"]
+    if 'status_container' in st.session_state:
+        st.session_state.status_container.success(f"⚡ Answered from cache ({describe_age(entry['created'])})")
+    # Restore the plan so its step results can be inspected as usual
+    st.session_state.plan = Plan.from_dicts(cached.get("plan") or [])
+    st.session_state.current_step_index = -1
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": cached["response"],
+        "cached": True,
+        "cached_at": entry["created"],
+        "query_cache_key": cache_key,
+    })
+    from tools.memory_tools import update_message_memory
+    update_message_memory(len(st.session_state.messages) - 1, True)
+    filename, _ = auto_save_conversation(st.session_state.messages, client, st.session_state.current_conversation_filename)
+    st.session_state.current_conversation_filename = filename
+    st.rerun()
+
+def cache_final_answer(user_query, response):
+    """Store the completed answer in the query cache and release the single-flight claim."""
+    cache_key = st.session_state.get('query_cache_key')
+    if cache_key and st.session_state.plan:
+        _, sources = collect_results(st.session_state.plan)
+        store_answer(cache_key, user_query, response, st.session_state.plan.to_dicts(), sources,
+                     answer_ttl(user_query, st.session_state.plan))
+    release_query_claim()
+    st.session_state.query_cache_key = None
+
 def display_messages():
     """Display chat messages with extremely simplified UI to avoid conflicts."""
     for idx, message in enumerate(st.session_state.messages):
@@ -70,6 +149,15 @@ def display_messages():
             # For assistant messages, display content with memory toggle and delete button
             st.markdown(f"{message['content']}")
 
+            # Cached answers get a badge and a one-click refresh
+            if message.get("cached"):
+                badge_col, refresh_col = st.columns([9, 1])
+                with badge_col:
+                    st.caption(f"⚡ Cached answer · {describe_age(message.get('cached_at', 0))}")
+                with refresh_col:
+                    if st.button("🔄", key=f"refresh_cached_{idx}", help="Run this query again instead of using the cache"):
+                        refresh_cached_answer(idx)
+
             # Add memory toggle and delete button in columns
             col1, col2 = st.columns([9, 1])
 
@@ -131,12 +219,19 @@ def display_plan_progress():
             # Show progress with complexity indicator
             st.caption(f"Processing: {int(progress_percentage * 100)}% complete ({current_step_num}/{total_steps} steps) - :{complexity_color}[{complexity_level} Plan]")
 
+            # Estimated time and token cost from historical statistics
+            analysis = analyze_plan(st.session_state.plan, st.session_state.executor_model)
+            st.caption(f"⏱️ ~{format_duration(analysis['remaining_seconds'])} remaining · {describe_plan_estimate(analysis)}")
+
             # Add a detailed plan view in an expander
             with st.expander("View detailed plan", expanded=False):
                 for i, step in enumerate(st.session_state.plan):
                     status_icon = "⏳" if i == st.session_state.current_step_index else "✅" if i < st.session_state.current_step_index else "⏸️"
                     deps = ", ".join([str(d) for d in step["dependencies"]]) if step["dependencies"] else "None"
-                    st.markdown(f"{status_icon} **Step {step['step_id']}**: {step['description']}\n   Tool: `{step['tool_suggestion']}` | Dependencies: `{deps}`")
+                    estimate = analysis["estimates"].get(step["step_id"], {})
+                    critical = " · critical path" if step["step_id"] in analysis["critical_path"] else ""
+                    st.markdown(f"{status_icon} **Step {step['step_id']}**: {step['description']}\n   Tool: `{step['tool_suggestion']}` | Dependencies: `{deps}` | "
+                                f"Level {analysis['levels'].get(step['step_id'], 0)} | est. ~{format_duration(estimate.get('seconds', 0))}, ~{estimate.get('tokens', 0):,} tokens{critical}")
 
         # Only show detailed execution log if debug mode is enabled
         if st.session_state.debug_mode:
@@ -146,13 +241,13 @@ def display_execution_results():
     """Display execution results in collapsible sections."""
     plan_display = []
     if st.session_state.plan is not None and st.session_state.plan:
-        for step in st.session_state.plan:
+        for i, step in enumerate(st.session_state.plan):
             status_icon = "⚪" # Pending
             if step["status"] == "Completed":
                 status_icon = "✅"
             elif step["status"] == "Failed":
                 status_icon = "❌"
-            elif step["step_id"] == st.session_state.current_step_index + 1: # Next step to run
+            elif i == st.session_state.current_step_index: # Next step to run (ids are stable, not positions)
                  status_icon = "⏳"
 
             # Hide dependency details from the user interface
@@ -209,6 +304,7 @@ def handle_url_scrape_request(prompt, client):
                     st.session_state.status_container.info(f"🌐 Scraping content from {url}...")
 
                 try:
+                    from data_acquisition.news_scraper import WebScraper
                     scraper = WebScraper()
                     content = scraper.scrape_content(url)
 
@@ -329,7 +425,22 @@ def handle_url_scrape_request(prompt, client):
         return True
     return False
 
-def handle_regular_query(prompt, client):
+def route_component(prompt, query_complexity):
+    """Return the SCF component for the query, or None for standard planning."""
+    try:
+        from scf.manager_instance import scf_manager
+        if scf_manager and query_complexity in ["Medium", "High"]:
+            return scf_manager.route_query(prompt)
+    except (ImportError, AttributeError):
+        pass
+    return None
+
+def release_query_claim():
+    """Release this session's single-flight claim on its query, if it holds one."""
+    release_query(st.session_state.get("query_cache_claim"))
+    st.session_state.query_cache_claim = None
+
+def handle_regular_query(prompt, client, bypass_cache=False):
     """Handle regular queries with planning and execution."""
     with st.spinner("🤖 Planning..."):
         with st.chat_message("assistant"):
@@ -339,56 +450,100 @@ def handle_regular_query(prompt, client):
                 st.session_state.status_container.info("🧠 Creating execution plan...")
             # Assess query complexity first
             query_complexity = assess_query_complexity(prompt)
+            # Remember routing inputs so the execution can be logged for router training
+            st.session_state.query_started_at = time.time()
+            st.session_state.query_complexity = query_complexity
+            set_scope(complexity=query_complexity)  # Low-complexity answers get rate-limit priority
             if query_complexity == "High" and 'status_container' in st.session_state:
                 st.session_state.status_container.info("🧠 Complex query detected. Creating detailed plan...")
 
-            # Check if SCF is available and should be used
-            use_scf = False
+            # Answer identical queries from the cache; wait if another session is answering it right now
+            component_name = route_component(prompt, query_complexity)
+            models = {key: st.session_state.get(key) for key in ("planner_model", "executor_model", "summarizer_model")}
+            cache_key = query_cache_key(prompt, component_name, models, st.session_state.persistent_memory)
+            st.session_state.query_cache_key = cache_key
+            # An older claim (e.g. of an abandoned query) must not keep other sessions waiting
+            release_query_claim()
+            if not bypass_cache:
+                entry = lookup_answer(cache_key)
+                if entry is None:
+                    def on_wait():
+                        if 'status_container' in st.session_state:
+                            st.session_state.status_container.info("⏳ The same query is being answered in another session, waiting for its result...")
+                    claimed, entry = claim_query(cache_key, on_wait)
+                    st.session_state.query_cache_claim = cache_key if claimed else None
+                if entry is not None:
+                    show_cached_answer(cache_key, entry, client)
+                    return
+
+            # Keep the claim only if a plan starts executing; otherwise let waiting sessions go
+            planned = False
             try:
-                from scf.manager_instance import scf_manager
-                if scf_manager and query_complexity in ["Medium", "High"]:
-                    use_scf = True
-                    # Route the query to the appropriate component
-                    component_name = scf_manager.route_query(prompt)
-                    if 'status_container' in st.session_state:
-                        st.session_state.status_container.info(f"🧠 Using {component_name} component for this query")
-                    # Get component-specific system prompt and capabilities
-                    system_prompt = scf_manager.get_component_prompt(component_name)
-                    capabilities = scf_manager.get_component_capabilities(component_name)
-                    # Generate plan with component-specific context
-                    st.session_state.plan = run_planner(client, prompt, st.session_state.planner_model,
-                                                       system_prompt, capabilities) or []
-                    # Store component info in context for use during execution
-                    st.session_state.context['current_component'] = component_name
-                    st.session_state.context['component_capabilities'] = capabilities
-            except (ImportError, AttributeError):
+                # Check if SCF is available and should be used
                 use_scf = False
-
-            # If SCF is not available or not used, fall back to standard planning
-            if not use_scf:
-                st.session_state.plan = run_planner(client, prompt, st.session_state.planner_model) or []
-
-            if st.session_state.plan:
-                # Update status with plan information and complexity
-                steps_count = len(st.session_state.plan)
-                complexity_emoji = "🟢" if steps_count < 8 else "🟡" if steps_count < 13 else "🔴"
-                if 'status_container' in st.session_state:
-                    st.session_state.status_container.success(f"✅ Plan created with {steps_count} steps {complexity_emoji}")
-                # Start execution
-                st.session_state.current_step_index = 0
-                st.rerun() # Trigger the execution loop
-            else:
-                st.error("Failed to generate a plan. Please check the console for errors.")
-                st.session_state.messages.append({"role": "assistant", "content": "Apologies, I encountered an issue while creating the execution plan. Please try again or check your API keys."})
+                try:
+                    from scf.manager_instance import scf_manager
+                    if scf_manager and component_name:
+                        use_scf = True
+                        # The query was routed to its component above
+                        if 'status_container' in st.session_state:
+                            st.session_state.status_container.info(f"🧠 Using {component_name} component for this query")
+                        # Get component-specific system prompt and capabilities
+                        system_prompt = scf_manager.get_component_prompt(component_name)
+                        capabilities = scf_manager.get_component_capabilities(component_name)
+                        # Generate plan with component-specific context
+                        st.session_state.plan = Plan.from_dicts(run_planner(client, prompt, st.session_state.planner_model,
+                                                                            system_prompt, capabilities))
+                        # Store component info in context for use during execution
+                        st.session_state.context['current_component'] = component_name
+                        st.session_state.context['component_capabilities'] = capabilities
+                except (ImportError, AttributeError):
+                    use_scf = False
+
+                # If SCF is not available or not used, fall back to standard planning
+                if not use_scf:
+                    st.session_state.plan = Plan.from_dicts(run_planner(client, prompt, st.session_state.planner_model))
+
+                if st.session_state.plan:
+                    # Update status with plan information and complexity
+                    steps_count = len(st.session_state.plan)
+                    complexity_emoji = "🟢" if steps_count < 8 else "🟡" if steps_count < 13 else "🔴"
+                    analysis = analyze_plan(st.session_state.plan, st.session_state.executor_model)
+                    log_debug(f"Plan analysis: {analysis}")
+                    if 'status_container' in st.session_state:
+                        st.session_state.status_container.success(
+                            f"✅ Plan created with {steps_count} steps {complexity_emoji} · {describe_plan_estimate(analysis)}")
+                    # Keep a running draft answer while the steps execute
+                    start_draft_summary(client, prompt)
+                    # Start execution
+                    st.session_state.current_step_index = 0
+                    planned = True
+                    st.rerun() # Trigger the execution loop
+                else:
+                    st.error("Failed to generate a plan. Please check the console for errors.")
+                    st.session_state.messages.append({"role": "assistant", "content": "Apologies, I encountered an issue while creating the execution plan. Please try again or check your API keys."})
+            finally:
+                if not planned:
+                    release_query_claim()
+
+def cancel_running_step():
+    """Tell the tool call of the step in flight, if any, to stop (skip, reset or new query)."""
+    cancel_event = st.session_state.get("step_cancel_event")
+    if cancel_event is not None:
+        cancel_event.set()
+        st.session_state.step_cancel_event = None
 
 def handle_execution_step(client):
     """Handle execution of a single step in the plan."""
     current_step = st.session_state.plan[st.session_state.current_step_index]
+    # Tag the LLM calls of this step in the telemetry
+    set_scope(step_id=current_step["step_id"])
 
     # Add a button to skip the current step if needed
     _, col2 = st.columns([5, 1])
     with col2:
         if st.button("Skip this step", key=f"skip_step_{current_step['step_id']}"):
+            cancel_running_step()
             # Mark the current step as skipped
             current_step["status"] = "Skipped"
             current_step["result"] = "Manually skipped by user"
@@ -400,10 +555,11 @@ def handle_execution_step(client):
     if current_step["status"] == "Pending":
         # Check dependencies (simple check: previous step must be completed)
         dependencies_met = True
-        if current_step["dependencies"]:
-            for dep_id in current_step["dependencies"]:
+        # The plan keeps a ready set, so the common case is a single O(1) lookup
+        if current_step["dependencies"] and not st.session_state.plan.is_ready(current_step["step_id"]):
+            for dep_id in st.session_state.plan.unmet_dependencies(current_step["step_id"]):
                 # Find the dependent step
-                dep_step = next((s for s in st.session_state.plan if s["step_id"] == dep_id), None)
+                dep_step = st.session_state.plan.get(dep_id)
                 # Consider both Completed and Skipped steps as valid dependencies
                 if not dep_step or (dep_step["status"] != "Completed" and dep_step["status"] != "Skipped"):
                     dependencies_met = False
@@ -450,9 +606,17 @@ def handle_execution_step(client):
             if 'status_container' in st.session_state:
                 st.session_state.status_container.info(f"⏳ Step {current_step['step_id']}/{len(st.session_state.plan)}: {current_step['description']}")
             with st.spinner(f"Running Step {current_step['step_id']}/{len(st.session_state.plan)}..."):
-                reasoning, action_str, observation = run_executor_step(
-                    client, current_step, st.session_state.context, st.session_state.executor_model
-                )
+                # The step gets a fixed time budget; its tool calls stop when it runs out or
+                # when the step is skipped or the execution is reset
+                cancel_event = threading.Event()
+                st.session_state.step_cancel_event = cancel_event
+                try:
+                    with deadline_scope(step_budget(), cancel_event):
+                        reasoning, action_str, observation = run_executor_step(
+                            client, current_step, st.session_state.context, st.session_state.executor_model
+                        )
+                finally:
+                    st.session_state.step_cancel_event = None
 
                 # Update Execution Log display and store for the current step
                 step_log = [
@@ -473,6 +637,12 @@ def handle_execution_step(client):
                 # Update Plan State
                 current_step["result"] = observation
 
+                if observation == CANCELLED_OBSERVATION:
+                    # Cancelled steps count as skipped: no recovery, no draft, and the answer is not cached
+                    current_step["status"] = "Skipped"
+                    st.session_state.current_step_index += 1
+                    st.rerun()
+
                 # Check for errors in the observation or reasoning
                 has_error = "Error" in observation[:20] or "Error" in reasoning[:20] or "failed" in observation.lower()
 
@@ -516,6 +686,8 @@ def handle_execution_step(client):
                     current_step["status"] = "Completed"
                     # Update context (simple way: store result by step_id)
                     st.session_state.context[f"step_{current_step['step_id']}_result"] = observation
+                    # Fold the result into the running draft answer in the background
+                    record_step_for_draft(current_step)
 
                     # Check if we need to adjust the plan based on the observation
                     try:
@@ -546,29 +718,38 @@ def handle_plan_completion(client):
     if 'status_container' in st.session_state:
         st.session_state.status_container.success("✅ Plan Execution Completed!")
 
-    # Generate final response to the user
-    with st.spinner("Generating final response..."):
-        # Find the last user message to use as the query
-        user_messages = [msg for msg in st.session_state.messages if msg["role"] == "user"]
-        if user_messages:
-            user_query = user_messages[-1]["content"]
-        else:
-            user_query = "Unknown query"
-        final_response = generate_final_response(client, user_query, st.session_state.plan)
-
-        # Clear the status container after generating the response
-        if 'status_container' in st.session_state:
-            st.session_state.status_container.empty()
-
-    # Process the final response to handle LaTeX and dollar amounts
+    # Find the last user message to use as the query
+    user_messages = [msg for msg in st.session_state.messages if msg["role"] == "user"]
+    if user_messages:
+        user_query = user_messages[-1]["content"]
+    else:
+        user_query = "Unknown query"
+
+    # Process the streamed response to handle LaTeX and dollar amounts as it arrives
     try:
-        from processing.format_results import process_final_output
-        processed_response = process_final_output(final_response)
+        from processing.format_results import process_final_output_stream
     except ImportError:
-        # If the module is not available, use the original response
-        processed_response = final_response
+        # If the module is not available, stream the original response
+        process_final_output_stream = lambda chunks: chunks
         st.warning("LaTeX processing module not found. Dollar amounts may not display correctly.")
 
+    # Stream the final response into the chat so it shows from the first token
+    if 'status_container' in st.session_state:
+        st.session_state.status_container.info("✍️ Writing final response...")
+    # The running draft covers most results, so the final call only polishes it
+    draft = get_draft(user_query)
+    processed_response = st.write_stream(
+        process_final_output_stream(stream_final_response(client, user_query, st.session_state.plan, draft)))
+    if not isinstance(processed_response, str):
+        processed_response = "".join(str(part) for part in processed_response)
+
+    # Clear the status container once the response has been written
+    if 'status_container' in st.session_state:
+        st.session_state.status_container.empty()
+
+    # Cache the answer for identical queries and wake up sessions waiting for it
+    cache_final_answer(user_query, processed_response)
+
     # Add the processed response to the chat
     st.session_state.messages.append({"role": "assistant", "content": processed_response})
 
@@ -577,9 +758,6 @@ def handle_plan_completion(client):
     from tools.memory_tools import update_message_memory
     update_message_memory(new_message_idx, True)
 
-    # Display the processed response immediately using basic components
-    st.markdown(f"{processed_response}")
-
     # Add memory toggle and delete button in columns
     col1, col2 = st.columns([9, 1])
 
@@ -611,6 +789,9 @@ def handle_plan_completion(client):
     filename, _ = auto_save_conversation(st.session_state.messages, client, st.session_state.current_conversation_filename)
     st.session_state.current_conversation_filename = filename
 
+    # Log the execution for offline router training
+    log_execution_for_router(user_query)
+
     # Reset for next query
     st.session_state.current_step_index = -1
     # Keep plan visible, but could clear: st.session_state.plan = None
@@ -632,9 +813,17 @@ def handle_plan_failure():
     if 'status_container' in st.session_state:
         st.session_state.status_container.error("❌ Plan Execution Halted due to step failure.")
 
+    # Nothing to cache; let sessions waiting on the same query run it themselves
+    release_query_claim()
+
     # Generate a failure response
     failed_step = next((step for step in st.session_state.plan if step["status"] == "Failed"), None)
 
+    # Log the execution for offline router training
+    user_messages = [msg for msg in st.session_state.messages if msg["role"] == "user"]
+    if user_messages:
+        log_execution_for_router(user_messages[-1]["content"])
+
     # Clear the status container after a short delay
     time.sleep(2)  # Keep the error message visible for 2 seconds
     if 'status_container' in st.session_state:
@@ -649,11 +838,18 @@ def handle_plan_failure():
         # Extract references from successful steps
         references = []
 
+        # Use the running draft as a partial answer when there is one
+        draft = get_draft(user_messages[-1]["content"], timeout=3.0) if user_messages else None
+        if draft:
+            failure_message += f"\n\nHere is a partial answer based on the steps that did complete:\n\n{draft[0]}"
+
         if successful_steps:
-            failure_message += "\n\nHowever, I was able to complete the following steps:\n"
+            if not draft:
+                failure_message += "\n\nHowever, I was able to complete the following steps:\n"
 
             for step in successful_steps:
-                failure_message += f"\n- {step['description']}: {step['result']}"
+                if not draft:
+                    failure_message += f"\n- {step['description']}: {step['result']}"
 
                 # Check if this step involves web scraping
                 if step["tool_suggestion"] == "web_scrape" and "url" in step["description"].lower():
@@ -789,14 +985,22 @@ def handle_plan_failure():
     # Force a rerun to ensure the UI is updated
     st.rerun()
 
-def process_user_input(prompt, client):
+def process_user_input(prompt, client, bypass_cache=False):
     """Process user input and handle different types of requests."""
     if not client:
         st.error("Please configure the OpenRouter API Key in the sidebar.")
         return
 
+    # A new query supersedes any step still running
+    cancel_running_step()
+
     # Add user message to chat history
     st.session_state.messages.append({"role": "user", "content": prompt})
+    # Every LLM call from here until the next query is tagged with this query id
+    st.session_state.query_id = uuid.uuid4().hex[:12]
+    set_scope(query_id=st.session_state.query_id, step_id=None)
+    # Refreshing a cached answer also refetches the tool results it was built from
+    st.session_state.bypass_tool_cache = bypass_cache
 
     # Display user message using basic components
     new_message_idx = len(st.session_state.messages) - 1
@@ -849,4 +1053,4 @@ def process_user_input(prompt, client):
     # Check if this is a URL scraping request
     if not handle_url_scrape_request(prompt, client):
         # Regular query - generate plan and execute
-        handle_regular_query(prompt, client)
+        handle_regular_query(prompt, client, bypass_cache)
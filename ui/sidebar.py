@@ -7,7 +7,12 @@ import streamlit as st
 from datetime import datetime
 from config import WORKSPACE_DIR, save_model_config
 from storage.knowledge_manager import KnowledgeManager
-from utils.conversation import load_conversation
+from utils.conversation import load_conversation, conversation_telemetry_tags
+from llm.telemetry import recent_records, summarize_records
+from llm.gateway import hedge_budget, breaker_states
+from llm.rate_limiter import limiter_states
+from storage.llm_cache import get_llm_cache, clear_responses
+from storage.tool_cache import get_tool_cache, tool_cache_stats, clear_tool_results
 from tools import TOOLS
 
 def render_configuration_sidebar(knowledge_manager):
@@ -25,6 +30,16 @@ def render_configuration_sidebar(knowledge_manager):
         st.session_state.executor_model = st.text_input("Executor Model", value=st.session_state.executor_model)
         st.session_state.summarizer_model = st.text_input("Summarizer Model", value=st.session_state.summarizer_model)
         st.session_state.title_model = st.text_input("Title Generation Model", value=st.session_state.title_model)
+        st.session_state.condenser_model = st.text_input("Condenser Model", value=st.session_state.condenser_model,
+                                                         help="Cheap model used to condense large step results before the final response")
+        st.session_state.llm_response_cache = st.toggle(
+            "Cache deterministic LLM calls", value=st.session_state.get("llm_response_cache", False),
+            help="Answer repeated temperature-0 executor calls and plan adjustments with identical prompts "
+                 "from a cache in the workspace instead of calling the model again.")
+        st.session_state.hedge_llm_calls = st.toggle(
+            "Hedge slow planner/executor calls", value=st.session_state.get("hedge_llm_calls", False),
+            help="If a call is slower than the model's usual p90 latency, send it again to the first fallback "
+                 "model (or the same model) and use whichever answers first. Limited to a small share of calls.")
     # Persist updated model selections
     save_model_config(st.session_state)
 
@@ -119,6 +134,52 @@ def render_configuration_sidebar(knowledge_manager):
         else:
             st.info("Debug mode is disabled. Only essential status updates will be shown.")
 
+        # Where the time and tokens of LLM calls go, per pipeline phase
+        st.markdown("**LLM calls**")
+        telemetry_view = st.radio("Scope", ["Last query", "This conversation", "All recent"],
+                                  horizontal=True, key="telemetry_view", label_visibility="collapsed")
+        if telemetry_view == "Last query":
+            records = recent_records(query_id=st.session_state.get("query_id")) if st.session_state.get("query_id") else []
+        elif telemetry_view == "This conversation":
+            _, tags = conversation_telemetry_tags()
+            records = [r for r in recent_records() if r.get("conversation") in tags]
+        else:
+            records = recent_records()
+        rows = summarize_records(records)
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No LLM calls recorded yet.")
+        hedges = hedge_budget.stats()
+        st.caption(f"Hedged {hedges['hedged']} of the last {hedges['calls']} calls ({hedges['hedges_won']} hedges won)")
+        for route, state in limiter_states().items():
+            st.caption(f"Rate limit {route}: {state['waiting']} waiting, {state['granted']} sent, "
+                       f"{state['wait_s']}s queued in total")
+        llm_cache_stats = get_llm_cache().stats()
+        st.caption(f"LLM response cache: {llm_cache_stats['entries']} entries, "
+                   f"{llm_cache_stats['hits']} hits, {llm_cache_stats['misses']} misses")
+        if st.button("Clear LLM response cache", key="clear_llm_cache"):
+            clear_responses()
+            st.success("LLM response cache cleared.")
+
+        # Results of web, scraping and stock tools shared across steps, sessions and restarts
+        st.markdown("**Tool result cache**")
+        st.session_state.tool_result_cache = st.toggle(
+            "Cache tool results", value=st.session_state.get("tool_result_cache", True),
+            help="Reuse recent results of web search, scraping and stock tools for identical calls. "
+                 "Quotes stay fresh for a minute, searches for hours and scraped pages for days.")
+        tool_stats = tool_cache_stats()
+        if tool_stats:
+            st.dataframe([{"tool": name, **counters} for name, counters in sorted(tool_stats.items())],
+                         hide_index=True, use_container_width=True)
+        st.caption(f"{get_tool_cache().stats()['entries']} cached tool results")
+        if st.button("Clear tool result cache", key="clear_tool_cache"):
+            clear_tool_results()
+            st.success("Tool result cache cleared.")
+        open_breakers = breaker_states()
+        if open_breakers:
+            st.warning("Circuit open: " + ", ".join(open_breakers))
+
 def render_conversation_sidebar(client):
     """Render the conversation management sidebar."""
     # Modern styling for sidebar and conversation UI
@@ -316,6 +377,7 @@ def render_conversation_sidebar(client):
              on_click=lambda: st.session_state.update({
                  'messages': [],
                  'current_conversation_filename': None,
+                 'unsaved_conversation_id': None,
                  'persistent_memory': {},
                  'message_memories': {},
                  'plan': None,
@@ -349,6 +411,7 @@ def render_conversation_sidebar(client):
                     st.session_state.messages = load_conversation(filename)
                     # Set the current conversation filename
                     st.session_state.current_conversation_filename = filename
+                    st.session_state.unsaved_conversation_id = None
                     st.sidebar.success(f"Loaded: {title}")
                     st.rerun()
 
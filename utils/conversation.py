@@ -4,9 +4,49 @@ Conversation management utilities for the ReAct application.
 import os
 import json
 import re
+import threading
+import uuid
 from datetime import datetime
 import streamlit as st
 from config import WORKSPACE_DIR
+from llm.telemetry import in_current_scope
+
+# Serializes writes to conversation files and the index (titles are patched from a background thread)
+_conversation_lock = threading.RLock()
+
+TITLE_SYSTEM_PROMPT = "You are a helpful assistant that generates concise, descriptive titles for conversations. Create a short title (5-7 words max) that captures the essence of the conversation."
+
+def _llm_title(client, title_model, user_messages):
+    """Ask the title model for a title; returns None if it produced nothing. Safe to call from any thread."""
+    # Combine up to the last 3 user messages for context
+    context = "\n".join(user_messages[-3:])
+    completion = client.chat.completions.create(
+        model=title_model,
+        messages=[
+            {"role": "system", "content": TITLE_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Generate a short, descriptive title for this conversation:\n{context}"}
+        ],
+        temperature=0.3,
+        max_tokens=20,
+        phase="title"
+    )
+    if completion and completion.choices and completion.choices[0].message.content:
+        # Remove quotes if the model added them
+        return completion.choices[0].message.content.strip().strip('"\'')
+    return None
+
+def provisional_title(messages):
+    """A title derived from the latest user message, used until the generated title is ready."""
+    user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
+    if user_messages:
+        # Create a simple title from the first 30 characters of the most recent user message
+        latest_user_message = user_messages[-1]
+        if len(latest_user_message) > 30:
+            return latest_user_message[:30] + "..."
+        return latest_user_message
+    # Fallback to timestamp if no user messages
+    timestamp_str = datetime.now().strftime('%Y-%m-%d %H:%M')
+    return f"Chat on {timestamp_str}"
 
 def generate_title(messages, client=None):
     """Generate a title based on the conversation messages using the configured LLM model."""
@@ -16,54 +56,70 @@ def generate_title(messages, client=None):
 
         # If we have user messages and a client, use the configured model to generate a title
         if user_messages and client:
-            # Combine up to the last 3 user messages for context
-            context = "\n".join(user_messages[-3:])
-
-            # Use the configured model to generate a title
             try:
                 # Get the title model from session state, with fallback to default
-                title_model = st.session_state.get('title_model')
-
-                completion = client.chat.completions.create(
-                    model=title_model,
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that generates concise, descriptive titles for conversations. Create a short title (5-7 words max) that captures the essence of the conversation."},
-                        {"role": "user", "content": f"Generate a short, descriptive title for this conversation:\n{context}"}
-                    ],
-                    temperature=0.3,
-                    max_tokens=20
-                )
-
-                if completion and completion.choices and completion.choices[0].message.content:
-                    title = completion.choices[0].message.content.strip()
-                    # Remove quotes if the model added them
-                    title = title.strip('"\'')
+                title = _llm_title(client, st.session_state.get('title_model'), user_messages)
+                if title:
                     return title
             except Exception as e:
                 st.write(f"Error using Gemini for title generation: {str(e)}")
                 # Fall back to simple title generation
 
         # Simple title generation fallback
-        if user_messages:
-            # Get the most recent user message
-            latest_user_message = user_messages[-1]
-
-            # Create a simple title from the first 30 characters of the message
-            if len(latest_user_message) > 30:
-                title = latest_user_message[:30] + "..."
-            else:
-                title = latest_user_message
-
-            return title
-        else:
-            # Fallback to timestamp if no user messages
-            timestamp_str = datetime.now().strftime('%Y-%m-%d %H:%M')
-            return f"Chat on {timestamp_str}"
+        return provisional_title(messages)
     except Exception as e:
         st.write(f"Error generating title: {str(e)}")
         timestamp_str = datetime.now().strftime('%Y-%m-%d %H:%M')
         return f"Chat on {timestamp_str}"
 
+def update_conversation_title(filename, title):
+    """Patch the title of a saved conversation in its file and in the index."""
+    conv_dir = os.path.join(WORKSPACE_DIR, 'agent_workspace')
+    path = os.path.join(conv_dir, filename)
+    index_path = os.path.join(conv_dir, 'conversations_index.json')
+    with _conversation_lock:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            data['title'] = title
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+        except Exception as e:
+            print(f"Error updating conversation title: {e}")
+            return
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            for item in index:
+                if item.get('filename') == filename:
+                    item['title'] = title
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=2)
+        except Exception as e:
+            print(f"Error updating conversation index: {e}")
+
+def generate_title_in_background(filename, messages, client, title_model):
+    """Generate the title in a daemon thread and patch it into the saved conversation.
+
+    The title model is read by the caller because st.session_state is not available in the thread.
+    """
+    user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
+    if not user_messages or not client:
+        return None
+
+    def worker():
+        try:
+            title = _llm_title(client, title_model, user_messages)
+        except Exception as e:
+            print(f"Error generating conversation title: {e}")
+            return
+        if title:
+            update_conversation_title(filename, title)
+
+    thread = threading.Thread(target=in_current_scope(worker), name=f"title-{filename}", daemon=True)
+    thread.start()
+    return thread
+
 def migrate_conversations_schema():
     """Scan and migrate legacy conversation JSON files to extended schema, and build index."""
     import os
@@ -180,36 +236,37 @@ def save_conversation(filename, messages, title=None, created_at=None):
         'messages': messages
     }
 
-    try:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(schema, f, indent=2)
-    except Exception:
-        return
+    with _conversation_lock:
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(schema, f, indent=2)
+        except Exception:
+            return
 
-    # Update conversations_index.json
-    index_path = os.path.join(conv_dir, 'conversations_index.json')
-    try:
-        if os.path.exists(index_path):
-            with open(index_path, 'r', encoding='utf-8') as f:
-                index = json.load(f)
-        else:
+        # Update conversations_index.json
+        index_path = os.path.join(conv_dir, 'conversations_index.json')
+        try:
+            if os.path.exists(index_path):
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            else:
+                index = []
+        except Exception:
             index = []
-    except Exception:
-        index = []
 
-    # Remove existing record with same filename
-    index = [item for item in index if item.get('filename') != filename]
-    index.append({
-        'filename': filename,
-        'title': title,
-        'created_at': created_at
-    })
+        # Remove existing record with same filename
+        index = [item for item in index if item.get('filename') != filename]
+        index.append({
+            'filename': filename,
+            'title': title,
+            'created_at': created_at
+        })
 
-    try:
-        with open(index_path, 'w', encoding='utf-8') as f:
-            json.dump(index, f, indent=2)
-    except Exception:
-        pass
+        try:
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=2)
+        except Exception:
+            pass
 
 def auto_save_conversation(messages, client, current_filename=None):
     """Automatically save conversation, either updating existing file or creating a new one."""
@@ -223,36 +280,54 @@ def auto_save_conversation(messages, client, current_filename=None):
         filename = f"conversation_{timestamp}.json"
         created_at = datetime.now().isoformat()
 
-        # Generate title using the configured model
-        generated_title = generate_title(messages, client)
-
-        # Save conversation with metadata
-        save_conversation(filename, messages, title=generated_title, created_at=created_at)
+        # Save immediately under a provisional title; the generated title is patched in
+        # from a background thread so the user never waits on the title model
+        title = provisional_title(messages)
+        save_conversation(filename, messages, title=title, created_at=created_at)
+        generate_title_in_background(filename, list(messages), client, st.session_state.get('title_model'))
 
         # Show a toast notification
-        st.toast(f"Saved new conversation: {generated_title}", icon="✅")
+        st.toast(f"Saved new conversation: {title}", icon="✅")
 
-        return filename, generated_title
+        return filename, title
     else:
         # Update existing file
         conv_dir = os.path.join(WORKSPACE_DIR, 'agent_workspace')
         path = os.path.join(conv_dir, current_filename)
 
-        # Read existing data to preserve title and created_at
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                title = data.get('title', None)
-                created_at = data.get('created_at', None)
-        except Exception:
-            # If file doesn't exist or is corrupted, create new metadata
-            title = None
-            created_at = None
+        # Hold the lock from read to write so a background title patch is not overwritten
+        with _conversation_lock:
+            # Read existing data to preserve title and created_at
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    title = data.get('title', None)
+                    created_at = data.get('created_at', None)
+            except Exception:
+                # If file doesn't exist or is corrupted, create new metadata
+                title = None
+                created_at = None
 
-        # Save updated conversation
-        save_conversation(current_filename, messages, title=title, created_at=created_at)
+            # Save updated conversation
+            save_conversation(current_filename, messages, title=title, created_at=created_at)
 
         # Show a toast notification
         st.toast(f"Updated conversation", icon="✅")
 
         return current_filename, title
+
+def conversation_telemetry_tags():
+    """Telemetry tags of the current conversation.
+
+    A new chat is tagged with a generated id until it is saved; after that new records
+    use its filename. Both stay associated with the chat until another one is started.
+
+    Returns:
+        tuple: (tag for new records, list of every tag of this conversation)
+    """
+    if not st.session_state.get("unsaved_conversation_id"):
+        st.session_state.unsaved_conversation_id = f"unsaved-{uuid.uuid4().hex[:12]}"
+    tags = [st.session_state.unsaved_conversation_id]
+    if st.session_state.get("current_conversation_filename"):
+        tags.insert(0, st.session_state.current_conversation_filename)
+    return tags[0], tags
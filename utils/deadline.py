@@ -0,0 +1,202 @@
+"""
+Deadlines and cancellation for tool calls in the ReAct application.
+Each plan step runs inside a deadline scope that holds the step's wall-clock budget
+and a cancel event. Network helpers size their timeouts from what is left of the
+budget (io_timeout), backoff sleeps end early on cancellation (sleep), and the
+executor runs the tool in a worker thread and stops waiting for it when the budget
+runs out or the user skips the step or resets the execution (run_with_deadline).
+
+    with deadline_scope(step_budget(), cancel_event):
+        response = requests.get(url, timeout=io_timeout(15))
+
+The scope lives in a context variable, so it follows the call into the tool's
+worker thread but not into unrelated background pools.
+"""
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future, wait
+from typing import Callable, Optional
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Wall-clock budget of one plan step (executor call plus tool), overridable with STEP_TIMEOUT_SECONDS
+DEFAULT_STEP_SECONDS = 180.0
+# Shortest timeout handed to an I/O call while budget remains
+MIN_IO_TIMEOUT = 0.5
+# How often a waiting caller checks for cancellation and reports progress
+POLL_INTERVAL = 0.5
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the current step's time budget is spent."""
+
+class Cancelled(Exception):
+    """Raised when the current step was cancelled (skipped or reset by the user)."""
+
+class Deadline:
+    """A point in time plus a cancel event; nested deadlines never outlive their parent."""
+
+    def __init__(self, seconds: Optional[float] = None, cancel_event: Optional[threading.Event] = None,
+                 parent: Optional["Deadline"] = None):
+        now = time.monotonic()
+        self.started = now
+        self.expires_at = now + seconds if seconds is not None else None
+        if parent is not None and parent.expires_at is not None:
+            self.expires_at = parent.expires_at if self.expires_at is None else min(self.expires_at, parent.expires_at)
+        self.cancel_event = cancel_event or threading.Event()
+        self.parent = parent
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (None: no time limit)."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def check(self) -> None:
+        """Raise Cancelled or DeadlineExceeded if the work should stop."""
+        if self.cancelled:
+            raise Cancelled("cancelled by the user")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"deadline exceeded (step time budget of {self.expires_at - self.started:.0f}s)")
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+def step_budget() -> float:
+    """Seconds a plan step may take (STEP_TIMEOUT_SECONDS, default 180)."""
+    try:
+        return float(os.getenv("STEP_TIMEOUT_SECONDS", DEFAULT_STEP_SECONDS))
+    except ValueError:
+        return DEFAULT_STEP_SECONDS
+
+def current_deadline() -> Optional[Deadline]:
+    """The innermost active deadline, or None."""
+    return _current.get()
+
+@contextmanager
+def deadline_scope(seconds: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+    """Run a block under a deadline (capped by any enclosing one).
+
+    Args:
+        seconds: Time budget of the block (None: only the enclosing deadline applies)
+        cancel_event: Event that cancels the block when set
+    """
+    deadline = Deadline(seconds, cancel_event, parent=_current.get())
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+def check_deadline() -> None:
+    """Raise if the current step was cancelled or is out of time (no-op outside a scope)."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current scope (None: no deadline)."""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+def io_timeout(default: Optional[float]) -> Optional[float]:
+    """Timeout for one I/O call: the default, capped by what is left of the current deadline.
+
+    Raises:
+        Cancelled, DeadlineExceeded: If no time is left
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    deadline.check()
+    left = deadline.remaining()
+    if left is None:
+        return default
+    left = max(left, MIN_IO_TIMEOUT)
+    return left if default is None else min(default, left)
+
+def sleep(seconds: float) -> None:
+    """Sleep that ends early on cancellation and never overruns the deadline.
+
+    Raises:
+        Cancelled: If the step is cancelled while sleeping
+        DeadlineExceeded: If the deadline would pass before the sleep ends
+    """
+    deadline = _current.get()
+    if deadline is None:
+        time.sleep(seconds)
+        return
+    deadline.check()
+    left = deadline.remaining()
+    if left is not None and left < seconds:
+        raise DeadlineExceeded(f"deadline exceeded (no time left for a {seconds:.1f}s backoff)")
+    if deadline.cancel_event.wait(seconds) or deadline.cancelled:
+        raise Cancelled("cancelled by the user")
+
+def in_current_deadline(fn: Callable) -> Callable:
+    """Wrap fn so it runs under the caller's deadline, e.g. when submitted to a worker thread."""
+    deadline = _current.get()
+    def run(*args, **kwargs):
+        token = _current.set(deadline)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+def run_with_deadline(fn: Callable, on_wait: Optional[Callable[[float], None]] = None):
+    """Run fn in a worker thread under the current deadline and wait for it.
+
+    The worker thread gets the caller's context variables (deadline, telemetry tags)
+    and Streamlit script context, so tools can still use st.session_state. If the
+    deadline passes or the step is cancelled, the caller stops waiting and the worker
+    is told to stop at its next I/O boundary; a call stuck in pure Python cannot be
+    interrupted and finishes in the background.
+
+    Args:
+        fn: The work, taking no arguments
+        on_wait: Called with the elapsed seconds while waiting (e.g. to update a status line)
+
+    Raises:
+        Cancelled, DeadlineExceeded: If the work did not finish in time
+    """
+    deadline = _current.get()
+    context = contextvars.copy_context()
+    future = Future()
+
+    def work():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(context.run(fn))
+        except BaseException as e:
+            future.set_exception(e)
+
+    # One short-lived thread per call: an abandoned call cannot starve later ones
+    thread = threading.Thread(target=work, name="tool-call", daemon=True)
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        add_script_run_ctx(thread)
+    thread.start()
+    if deadline is None:
+        return future.result()
+    started = time.monotonic()
+    try:
+        while True:
+            deadline.check()
+            left = deadline.remaining()
+            done, _ = wait([future], timeout=POLL_INTERVAL if left is None else min(POLL_INTERVAL, max(left, 0.0)))
+            if done:
+                return future.result()
+            if on_wait is not None:
+                on_wait(time.monotonic() - started)
+    finally:
+        if not future.done():
+            # Interrupted (deadline, cancellation or a Streamlit rerun): tell the worker to stop
+            deadline.cancel()
@@ -5,7 +5,8 @@ import streamlit as st
 
 def log_debug(message):
     """Log debug information only if debug mode is enabled"""
-    if st.session_state.debug_mode:
+    # .get() also works from worker threads, which see an empty session state
+    if st.session_state.get("debug_mode"):
         st.write(message)
 
 def update_tool_status(tool_name, **kwargs):